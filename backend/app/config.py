@@ -1,17 +1,99 @@
 """
 Configuration management for DocExtract backend
 """
+from pydantic import Field, model_validator
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List, Literal, Optional
+import socket
 
 
 class Settings(BaseSettings):
     """Application settings loaded from environment variables"""
 
+    # Storage Backend Configuration
+    # "mongodb", or "sqlite" for a single-node install with an embedded
+    # database file (no search, change stream, archive or original files)
+    storage_backend: Literal["mongodb", "sqlite"] = "mongodb"
+    sqlite_path: str = "docextract.db"
+    # Reader connections; writes go through one dedicated connection
+    sqlite_pool_size: int = 4
+
     # MongoDB Configuration
     mongodb_url: str = "mongodb://localhost:27017"
     mongodb_db_name: str = "docextract"
 
+    # MongoDB Connection Pool Configuration
+    # Size max_pool_size per uvicorn worker: each worker has its own pool
+    mongodb_max_pool_size: int = 100
+    mongodb_min_pool_size: int = 0
+    mongodb_max_idle_time_ms: Optional[int] = None
+    mongodb_wait_queue_timeout_ms: int = 10000
+    mongodb_connect_timeout_ms: int = 10000
+    mongodb_server_selection_timeout_ms: int = 30000
+    mongodb_socket_timeout_ms: Optional[int] = None
+    # Startup connects in the background, retrying with exponential backoff
+    mongodb_connect_retry_initial_seconds: float = 0.5
+    mongodb_connect_retry_max_seconds: float = 30.0
+    # Apply pending index migrations after connecting instead of only
+    # through python -m app.migrations.indexes (run by start.sh); a database
+    # without any migration is always migrated on startup
+    migrate_indexes_on_startup: bool = False
+    # Wire compression in preference order (add "snappy" if python-snappy is installed)
+    mongodb_compressors: str = "zstd,zlib"
+    # Also match document IDs stored as strings by versions before binary
+    # UUIDs; disable once python -m app.migrations.binary_ids has run
+    legacy_string_ids: bool = True
+
+    # Command Monitoring Configuration
+    # Latency histograms per command and collection, reported by /metrics
+    mongodb_command_monitoring: bool = True
+    # Commands at least this slow are logged with their redacted filter shape
+    mongodb_slow_query_seconds: float = 0.1
+    mongodb_slow_query_log_size: int = 100
+    # Fraction of commands whose command and reply BSON size is measured
+    mongodb_command_bytes_sample_rate: float = 0.01
+
+    # Read Routing Configuration
+    # Read preference per operation ("get", "list", "stats", "search", "export"); set as JSON,
+    # e.g. READ_ROUTING='{"list": "secondaryPreferred", "get": "primary"}'
+    read_routing: Dict[str, str] = {
+        "get": "primary",
+        "list": "secondaryPreferred",
+        "stats": "secondaryPreferred",
+        "search": "secondaryPreferred",
+        "export": "secondaryPreferred",
+    }
+    # Bound on secondary lag for non-primary reads (driver minimum is 90)
+    read_max_staleness_seconds: int = 90
+    # How long a client's reads stay on the primary after it writes
+    read_your_writes_window_seconds: int = 120
+
+    # Document Cache Configuration
+    # Read-through cache for GET /documents/{id}; a max size of 0 disables it
+    document_cache_max_size: int = 10000
+    document_cache_ttl_seconds: float = 300.0
+    # Change stream feeding cache invalidation, ETags and WebSocket events on
+    # every replica (needs a replica set and, for UPDATE and DELETE events,
+    # MongoDB 6.0+); turned off on a standalone server, where each replica
+    # only sees its own writes
+    change_stream_enabled: bool = True
+    change_stream_retry_seconds: float = 30.0
+    # Resume token checkpoints, keyed by replica_id, for gap-free restarts
+    change_stream_checkpoint_interval_seconds: float = 1.0
+    change_stream_max_replay_seconds: float = 300.0
+    replica_id: str = Field(default_factory=socket.gethostname)
+
+    # WebSocket Configuration
+    # Changes arriving within this window are coalesced into BULK_* events
+    websocket_event_batch_window_seconds: float = 0.01
+    websocket_event_batch_max_size: int = 1000
+    # Messages queued per client; a client whose queue overflows or whose
+    # send takes longer than the timeout is disconnected
+    websocket_send_queue_size: int = 256
+    websocket_send_timeout_seconds: float = 5.0
+    # Topics (document types and ids) one WebSocket client may subscribe to
+    websocket_max_subscriptions: int = 1000
+
     # LlamaParse Configuration
     llama_cloud_api_key: str
 
@@ -26,6 +108,57 @@ class Settings(BaseSettings):
     # API Configuration
     api_v1_prefix: str = "/api/v1"
 
+    # Insert Batching Configuration
+    # Single-document inserts arriving within this window are written with
+    # one insert_many; 0 disables batching (MongoDB backend only)
+    insert_batch_window_seconds: float = 0.0
+    insert_batch_max_size: int = 500
+    # Inserts waiting to be written; callers wait while the buffer is full
+    insert_buffer_max_size: int = 5000
+
+    # Bulk Operations Configuration
+    # Maximum number of documents accepted by one bulk request
+    bulk_max_documents: int = 1000
+
+    # Export Configuration
+    # Cursor batch size, response chunk size and Parquet row group size
+    export_batch_size: int = 1000
+    export_chunk_bytes: int = 256 * 1024
+    export_parquet_row_group_size: int = 10000
+
+    # Archive Configuration
+    # Documents older than this many days move to the compressed archive
+    # collection; None disables archiving
+    archive_after_days: Optional[int] = None
+    archive_interval_seconds: float = 3600.0
+    # Documents moved per batch, and pause between batches to limit load
+    archive_batch_size: int = 500
+    archive_batch_pause_seconds: float = 1.0
+
+    # Original File Store Configuration
+    # Keep uploaded originals in GridFS so documents can be re-extracted
+    store_original_files: bool = True
+    # Originals no document links are deleted after this grace period
+    originals_unreferenced_seconds: float = 86400.0
+    originals_sweep_interval_seconds: float = 3600.0
+
+    # Statistics Configuration
+    # Interval between recounts that correct drift in the stats counters,
+    # run by one replica at a time
+    stats_reconcile_interval_seconds: float = 3600.0
+    # Interval between full rebuilds of the invoice rollups, run by one
+    # replica at a time; the rollups are also maintained on every write
+    rollup_rebuild_interval_seconds: float = 86400.0
+
+    @model_validator(mode="after")
+    def disable_mongodb_features(self) -> "Settings":
+        """Turn off features that need MongoDB when using the SQLite backend"""
+        if self.storage_backend == "sqlite":
+            self.change_stream_enabled = False
+            self.store_original_files = False
+            self.archive_after_days = None
+        return self
+
     class Config:
         env_file = ".env"
         case_sensitive = False
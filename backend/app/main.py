@@ -2,14 +2,36 @@
 DocExtract FastAPI Backend Application
 Main application entry point
 """
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.routing import Match
 from contextlib import asynccontextmanager
+import asyncio
 import logging
 
 from .config import settings
-from .routes import extraction_router, documents_router, stats_router
-from .services.database import db_service
+from .routes import (
+    extraction_router,
+    documents_router,
+    stats_router,
+    metrics_router,
+    originals_router,
+)
+from .services.database import db_service, document_store
+from .services.document_cache import document_cache
+from .services.change_stream import change_stream_listener
+from .services.versions import version_registry
+from .services.document_events import document_event_publisher
+from .services.archive import document_archiver
+from .services.originals import original_file_store
+from .services.websocket_manager import ws_manager
+from .services.monitoring import current_endpoint
+from .services.read_routing import (
+    RECENT_WRITE_COOKIE,
+    READ_CONSISTENCY_HEADER,
+    force_primary_reads,
+)
 
 # Configure logging
 logging.basicConfig(
@@ -20,6 +42,85 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+async def start_mongodb_tasks(background_tasks: list, change_stream_tasks: list):
+    """
+    Start the MongoDB background tasks once the database is connected
+
+    Args:
+        background_tasks: List to add periodic tasks to
+        change_stream_tasks: List to add the change stream tasks to
+    """
+    await db_service.wait_until_ready()
+
+    # Start periodic correction of the statistics counters
+    background_tasks.append(
+        asyncio.create_task(
+            db_service.run_stats_reconciler(settings.stats_reconcile_interval_seconds)
+        )
+    )
+    # Start periodic correction of the invoice rollups
+    background_tasks.append(
+        asyncio.create_task(
+            db_service.run_rollup_rebuilder(settings.rollup_rebuild_interval_seconds)
+        )
+    )
+
+    # Invalidate cached documents and ETags and broadcast WebSocket events
+    # on writes made through any replica
+    if settings.change_stream_enabled:
+        change_stream_listener.subscribe(
+            document_cache.handle_change,
+            on_reset=document_cache.clear,
+        )
+        change_stream_listener.subscribe(
+            version_registry.handle_change,
+            on_reset=version_registry.reset,
+        )
+        change_stream_listener.subscribe(document_event_publisher.handle_change)
+        watched = [db_service.collection_name]
+        if db_service.archive_in_use:
+            watched.append(db_service.archive_collection_name)
+            document_event_publisher.track_archive(
+                db_service.collection_name,
+                db_service.archive_collection_name,
+                db_service.stored_ids,
+            )
+        change_stream_tasks.append(asyncio.create_task(document_event_publisher.run(ws_manager)))
+        change_stream_tasks.append(
+            asyncio.create_task(
+                change_stream_listener.run(
+                    db_service.db,
+                    settings.change_stream_retry_seconds,
+                    checkpoints=db_service.db[db_service.checkpoints_collection_name],
+                    consumer_id=settings.replica_id,
+                    collections=watched,
+                )
+            )
+        )
+    else:
+        # Without a change stream this replica publishes its own writes
+        logger.warning(
+            "Change stream disabled: WebSocket clients receive events of writes "
+            "made through this replica only"
+        )
+        db_service.subscribe(document_event_publisher.handle_change)
+        background_tasks.append(asyncio.create_task(document_event_publisher.run(ws_manager)))
+
+    # Start moving old documents to the archive and deleting unlinked originals
+    background_tasks.append(
+        asyncio.create_task(
+            original_file_store.run_sweeper(
+                settings.originals_sweep_interval_seconds,
+                settings.originals_unreferenced_seconds,
+            )
+        )
+    )
+    if settings.archive_after_days is not None:
+        background_tasks.append(
+            asyncio.create_task(document_archiver.run(settings.archive_interval_seconds))
+        )
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
@@ -29,8 +130,21 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting DocExtract Backend...")
 
-    # Connect to MongoDB
-    await db_service.connect()
+    change_stream_tasks = []
+    background_tasks = []
+    if settings.storage_backend == "mongodb":
+        # Serve requests right away; MongoDB is connected with retries and
+        # readiness is reported by /ready
+        db_service.connect_in_background()
+        background_tasks.append(
+            asyncio.create_task(start_mongodb_tasks(background_tasks, change_stream_tasks))
+        )
+    else:
+        await document_store.connect()
+
+        # A single node sees every write: the store reports them directly
+        document_store.subscribe(document_event_publisher.handle_change)
+        background_tasks.append(asyncio.create_task(document_event_publisher.run(ws_manager)))
 
     logger.info("DocExtract Backend started successfully")
 
@@ -39,8 +153,17 @@ async def lifespan(app: FastAPI):
     # Shutdown
     logger.info("Shutting down DocExtract Backend...")
 
-    # Disconnect from MongoDB
-    await db_service.disconnect()
+    for task in background_tasks:
+        task.cancel()
+    for task in change_stream_tasks:
+        task.cancel()
+    # Let the listener checkpoint its resume token before disconnecting
+    await asyncio.gather(*change_stream_tasks, return_exceptions=True)
+    # Stop the WebSocket writers
+    await ws_manager.close()
+
+    # Disconnect from the document store
+    await document_store.disconnect()
 
     logger.info("DocExtract Backend shut down successfully")
 
@@ -53,7 +176,85 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
-# Configure CORS
+@app.middleware("http")
+async def read_your_writes(request: Request, call_next):
+    """
+    Keep a client's reads on the primary shortly after it writes
+
+    Mutating requests set a short-lived cookie; requests carrying it, or
+    the X-Read-Consistency: primary header, bypass secondary routing.
+    The cookie suits browsers; API clients that do not keep cookies
+    send the header. Streaming responses resolve their read preference
+    before this returns, since the pin is reset here.
+    """
+    pinned = (
+        RECENT_WRITE_COOKIE in request.cookies
+        or request.headers.get(READ_CONSISTENCY_HEADER) == "primary"
+    )
+    token = force_primary_reads.set(pinned)
+    try:
+        response = await call_next(request)
+    finally:
+        force_primary_reads.reset(token)
+
+    if request.method in ("POST", "PUT", "PATCH", "DELETE") and response.status_code < 400:
+        response.set_cookie(
+            RECENT_WRITE_COOKIE,
+            "1",
+            max_age=settings.read_your_writes_window_seconds,
+            samesite="lax",
+        )
+
+    return response
+
+
+@app.middleware("http")
+async def attribute_commands(request: Request, call_next):
+    """
+    Tag MongoDB commands with the endpoint that issues them
+
+    The route template is used rather than the path, so all requests to
+    one endpoint share a key in the command metrics.
+    """
+    endpoint = None
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            endpoint = f"{request.method} {route.path}"
+            break
+
+    token = current_endpoint.set(endpoint)
+    try:
+        return await call_next(request)
+    finally:
+        current_endpoint.reset(token)
+
+
+@app.middleware("http")
+async def require_database(request: Request, call_next):
+    """
+    Answer API requests with 503 until the document store is connected
+
+    Metrics stay available, so a replica waiting for MongoDB can still
+    be inspected.
+    """
+    path = request.url.path
+    if (
+        path.startswith(settings.api_v1_prefix)
+        and not path.startswith(f"{settings.api_v1_prefix}/metrics")
+        and not document_store.readiness()["ready"]
+    ):
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"detail": "Database not connected yet"},
+            headers={"Retry-After": "1"},
+        )
+
+    return await call_next(request)
+
+
+# Configure CORS; added last so it is outermost and also answers
+# preflights and decorates responses returned by the middleware above
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.allowed_origins,
@@ -63,10 +264,13 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
+
 # Include routers
 app.include_router(extraction_router, prefix=settings.api_v1_prefix)
 app.include_router(documents_router, prefix=settings.api_v1_prefix)
 app.include_router(stats_router, prefix=settings.api_v1_prefix)
+app.include_router(metrics_router, prefix=settings.api_v1_prefix)
+app.include_router(originals_router, prefix=settings.api_v1_prefix)
 
 
 @app.get("/")
@@ -82,13 +286,36 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
+    """
+    Liveness endpoint
+
+    Healthy as long as the process serves requests, including while the
+    database is still being connected; see /ready for readiness.
+    """
     return {
         "status": "healthy",
-        "database": "connected" if db_service.db is not None else "disconnected",
+        "database": "connected" if document_store.readiness()["ready"] else "connecting",
     }
 
 
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness endpoint
+
+    Returns:
+        200 once the document store is connected, 503 before, with the
+        connection state
+    """
+    readiness = document_store.readiness()
+    return JSONResponse(
+        status_code=(
+            status.HTTP_200_OK if readiness["ready"] else status.HTTP_503_SERVICE_UNAVAILABLE
+        ),
+        content={"status": "ready" if readiness["ready"] else "not_ready", **readiness},
+    )
+
+
 # Add explicit OPTIONS handlers for CORS preflight
 @app.options("/{path:path}")
 async def options_handler():
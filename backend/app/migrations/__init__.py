@@ -0,0 +1,14 @@
+"""
+Database migration commands
+"""
+from .binary_ids import migrate_binary_ids
+from .datetime_fields import migrate_datetime_fields
+from .indexes import INDEX_VERSION, index_version, migrate_indexes
+
+__all__ = [
+    "migrate_binary_ids",
+    "migrate_datetime_fields",
+    "INDEX_VERSION",
+    "index_version",
+    "migrate_indexes",
+]
@@ -0,0 +1,149 @@
+"""
+Online migration of document IDs to binary UUIDs
+
+Converts document ids stored as uuid4 strings to 16-byte BSON binary
+UUIDs, the form new documents are written in, in the hot and archive
+collections. IDs that are not canonical UUID strings are left as they
+are. The migration runs in batches ordered by _id, pauses between
+batches to limit load on the primary and records its position per
+collection in the migrations collection so an interrupted run resumes
+where it stopped.
+
+Lookups match both forms while LEGACY_STRING_IDS is enabled, so the API
+keeps working during the run; disable it once the migration completes.
+
+Usage:
+    python -m app.migrations.binary_ids [--batch-size N] [--pause S] [--restart]
+"""
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from bson.binary import Binary
+from pymongo import UpdateOne
+import argparse
+import asyncio
+import logging
+
+from ..config import settings
+from ..utils.ids import to_stored_id
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_ID = "binary_ids"
+MIGRATIONS_COLLECTION = "migrations"
+COLLECTIONS = ("extracted_documents", "extracted_documents_archive")
+
+
+async def migrate_binary_ids(
+    db: AsyncIOMotorDatabase,
+    batch_size: int = 500,
+    pause_seconds: float = 0.1,
+    restart: bool = False,
+) -> int:
+    """
+    Convert string UUID document ids to binary in batches
+
+    Each update is guarded on the original id value, so documents
+    deleted or rewritten while the migration runs are left alone.
+
+    Args:
+        db: Database to migrate
+        batch_size: Number of documents converted per batch
+        pause_seconds: Delay between batches
+        restart: Ignore the recorded positions and start from the beginning
+
+    Returns:
+        Number of documents converted in this run
+    """
+    migrations = db[MIGRATIONS_COLLECTION]
+    migrated = 0
+
+    for collection_name in COLLECTIONS:
+        collection = db[collection_name]
+        state_id = f"{MIGRATION_ID}:{collection_name}"
+
+        state = None if restart else await migrations.find_one({"_id": state_id})
+        if state and state.get("completed"):
+            continue
+        last_id = state.get("last_id") if state else None
+        if last_id is not None:
+            logger.info(f"Resuming id migration of {collection_name} after _id {last_id}")
+
+        while True:
+            query = {"id": {"$type": "string"}}
+            if last_id is not None:
+                query["_id"] = {"$gt": last_id}
+
+            batch = (
+                await collection.find(query, {"_id": 1, "id": 1})
+                .sort("_id", 1)
+                .limit(batch_size)
+                .to_list(length=batch_size)
+            )
+            if not batch:
+                break
+
+            operations = []
+            for document in batch:
+                stored = to_stored_id(document["id"])
+                if isinstance(stored, Binary):
+                    operations.append(
+                        UpdateOne(
+                            {"_id": document["_id"], "id": document["id"]},
+                            {"$set": {"id": stored}},
+                        )
+                    )
+
+            modified = 0
+            if operations:
+                result = await collection.bulk_write(operations, ordered=False)
+                modified = result.modified_count
+            migrated += modified
+            last_id = batch[-1]["_id"]
+
+            await migrations.update_one(
+                {"_id": state_id},
+                {"$set": {"last_id": last_id}, "$inc": {"migrated": modified}},
+                upsert=True,
+            )
+            logger.info(f"Converted {migrated} document ids (last _id {last_id})")
+
+            await asyncio.sleep(pause_seconds)
+
+        await migrations.update_one(
+            {"_id": state_id},
+            {"$set": {"completed": True}},
+            upsert=True,
+        )
+
+    logger.info(
+        f"Document id migration complete: {migrated} documents converted; "
+        "LEGACY_STRING_IDS can now be disabled"
+    )
+    return migrated
+
+
+async def main():
+    """Run the migration against the configured database"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--pause", type=float, default=0.1, help="Seconds between batches")
+    parser.add_argument("--restart", action="store_true", help="Ignore the saved positions")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(settings.mongodb_url)
+    try:
+        await migrate_binary_ids(
+            client[settings.mongodb_db_name],
+            batch_size=args.batch_size,
+            pause_seconds=args.pause,
+            restart=args.restart,
+        )
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    asyncio.run(main())
@@ -0,0 +1,138 @@
+"""
+Online migration of created_at/updated_at to native BSON datetimes
+
+Converts documents whose created_at is still an ISO format string and
+adds updated_at where it is missing. The migration runs in batches
+ordered by _id, pauses between batches to limit load on the primary and
+records its position in the migrations collection so an interrupted run
+resumes where it stopped.
+
+Usage:
+    python -m app.migrations.datetime_fields [--batch-size N] [--pause S] [--restart]
+"""
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import UpdateOne
+import argparse
+import asyncio
+import logging
+
+from ..config import settings
+from ..utils.dates import parse_datetime
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_ID = "datetime_fields"
+MIGRATIONS_COLLECTION = "migrations"
+DOCUMENTS_COLLECTION = "extracted_documents"
+
+
+async def migrate_datetime_fields(
+    db: AsyncIOMotorDatabase,
+    batch_size: int = 500,
+    pause_seconds: float = 0.1,
+    restart: bool = False,
+) -> int:
+    """
+    Convert legacy string datetimes to BSON dates in batches
+
+    Each update is guarded on the original created_at value, so documents
+    rewritten by the application while the migration runs are left alone.
+
+    Args:
+        db: Database to migrate
+        batch_size: Number of documents converted per batch
+        pause_seconds: Delay between batches
+        restart: Ignore the recorded position and start from the beginning
+
+    Returns:
+        Number of documents converted in this run
+    """
+    collection = db[DOCUMENTS_COLLECTION]
+    migrations = db[MIGRATIONS_COLLECTION]
+
+    state = None if restart else await migrations.find_one({"_id": MIGRATION_ID})
+    last_id = state.get("last_id") if state else None
+    if last_id is not None:
+        logger.info(f"Resuming datetime migration after _id {last_id}")
+
+    pending = {
+        "$or": [
+            {"created_at": {"$type": "string"}},
+            {"updated_at": {"$exists": False}},
+        ]
+    }
+
+    migrated = 0
+    while True:
+        query = dict(pending)
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+
+        batch = (
+            await collection.find(query, {"_id": 1, "created_at": 1, "updated_at": 1})
+            .sort("_id", 1)
+            .limit(batch_size)
+            .to_list(length=batch_size)
+        )
+        if not batch:
+            break
+
+        operations = []
+        for document in batch:
+            created_at = parse_datetime(document["created_at"])
+            updated_at = parse_datetime(document.get("updated_at", created_at))
+            operations.append(
+                UpdateOne(
+                    {"_id": document["_id"], "created_at": document["created_at"]},
+                    {"$set": {"created_at": created_at, "updated_at": updated_at}},
+                )
+            )
+
+        result = await collection.bulk_write(operations, ordered=False)
+        migrated += result.modified_count
+        last_id = batch[-1]["_id"]
+
+        await migrations.update_one(
+            {"_id": MIGRATION_ID},
+            {"$set": {"last_id": last_id}, "$inc": {"migrated": result.modified_count}},
+            upsert=True,
+        )
+        logger.info(f"Converted {migrated} documents (last _id {last_id})")
+
+        await asyncio.sleep(pause_seconds)
+
+    await migrations.update_one(
+        {"_id": MIGRATION_ID},
+        {"$set": {"completed": True}},
+        upsert=True,
+    )
+    logger.info(f"Datetime migration complete: {migrated} documents converted")
+    return migrated
+
+
+async def main():
+    """Run the migration against the configured database"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--pause", type=float, default=0.1, help="Seconds between batches")
+    parser.add_argument("--restart", action="store_true", help="Ignore the saved position")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(settings.mongodb_url)
+    try:
+        await migrate_datetime_fields(
+            client[settings.mongodb_db_name],
+            batch_size=args.batch_size,
+            pause_seconds=args.pause,
+            restart=args.restart,
+        )
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    asyncio.run(main())
@@ -0,0 +1,202 @@
+"""
+Versioned index migrations
+
+Indexes are created by this command instead of on every application
+start. Each migration is numbered; the highest applied number is kept
+in the migrations collection, so a run applies only the migrations a
+database has not had yet. Every migration is idempotent, so a run
+interrupted part way can simply be repeated.
+
+Index builds do not block reads or writes on the collection (on
+MongoDB 4.2+ every build works this way; older servers are asked for a
+background build), so the command can run against a live deployment,
+e.g. as a release step before rolling out replicas that need a new
+index. The application reports whether the database is behind in its
+readiness details.
+
+Usage:
+    python -m app.migrations.indexes [--target N] [--status]
+"""
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import TEXT
+from pymongo.errors import CollectionInvalid
+from typing import Awaitable, Callable, List, Optional, Tuple
+import argparse
+import asyncio
+import logging
+
+from ..config import settings
+from ..utils.dates import utc_now
+from ..utils.filters import PARTIAL_INDEXES
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_ID = "indexes"
+MIGRATIONS_COLLECTION = "migrations"
+DOCUMENTS_COLLECTION = "extracted_documents"
+ARCHIVE_COLLECTION = "extracted_documents_archive"
+ORIGINALS_FILES_COLLECTION = "originals.files"
+ROLLUPS_COLLECTION = "invoice_rollups"
+
+# Fields covered by the full-text index, with their relevance weights
+TEXT_SEARCH_FIELDS = {
+    "extracted_data.full_name": 10,
+    "extracted_data.id_number": 10,
+    "extracted_data.customer_info.name": 10,
+    "extracted_data.seller_info.name": 8,
+    "extracted_data.seller_info.gstin": 8,
+    "extracted_data.invoice_details.bill_no": 8,
+    "file_name": 2,
+}
+
+
+async def _document_indexes(db: AsyncIOMotorDatabase):
+    """Unique id, type and creation time indexes"""
+    collection = db[DOCUMENTS_COLLECTION]
+    await collection.create_index("id", unique=True, background=True)
+    await collection.create_index("document_type", background=True)
+    await collection.create_index("created_at", background=True)
+
+
+async def _filter_indexes(db: AsyncIOMotorDatabase):
+    """Partial indexes for hot extracted_data filter paths"""
+    collection = db[DOCUMENTS_COLLECTION]
+    for document_type, indexes in PARTIAL_INDEXES.items():
+        for paths in indexes:
+            await collection.create_index(
+                [(f"extracted_data.{path}", 1) for path in paths],
+                name=f"{document_type}__{'__'.join(paths)}",
+                partialFilterExpression={"document_type": document_type},
+                background=True,
+            )
+
+
+async def _text_index(db: AsyncIOMotorDatabase):
+    """Full-text index; names and identifiers are not natural language, so no stemming"""
+    await db[DOCUMENTS_COLLECTION].create_index(
+        [(field, TEXT) for field in TEXT_SEARCH_FIELDS],
+        name="document_text",
+        weights=TEXT_SEARCH_FIELDS,
+        default_language="none",
+        background=True,
+    )
+
+
+async def _archive_collection(db: AsyncIOMotorDatabase):
+    """zstd-compressed archive collection and its indexes"""
+    if ARCHIVE_COLLECTION not in await db.list_collection_names():
+        try:
+            await db.create_collection(
+                ARCHIVE_COLLECTION,
+                storageEngine={"wiredTiger": {"configString": "block_compressor=zstd"}},
+            )
+        except CollectionInvalid:
+            pass
+
+    archive = db[ARCHIVE_COLLECTION]
+    await archive.create_index("id", unique=True, background=True)
+    await archive.create_index("document_type", background=True)
+    await archive.create_index("created_at", background=True)
+
+
+async def _original_file_indexes(db: AsyncIOMotorDatabase):
+    """Content hash and sweep indexes of the original file store"""
+    files = db[ORIGINALS_FILES_COLLECTION]
+    await files.create_index("metadata.sha256", unique=True, background=True)
+    await files.create_index(
+        [("metadata.refcount", 1), ("metadata.touched_at", 1)],
+        background=True,
+    )
+
+
+async def _rollup_indexes(db: AsyncIOMotorDatabase):
+    """Period range index of the invoice rollup buckets"""
+    await db[ROLLUPS_COLLECTION].create_index(
+        [("granularity", 1), ("period", 1), ("seller_gstin", 1)],
+        background=True,
+    )
+
+
+# Applied in order; append new migrations with the next number
+INDEX_MIGRATIONS: List[Tuple[int, str, Callable[[AsyncIOMotorDatabase], Awaitable[None]]]] = [
+    (1, "document indexes", _document_indexes),
+    (2, "filter indexes", _filter_indexes),
+    (3, "text search index", _text_index),
+    (4, "archive collection", _archive_collection),
+    (5, "original file indexes", _original_file_indexes),
+    (6, "invoice rollup indexes", _rollup_indexes),
+]
+
+# Index version the application expects
+INDEX_VERSION = INDEX_MIGRATIONS[-1][0]
+
+
+async def index_version(db: AsyncIOMotorDatabase) -> int:
+    """
+    Get the highest index migration applied to a database
+
+    Args:
+        db: Database to check
+
+    Returns:
+        Applied version, 0 if no migration has run
+    """
+    state = await db[MIGRATIONS_COLLECTION].find_one({"_id": MIGRATION_ID})
+    return state["version"] if state else 0
+
+
+async def migrate_indexes(db: AsyncIOMotorDatabase, target: Optional[int] = None) -> int:
+    """
+    Apply pending index migrations in order
+
+    Args:
+        db: Database to migrate
+        target: Version to stop at (optional, the latest by default)
+
+    Returns:
+        Version of the database after the run
+    """
+    target = INDEX_VERSION if target is None else target
+    version = await index_version(db)
+
+    for number, name, migration in INDEX_MIGRATIONS:
+        if number <= version or number > target:
+            continue
+
+        logger.info(f"Applying index migration {number}: {name}")
+        await migration(db)
+        await db[MIGRATIONS_COLLECTION].update_one(
+            {"_id": MIGRATION_ID},
+            {"$set": {"version": number, "updated_at": utc_now()}},
+            upsert=True,
+        )
+        version = number
+
+    logger.info(f"Indexes at version {version} (latest {INDEX_VERSION})")
+    return version
+
+
+async def main():
+    """Run the index migrations against the configured database"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--target", type=int, default=None, help="Version to migrate to")
+    parser.add_argument("--status", action="store_true", help="Only print the applied version")
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(settings.mongodb_url)
+    try:
+        db = client[settings.mongodb_db_name]
+        if args.status:
+            print(f"Indexes at version {await index_version(db)} (latest {INDEX_VERSION})")
+        else:
+            await migrate_indexes(db, target=args.target)
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    asyncio.run(main())
@@ -2,22 +2,28 @@
 Main document model for MongoDB storage
 """
 from pydantic import BaseModel, Field
-from typing import Union, Literal
+from typing import List, Union, Literal, Optional
 from datetime import datetime
-from uuid import uuid4
 
 from .government_id import GovernmentIdData
 from .invoice import InvoiceData
+from ..utils.dates import utc_now
+from ..utils.ids import new_document_id
 
 
 class ExtractedDocument(BaseModel):
     """Main document model stored in MongoDB"""
 
-    id: str = Field(default_factory=lambda: str(uuid4()))
+    id: str = Field(default_factory=new_document_id)
     document_type: Literal["government_id", "invoice"]
     file_name: str
     extracted_data: dict  # Accept any dict structure
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=utc_now)
+    updated_at: datetime = Field(default_factory=utc_now)
+    # Incremented by every update, used for optimistic concurrency
+    version: int = 1
+    # SHA-256 of the original file in the original file store, if kept
+    original_sha256: Optional[str] = None
 
     class Config:
         json_encoders = {datetime: lambda v: v.isoformat()}
@@ -28,6 +34,8 @@ class ExtractedDocument(BaseModel):
                 "file_name": "invoice_2024_001.pdf",
                 "extracted_data": {},
                 "created_at": "2024-01-15T10:30:00Z",
+                "updated_at": "2024-01-15T10:30:00Z",
+                "version": 1,
             }
         }
 
@@ -38,16 +46,26 @@ class DocumentCreate(BaseModel):
     document_type: Literal["government_id", "invoice"]
     file_name: str
     extracted_data: dict  # Accept any dict structure from Flutter
+    # Links the original file returned by extraction; only set on create
+    original_sha256: Optional[str] = Field(None, pattern="^[0-9a-f]{64}$")
 
 
 class DocumentResponse(BaseModel):
-    """Response model for document operations"""
+    """
+    Response model for document operations
+
+    Fields other than id are optional so that sparse fieldset reads
+    (the fields= parameter) can omit them.
+    """
 
     id: str
-    document_type: str
-    file_name: str
-    extracted_data: dict
-    created_at: str
+    document_type: Optional[str] = None
+    file_name: Optional[str] = None
+    extracted_data: Optional[dict] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    version: Optional[int] = None
+    original_sha256: Optional[str] = None
 
 
 class DocumentListResponse(BaseModel):
@@ -55,6 +73,57 @@ class DocumentListResponse(BaseModel):
 
     documents: list[DocumentResponse]
     total: int
+    exact_total: bool = True
+
+
+class DocumentSearchResponse(BaseModel):
+    """Response model for full-text search"""
+
+    documents: list[DocumentResponse]
+    next_cursor: Optional[str] = None
+
+
+class DocumentUpdate(DocumentCreate):
+    """Request model for one document in a bulk update"""
+
+    id: str
+
+
+class BulkCreateRequest(BaseModel):
+    """Request model for creating documents in bulk"""
+
+    documents: list[DocumentCreate]
+    ordered: bool = False
+
+
+class BulkUpdateRequest(BaseModel):
+    """Request model for updating documents in bulk"""
+
+    documents: list[DocumentUpdate]
+    ordered: bool = False
+
+
+class BulkDeleteRequest(BaseModel):
+    """Request model for deleting documents in bulk"""
+
+    ids: list[str]
+
+
+class BulkItemResult(BaseModel):
+    """Result for one document of a bulk operation"""
+
+    index: int
+    id: str
+    success: bool
+    error: Optional[str] = None
+
+
+class BulkOperationResponse(BaseModel):
+    """Response model for bulk operations"""
+
+    results: list[BulkItemResult]
+    succeeded: int
+    failed: int
 
 
 class StatsResponse(BaseModel):
@@ -63,3 +132,42 @@ class StatsResponse(BaseModel):
     total: int
     government_id: int
     invoice: int
+
+
+class TierStats(BaseModel):
+    """Size of one storage tier"""
+
+    documents: int
+    data_bytes: int
+    storage_bytes: int
+    index_bytes: int
+
+
+class TierStatsResponse(BaseModel):
+    """Response model for storage tier statistics"""
+
+    hot: TierStats
+    archive: TierStats
+    archive_after_days: Optional[int] = None
+
+
+class InvoiceRollupRow(BaseModel):
+    """Invoice totals of one period and/or seller"""
+
+    period: Optional[str] = None
+    seller_gstin: Optional[str] = None
+    invoices: int
+    grand_total: float
+    sgst_amount: float
+    cgst_amount: float
+
+
+class InvoiceRollupResponse(BaseModel):
+    """Response model for invoice financial rollups"""
+
+    granularity: Literal["day", "month"]
+    group_by: Literal["period", "seller", "period_seller"]
+    date_from: Optional[str] = None
+    date_to: Optional[str] = None
+    rows: List[InvoiceRollupRow]
+    totals: InvoiceRollupRow
@@ -4,5 +4,13 @@ API route handlers
 from .extraction import router as extraction_router
 from .documents import router as documents_router
 from .stats import router as stats_router
+from .metrics import router as metrics_router
+from .originals import router as originals_router
 
-__all__ = ["extraction_router", "documents_router", "stats_router"]
+__all__ = [
+    "extraction_router",
+    "documents_router",
+    "stats_router",
+    "metrics_router",
+    "originals_router",
+]
@@ -0,0 +1,57 @@
+"""
+Conditional GET helpers shared by the read endpoints
+"""
+from fastapi import Request, Response, status
+from typing import Optional
+
+
+def query_key(request: Request) -> str:
+    """Canonical form of a request's query parameters for ETags"""
+    return "&".join(
+        sorted(f"{name}={value}" for name, value in request.query_params.multi_items())
+    )
+
+
+def version_etag(version: int) -> str:
+    """
+    Weak ETag of a document at a stored version
+
+    Every representation of a document version, whatever its fields,
+    shares this validator, and PATCH accepts it back in If-Match.
+    """
+    return f'W/"v{version}"'
+
+
+def not_modified(if_none_match: Optional[str], etag: Optional[str]) -> Optional[Response]:
+    """
+    Answer If-None-Match without running the request
+
+    ETags are compared weakly, as RFC 9110 requires for If-None-Match.
+
+    Args:
+        if_none_match: If-None-Match header value
+        etag: Current ETag of the resource, or None if unknown
+
+    Returns:
+        304 response if the client's copy is current, else None
+    """
+    if not if_none_match or etag is None:
+        return None
+
+    current = etag.removeprefix("W/")
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == current:
+            return Response(
+                status_code=status.HTTP_304_NOT_MODIFIED,
+                headers={"ETag": etag, "Cache-Control": "no-cache"},
+            )
+
+    return None
+
+
+def set_etag(response: Response, etag: Optional[str]):
+    """Attach an ETag, asking clients to revalidate before reuse"""
+    if etag is not None:
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
@@ -1,18 +1,55 @@
 """
 Document CRUD API endpoints
 """
-from fastapi import APIRouter, HTTPException, status, WebSocket, WebSocketDisconnect
-from typing import Optional
+from fastapi import (
+    APIRouter,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+    WebSocket,
+    WebSocketDisconnect,
+)
+from fastapi.responses import StreamingResponse
+from typing import Optional, List, Dict, Any, Literal
+from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
 import logging
 
+from ..config import settings
 from ..models.document import (
     ExtractedDocument,
     DocumentCreate,
     DocumentResponse,
     DocumentListResponse,
+    DocumentSearchResponse,
+    BulkCreateRequest,
+    BulkUpdateRequest,
+    BulkDeleteRequest,
+    BulkItemResult,
+    BulkOperationResponse,
 )
-from ..services.database import db_service
+from ..services.database import document_store
+from ..services.originals import original_file_store
 from ..services.websocket_manager import ws_manager
+from ..services.versions import version_registry
+from ..utils.projection import DOCUMENT_FIELDS, build_projection
+from ..utils.cursor import encode_cursor, decode_cursor
+from ..utils.filters import parse_filters
+from ..utils.patch import compile_merge_patch, compile_json_patch
+from ..utils.dates import parse_datetime
+from ..utils.export import (
+    EXPORT_FORMATS,
+    export_columns,
+    parquet_supported,
+    stream_csv,
+    stream_ndjson,
+    stream_parquet,
+)
+from .conditional import not_modified, query_key, set_etag, version_etag
 
 logger = logging.getLogger(__name__)
 
@@ -34,33 +71,26 @@ async def create_document(document: DocumentCreate):
         HTTPException: If creation fails
     """
     try:
+        await _check_originals([document])
+
         # Create ExtractedDocument instance
         extracted_doc = ExtractedDocument(
             document_type=document.document_type,
             file_name=document.file_name,
             extracted_data=document.extracted_data,
+            original_sha256=document.original_sha256,
         )
 
         # Insert into database
-        doc_id = await db_service.insert_document(extracted_doc)
-
-        # Broadcast INSERT event to WebSocket clients
-        await ws_manager.broadcast(
-            event_type="INSERT",
-            data=extracted_doc.model_dump(mode="json"),
-        )
+        doc_id = await document_store.insert_document(extracted_doc)
 
         logger.info(f"Created document: {doc_id}")
 
         # Return response
-        return DocumentResponse(
-            id=extracted_doc.id,
-            document_type=extracted_doc.document_type,
-            file_name=extracted_doc.file_name,
-            extracted_data=extracted_doc.extracted_data,  # Already a dict
-            created_at=extracted_doc.created_at.isoformat(),
-        )
+        return _document_response(extracted_doc.model_dump())
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error creating document: {str(e)}")
         raise HTTPException(
@@ -69,47 +99,116 @@ async def create_document(document: DocumentCreate):
         )
 
 
-@router.get("", response_model=DocumentListResponse)
+async def _check_originals(documents: List[DocumentCreate]):
+    """Reject documents linking original files that are not stored"""
+    hashes = list({document.original_sha256 for document in documents if document.original_sha256})
+    if not hashes:
+        return
+
+    if settings.storage_backend == "mongodb":
+        missing = await original_file_store.missing(hashes)
+    else:
+        # Original files are only stored with the MongoDB backend
+        missing = set(hashes)
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Original file not found: {', '.join(sorted(missing))}",
+        )
+
+
+def _document_response(document: Dict[str, Any]) -> DocumentResponse:
+    """Build a DocumentResponse from the fields present in a stored document"""
+    return DocumentResponse(
+        **{field: document[field] for field in DOCUMENT_FIELDS if field in document}
+    )
+
+
+def _parse_fields(fields: Optional[str]) -> Dict[str, int]:
+    """Translate the fields query parameter into a projection or raise 400"""
+    try:
+        return build_projection(fields)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+
+
+@router.get(
+    "",
+    response_model=DocumentListResponse,
+    response_model_exclude_unset=True,
+)
 async def list_documents(
+    request: Request,
+    response: Response,
     document_type: Optional[str] = None,
-    limit: int = 100,
-    offset: int = 0,
+    limit: int = Query(100, ge=1),
+    offset: int = Query(0, ge=0),
+    exact_total: bool = True,
+    fields: Optional[str] = None,
+    filters: Optional[List[str]] = Query(None, alias="filter"),
+    if_none_match: Optional[str] = Header(None),
 ):
     """
     List documents with optional filtering
 
+    Responses carry an ETag; a request whose If-None-Match still matches
+    is answered with 304 without querying MongoDB.
+
     Args:
         document_type: Filter by document type (optional)
         limit: Maximum number of documents (default 100)
         offset: Number of documents to skip (default 0)
+        exact_total: Return an exact total (default True). When False the
+            total is an estimate and does not depend on collection size.
+        fields: Comma-separated fields to return, including dotted paths
+            into extracted_data (optional, full documents by default)
+        filters: Repeatable "path:op:value" conditions on whitelisted
+            extracted_data paths; requires document_type (optional)
+        if_none_match: ETag of the client's copy (optional)
 
     Returns:
         DocumentListResponse with list of documents and total count
     """
+    etag = version_registry.collection_etag("list", query_key(request))
+    cached = not_modified(if_none_match, etag)
+    if cached is not None:
+        return cached
+
+    projection = _parse_fields(fields)
+
+    query_filters = None
+    if filters:
+        try:
+            query_filters = parse_filters(document_type, filters)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e),
+            )
+
     try:
-        # Get documents
-        documents = await db_service.get_documents(
+        # Get documents and total count in one round trip
+        documents, total = await document_store.list_documents(
             document_type=document_type,
             limit=limit,
             offset=offset,
+            exact_total=exact_total,
+            projection=projection,
+            filters=query_filters,
         )
 
-        # Get total count
-        total = await db_service.count_documents(document_type=document_type)
-
         # Convert to response models
-        doc_responses = [
-            DocumentResponse(
-                id=doc["id"],
-                document_type=doc["document_type"],
-                file_name=doc["file_name"],
-                extracted_data=doc["extracted_data"],
-                created_at=doc["created_at"],
-            )
-            for doc in documents
-        ]
+        doc_responses = [_document_response(doc) for doc in documents]
 
-        return DocumentListResponse(documents=doc_responses, total=total)
+        set_etag(response, etag)
+        return DocumentListResponse(
+            documents=doc_responses,
+            total=total,
+            exact_total=exact_total,
+        )
 
     except Exception as e:
         logger.error(f"Error listing documents: {str(e)}")
@@ -119,13 +218,313 @@ async def list_documents(
         )
 
 
-@router.get("/{document_id}", response_model=DocumentResponse)
-async def get_document(document_id: str):
+@router.get(
+    "/search",
+    response_model=DocumentSearchResponse,
+    response_model_exclude_unset=True,
+)
+async def search_documents(
+    q: str = Query(..., min_length=1),
+    document_type: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    """
+    Search documents by customer, seller or ID-card name, GSTIN, bill
+    number, ID number or file name
+
+    Results are ordered by relevance. Pass next_cursor from a response as
+    cursor to fetch the following page. Latency is driven by the number
+    of matching documents, which are all scored: on a 1M-document
+    collection, selective terms (a name or bill number matching up to a
+    few thousand documents) target p95 < 100 ms, while very common terms
+    should be narrowed with document_type or a more specific phrase.
+
+    Args:
+        q: Search terms; quote a phrase for an exact match (e.g. "INV-001")
+        document_type: Filter by document type (optional)
+        limit: Maximum number of documents per page (default 20)
+        cursor: Cursor returned by the previous page (optional)
+        fields: Comma-separated fields to return (optional)
+
+    Returns:
+        DocumentSearchResponse with ranked documents and the next cursor
+    """
+    projection = _parse_fields(fields)
+
+    after = None
+    if cursor:
+        try:
+            position = decode_cursor(cursor)
+            after = (float(position["s"]), ObjectId(position["i"]))
+        except (ValueError, KeyError, TypeError, InvalidId):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid cursor: {cursor}",
+            )
+
+    try:
+        documents, next_position = await document_store.search_documents(
+            query=q,
+            document_type=document_type,
+            limit=limit,
+            after=after,
+            projection=projection,
+        )
+
+        next_cursor = None
+        if next_position is not None:
+            score, last_id = next_position
+            next_cursor = encode_cursor({"s": score, "i": str(last_id)})
+
+        return DocumentSearchResponse(
+            documents=[_document_response(doc) for doc in documents],
+            next_cursor=next_cursor,
+        )
+
+    except NotImplementedError as e:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail=str(e),
+        )
+    except Exception as e:
+        logger.error(f"Error searching documents: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to search documents: {str(e)}",
+        )
+
+
+@router.get("/export")
+async def export_documents(
+    export_format: Literal["ndjson", "csv", "parquet"] = Query("ndjson", alias="format"),
+    document_type: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    filters: Optional[List[str]] = Query(None, alias="filter"),
+):
+    """
+    Export all matching documents as a streamed file
+
+    The response is streamed from a single MongoDB cursor, oldest first,
+    with bounded memory regardless of the number of documents. NDJSON
+    holds complete documents. CSV and Parquet are flat, with one row per
+    line item for invoices; fields outside the invoice and ID schemas are
+    left out.
+
+    Args:
+        export_format: "ndjson" (default), "csv" or "parquet"
+        document_type: Filter by document type (optional)
+        created_from: Earliest created_at, inclusive (optional)
+        created_to: Latest created_at, exclusive (optional)
+        filters: Repeatable "path:op:value" conditions on whitelisted
+            extracted_data paths; requires document_type (optional)
+
+    Returns:
+        Streaming file download
+
+    Raises:
+        HTTPException: 400 for invalid filters, 501 for Parquet without pyarrow
+    """
+    query_filters = None
+    if filters:
+        try:
+            query_filters = parse_filters(document_type, filters)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e),
+            )
+
+    if export_format == "parquet" and not parquet_supported():
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Parquet export requires the pyarrow package",
+        )
+
+    documents = document_store.export_documents(
+        document_type=document_type,
+        created_from=parse_datetime(created_from) if created_from else None,
+        created_to=parse_datetime(created_to) if created_to else None,
+        filters=query_filters,
+    )
+
+    if export_format == "ndjson":
+        content = stream_ndjson(documents, settings.export_chunk_bytes)
+    elif export_format == "csv":
+        content = stream_csv(
+            documents, export_columns(document_type), settings.export_chunk_bytes
+        )
+    else:
+        content = stream_parquet(
+            documents, export_columns(document_type), settings.export_parquet_row_group_size
+        )
+
+    media_type, extension = EXPORT_FORMATS[export_format]
+    file_name = f"{document_type or 'documents'}-export.{extension}"
+    logger.info(f"Exporting {document_type or 'all'} documents as {export_format}")
+
+    return StreamingResponse(
+        content,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{file_name}"'},
+    )
+
+
+def _check_bulk_size(count: int):
+    """Reject bulk requests that are empty or exceed the configured maximum"""
+    if count == 0 or count > settings.bulk_max_documents:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Bulk requests must contain between 1 and {settings.bulk_max_documents} documents",
+        )
+
+
+def _bulk_response(results: List[Dict[str, Any]]) -> BulkOperationResponse:
+    """Build a BulkOperationResponse from per-document results"""
+    succeeded = sum(1 for result in results if result["success"])
+    return BulkOperationResponse(
+        results=[BulkItemResult(**result) for result in results],
+        succeeded=succeeded,
+        failed=len(results) - succeeded,
+    )
+
+
+@router.post("/bulk", response_model=BulkOperationResponse)
+async def create_documents_bulk(request: BulkCreateRequest):
+    """
+    Create many documents in one request
+
+    Args:
+        request: BulkCreateRequest with documents and ordering mode
+
+    Returns:
+        BulkOperationResponse with a result per document
+
+    Raises:
+        HTTPException: If the request is too large or the operation fails
+    """
+    _check_bulk_size(len(request.documents))
+
+    try:
+        await _check_originals(request.documents)
+
+        extracted_docs = [
+            ExtractedDocument(
+                document_type=document.document_type,
+                file_name=document.file_name,
+                extracted_data=document.extracted_data,
+                original_sha256=document.original_sha256,
+            )
+            for document in request.documents
+        ]
+
+        results = await document_store.insert_documents(extracted_docs, ordered=request.ordered)
+
+        return _bulk_response(results)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error creating documents in bulk: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to create documents: {str(e)}",
+        )
+
+
+@router.put("/bulk", response_model=BulkOperationResponse)
+async def update_documents_bulk(request: BulkUpdateRequest):
+    """
+    Update many existing documents in one request
+
+    Args:
+        request: BulkUpdateRequest with documents and ordering mode
+
+    Returns:
+        BulkOperationResponse with a result per document
+
+    Raises:
+        HTTPException: If the request is too large or the operation fails
+    """
+    _check_bulk_size(len(request.documents))
+
+    try:
+        extracted_docs = [
+            ExtractedDocument(
+                id=document.id,
+                document_type=document.document_type,
+                file_name=document.file_name,
+                extracted_data=document.extracted_data,
+            )
+            for document in request.documents
+        ]
+
+        results = await document_store.update_documents(extracted_docs, ordered=request.ordered)
+
+        return _bulk_response(results)
+
+    except Exception as e:
+        logger.error(f"Error updating documents in bulk: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to update documents: {str(e)}",
+        )
+
+
+@router.delete("/bulk", response_model=BulkOperationResponse)
+async def delete_documents_bulk(request: BulkDeleteRequest):
+    """
+    Delete many documents in one request
+
+    Args:
+        request: BulkDeleteRequest with document IDs
+
+    Returns:
+        BulkOperationResponse with a result per document
+
+    Raises:
+        HTTPException: If the request is too large or the operation fails
+    """
+    _check_bulk_size(len(request.ids))
+
+    try:
+        results = await document_store.delete_documents(request.ids)
+
+        return _bulk_response(results)
+
+    except Exception as e:
+        logger.error(f"Error deleting documents in bulk: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to delete documents: {str(e)}",
+        )
+
+
+@router.get(
+    "/{document_id}",
+    response_model=DocumentResponse,
+    response_model_exclude_unset=True,
+)
+async def get_document(
+    document_id: str,
+    response: Response,
+    fields: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+):
     """
     Get a document by ID
 
+    Responses carry a weak ETag derived from the stored document
+    version, the same validator PATCH takes in If-Match. A request whose
+    If-None-Match still matches is answered with 304 and no body.
+
     Args:
         document_id: Document ID
+        fields: Comma-separated fields to return, including dotted paths
+            into extracted_data (optional, full document by default)
+        if_none_match: ETag of the client's copy (optional)
 
     Returns:
         DocumentResponse with document data
@@ -133,8 +532,14 @@ async def get_document(document_id: str):
     Raises:
         HTTPException: If document not found
     """
+    projection = _parse_fields(fields)
+    # The version is read even when not requested, to build the ETag
+    read_projection = projection
+    if fields and "version" not in projection:
+        read_projection = {**projection, "version": 1}
+
     try:
-        document = await db_service.get_document(document_id)
+        document = await document_store.get_document(document_id, projection=read_projection)
 
         if not document:
             raise HTTPException(
@@ -142,13 +547,17 @@ async def get_document(document_id: str):
                 detail=f"Document not found: {document_id}",
             )
 
-        return DocumentResponse(
-            id=document["id"],
-            document_type=document["document_type"],
-            file_name=document["file_name"],
-            extracted_data=document["extracted_data"],
-            created_at=document["created_at"],
-        )
+        # Documents created before versioning count as version 0
+        etag = version_etag(document.get("version", 0))
+        cached = not_modified(if_none_match, etag)
+        if cached is not None:
+            return cached
+
+        if read_projection is not projection:
+            document.pop("version", None)
+
+        set_etag(response, etag)
+        return _document_response(document)
 
     except HTTPException:
         raise
@@ -175,30 +584,18 @@ async def delete_document(document_id: str):
         HTTPException: If document not found
     """
     try:
-        # Get document before deleting for WebSocket broadcast
-        document = await db_service.get_document(document_id)
-
-        if not document:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Document not found: {document_id}",
-            )
-
-        # Delete document
-        deleted = await db_service.delete_document(document_id)
+        # Delete document in one round trip
+        deleted = await document_store.delete_document(
+            document_id,
+            projection={"_id": 0, "id": 1},
+        )
 
-        if not deleted:
+        if deleted is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Document not found: {document_id}",
             )
 
-        # Broadcast DELETE event to WebSocket clients
-        await ws_manager.broadcast(
-            event_type="DELETE",
-            data={"id": document_id},
-        )
-
         logger.info(f"Deleted document: {document_id}")
 
         return {"success": True, "message": f"Document {document_id} deleted"}
@@ -229,56 +626,144 @@ async def update_document(document_id: str, document: DocumentCreate):
         HTTPException: If document not found or update fails
     """
     try:
-        # Check if document exists
-        existing = await db_service.get_document(document_id)
-        if not existing:
+        # Update in database in one round trip; created_at is kept
+        updated = await document_store.update_document(
+            ExtractedDocument(
+                id=document_id,
+                document_type=document.document_type,
+                file_name=document.file_name,
+                extracted_data=document.extracted_data,
+            )
+        )
+
+        if updated is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Document not found: {document_id}",
             )
 
-        # Create updated document with existing created_at
-        from datetime import datetime
-        updated_doc = ExtractedDocument(
-            id=document_id,
-            document_type=document.document_type,
-            file_name=document.file_name,
-            extracted_data=document.extracted_data,
-            created_at=datetime.fromisoformat(existing['created_at']),
+        logger.info(f"Updated document: {document_id}")
+
+        return _document_response(updated)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error updating document: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to update document: {str(e)}",
         )
 
-        # Update in database
-        success = await db_service.update_document(updated_doc)
 
-        if not success:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Document not found: {document_id}",
-            )
+def _parse_version(if_match: Optional[str]) -> int:
+    """Read the expected document version from an If-Match header"""
+    if if_match is None:
+        raise HTTPException(
+            status_code=status.HTTP_428_PRECONDITION_REQUIRED,
+            detail="If-Match header with the document version is required",
+        )
 
-        # Broadcast UPDATE event to WebSocket clients
-        await ws_manager.broadcast(
-            event_type="UPDATE",
-            data=updated_doc.model_dump(mode="json"),
+    value = if_match.strip()
+    if value.startswith("W/"):
+        value = value[2:]
+    value = value.strip('"').lstrip("v")
+    if not value.isdigit():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid If-Match version: {if_match}",
         )
+    return int(value)
 
-        logger.info(f"Updated document: {document_id}")
 
-        return DocumentResponse(
-            id=updated_doc.id,
-            document_type=updated_doc.document_type,
-            file_name=updated_doc.file_name,
-            extracted_data=updated_doc.extracted_data,
-            created_at=updated_doc.created_at.isoformat(),
+@router.patch(
+    "/{document_id}",
+    response_model=DocumentResponse,
+    response_model_exclude_unset=True,
+)
+async def patch_document(
+    document_id: str,
+    request: Request,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+):
+    """
+    Partially update a document
+
+    Accepts a JSON Merge Patch (application/merge-patch+json or
+    application/json object) or a JSON Patch (application/json-patch+json
+    or a JSON array), applied atomically if the document is still at the
+    version given in If-Match.
+
+    Args:
+        document_id: Document ID
+        request: Request carrying the patch body
+        if_match: Expected document version, either the ETag of a GET
+            such as W/"v3" or the bare version "3"
+
+    Returns:
+        DocumentResponse with the patched document
+
+    Raises:
+        HTTPException: 400 for an invalid patch, 404 if the document does
+            not exist, 409 if it was modified since the given version,
+            428 without If-Match
+    """
+    expected_version = _parse_version(if_match)
+
+    try:
+        body = await request.json()
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Patch body must be valid JSON",
+        )
+
+    content_type = request.headers.get("content-type", "")
+    try:
+        if "json-patch" in content_type or isinstance(body, list):
+            patch = compile_json_patch(body)
+        else:
+            patch = compile_merge_patch(body)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+
+    try:
+        document, exists = await document_store.patch_document(
+            document_id, patch, expected_version
         )
 
+        if document is None:
+            if not exists:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Document not found: {document_id}",
+                )
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Document {document_id} was modified or a test operation failed",
+            )
+
+        logger.info(f"Patched document: {document_id}")
+
+        set_etag(response, version_etag(document.get("version", 0)))
+        return _document_response(document)
+
     except HTTPException:
         raise
+    except NotImplementedError as e:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail=str(e),
+        )
     except Exception as e:
-        logger.error(f"Error updating document: {str(e)}")
+        logger.error(f"Error patching document: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to update document: {str(e)}",
+            detail=f"Failed to patch document: {str(e)}",
         )
 
 
@@ -287,6 +772,10 @@ async def websocket_endpoint(websocket: WebSocket):
     """
     WebSocket endpoint for real-time document updates
 
+    Clients receive every document event until they subscribe to
+    document types or ids, e.g. {"action": "subscribe", "document_type":
+    "invoice"}, after which they receive only matching events.
+
     Args:
         websocket: WebSocket connection
     """
@@ -294,11 +783,15 @@ async def websocket_endpoint(websocket: WebSocket):
 
     try:
         while True:
-            # Keep connection alive and receive messages (if needed)
+            # Subscription requests; replies are queued behind any pending
+            # events like every other message
             data = await websocket.receive_text()
-            # Echo back for now (can be used for client-side events)
-            await ws_manager.send_personal_message(f"Received: {data}", websocket)
+            await ws_manager.receive(websocket, data)
 
     except WebSocketDisconnect:
-        ws_manager.disconnect(websocket)
         logger.info("WebSocket client disconnected")
+    except RuntimeError:
+        # The socket was closed by the manager after evicting a slow client
+        logger.info("WebSocket client evicted")
+    finally:
+        ws_manager.disconnect(websocket)
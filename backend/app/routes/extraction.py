@@ -2,11 +2,14 @@
 Document extraction API endpoints
 """
 from fastapi import APIRouter, HTTPException, status
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import Optional
 import base64
 import logging
 
+from ..config import settings
 from ..services.llamaparse import llamaparse_service
+from ..services.originals import original_file_store
 from ..schemas import get_government_id_schema, get_invoice_schema
 
 logger = logging.getLogger(__name__)
@@ -15,9 +18,15 @@ router = APIRouter(prefix="/extract", tags=["extraction"])
 
 
 class ExtractionRequest(BaseModel):
-    """Request model for document extraction"""
+    """
+    Request model for document extraction
+
+    Either file_data or original_sha256 is required; the latter
+    re-extracts a previously uploaded original without sending it again.
+    """
 
-    file_data: str  # Base64 encoded file
+    file_data: Optional[str] = None  # Base64 encoded file
+    original_sha256: Optional[str] = Field(None, pattern="^[0-9a-f]{64}$")
     file_name: str
     document_type: str  # "government_id" or "invoice"
 
@@ -27,6 +36,8 @@ class ExtractionResponse(BaseModel):
 
     extracted_data: dict
     file_name: str
+    # Stored original, to pass as original_sha256 when creating the document
+    original_sha256: Optional[str] = None
 
 
 @router.post("", response_model=ExtractionResponse)
@@ -57,13 +68,37 @@ async def extract_document(request: ExtractionRequest):
         else:
             schema = get_invoice_schema()
 
-        # Decode base64 file data
-        try:
-            file_bytes = base64.b64decode(request.file_data)
-        except Exception as e:
+        original_sha256 = request.original_sha256
+        if request.file_data is not None:
+            # Decode base64 file data
+            try:
+                file_bytes = base64.b64decode(request.file_data)
+            except Exception as e:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Invalid base64 file data: {str(e)}",
+                )
+
+            original_sha256 = None
+            if settings.store_original_files:
+                original_sha256 = await original_file_store.put(file_bytes, request.file_name)
+        elif original_sha256 is not None:
+            # Re-extract a stored original
+            if settings.storage_backend != "mongodb":
+                raise HTTPException(
+                    status_code=status.HTTP_501_NOT_IMPLEMENTED,
+                    detail="Original files require the MongoDB storage backend",
+                )
+            file_bytes = await original_file_store.read(original_sha256)
+            if file_bytes is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Original file not found: {original_sha256}",
+                )
+        else:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Invalid base64 file data: {str(e)}",
+                detail="Either file_data or original_sha256 is required",
             )
 
         # Extract document using LlamaParse
@@ -79,6 +114,7 @@ async def extract_document(request: ExtractionRequest):
         return ExtractionResponse(
             extracted_data=extracted_data,
             file_name=request.file_name,
+            original_sha256=original_sha256,
         )
 
     except HTTPException:
@@ -0,0 +1,46 @@
+"""
+Operational metrics API endpoints
+"""
+from fastapi import APIRouter
+from typing import Dict, Any
+
+from ..config import settings
+from ..services.database import db_service
+from ..services.monitoring import command_metrics, pool_metrics
+from ..services.document_cache import document_cache
+from ..services.change_stream import change_stream_listener
+from ..services.document_events import document_event_publisher
+from ..services.websocket_manager import ws_manager
+from ..services.archive import document_archiver
+from ..services.originals import original_file_store
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+
+@router.get("")
+async def get_metrics() -> Dict[str, Any]:
+    """
+    Get driver and service metrics
+
+    Returns:
+        Dict with MongoDB connection pool metrics and configuration,
+        command latency histograms and slow queries, the document cache
+        hit ratio, change stream invalidation lag, WebSocket event counts,
+        send queue depths and evictions, archiver progress, original file
+        store counts and write-behind insert batching counters
+    """
+    return {
+        "mongodb_pool": {
+            **pool_metrics.snapshot(),
+            "max_pool_size": settings.mongodb_max_pool_size,
+            "min_pool_size": settings.mongodb_min_pool_size,
+        },
+        "mongodb_commands": command_metrics.snapshot(),
+        "document_cache": document_cache.snapshot(),
+        "change_stream": change_stream_listener.snapshot(),
+        "websocket_events": document_event_publisher.snapshot(),
+        "websocket_connections": ws_manager.snapshot(),
+        "archive": document_archiver.snapshot(),
+        "original_files": original_file_store.snapshot(),
+        "insert_batching": db_service.insert_batcher.snapshot(),
+    }
@@ -0,0 +1,140 @@
+"""
+Original file download endpoints
+"""
+from fastapi import APIRouter, Header, HTTPException, Path, status
+from fastapi.responses import StreamingResponse
+from typing import Optional, Tuple
+from urllib.parse import quote
+import logging
+
+from ..config import settings
+from ..services.originals import original_file_store
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/originals", tags=["originals"])
+
+
+def parse_range(range_header: str, length: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range Range header
+
+    Args:
+        range_header: Range header value, e.g. "bytes=0-1023" or "bytes=-500"
+        length: File length in bytes
+
+    Returns:
+        Tuple of (first byte, last byte) clamped to the file, or None if
+        the header is not a byte range this endpoint serves
+
+    Raises:
+        ValueError: If the range lies beyond the end of the file
+    """
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        # Unknown units and multipart ranges are answered with the full file
+        return None
+
+    start_text, _, end_text = spec.strip().partition("-")
+    if not (start_text or end_text) or not (start_text + end_text).isdigit():
+        # Malformed ranges are ignored, as RFC 9110 allows
+        return None
+
+    if not start_text:
+        # Suffix range: the last N bytes
+        suffix = int(end_text)
+        if suffix == 0:
+            raise ValueError("Empty suffix range")
+        return max(length - suffix, 0), length - 1
+
+    start = int(start_text)
+    end = int(end_text) if end_text else length - 1
+    if end_text and start > end:
+        return None
+    if start >= length:
+        raise ValueError(f"Range starts beyond the end of the file ({length} bytes)")
+    return start, min(end, length - 1)
+
+
+@router.get("/{sha256}")
+async def download_original(
+    sha256: str = Path(..., pattern="^[0-9a-f]{64}$"),
+    range_header: Optional[str] = Header(None, alias="Range"),
+):
+    """
+    Download an original file, whole or by byte range
+
+    A single byte range (Range: bytes=start-end, start- or -suffix) is
+    answered with 206 Partial Content, streaming only the GridFS chunks
+    it covers. Originals are immutable, so their content hash is used
+    as a strong ETag.
+
+    Args:
+        sha256: Content hash of the original file
+        range_header: Range header (optional)
+
+    Returns:
+        StreamingResponse with the file contents
+
+    Raises:
+        HTTPException: If the file is not stored or the range is not
+            satisfiable, or 501 without the MongoDB storage backend
+    """
+    if settings.storage_backend != "mongodb":
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Original files require the MongoDB storage backend",
+        )
+
+    try:
+        info = await original_file_store.get_info(sha256)
+    except Exception as e:
+        logger.error(f"Error getting original file: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to get original file: {str(e)}",
+        )
+
+    if info is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Original file not found: {sha256}",
+        )
+
+    length = info["length"]
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": f'"{sha256}"',
+        "Cache-Control": "private, max-age=31536000, immutable",
+        "Content-Disposition": f"inline; filename*=UTF-8''{quote(info['file_name'] or sha256)}",
+    }
+
+    byte_range = None
+    if range_header:
+        try:
+            byte_range = parse_range(range_header, length)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                detail=str(e),
+                headers={"Content-Range": f"bytes */{length}"},
+            )
+
+    if length == 0:
+        return StreamingResponse(
+            iter([b""]),
+            media_type=info["content_type"],
+            headers={**headers, "Content-Length": "0"},
+        )
+
+    start, end = byte_range or (0, length - 1)
+    headers["Content-Length"] = str(end - start + 1)
+    if byte_range is not None:
+        headers["Content-Range"] = f"bytes {start}-{end}/{length}"
+
+    return StreamingResponse(
+        original_file_store.stream(info["_id"], start, end),
+        status_code=status.HTTP_206_PARTIAL_CONTENT if byte_range else status.HTTP_200_OK,
+        media_type=info["content_type"],
+        headers=headers,
+    )
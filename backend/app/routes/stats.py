@@ -1,11 +1,22 @@
 """
 Statistics API endpoints
 """
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Header, HTTPException, Request, Response, status
+from datetime import date
+from typing import Literal, Optional
 import logging
 
-from ..models.document import StatsResponse
-from ..services.database import db_service
+from ..config import settings
+from ..models.document import (
+    InvoiceRollupResponse,
+    InvoiceRollupRow,
+    StatsResponse,
+    TierStatsResponse,
+)
+from ..services.database import document_store
+from ..services.versions import version_registry
+from ..utils.rollups import group_buckets, rollup_totals
+from .conditional import not_modified, query_key, set_etag
 
 logger = logging.getLogger(__name__)
 
@@ -13,19 +24,31 @@ router = APIRouter(prefix="/stats", tags=["statistics"])
 
 
 @router.get("", response_model=StatsResponse)
-async def get_stats():
+async def get_stats(response: Response, if_none_match: Optional[str] = Header(None)):
     """
     Get document statistics
 
+    Responses carry an ETag; a request whose If-None-Match still matches
+    is answered with 304 without querying MongoDB.
+
+    Args:
+        if_none_match: ETag of the client's copy (optional)
+
     Returns:
         StatsResponse with document counts by type
 
     Raises:
         HTTPException: If stats retrieval fails
     """
+    etag = version_registry.collection_etag("stats")
+    cached = not_modified(if_none_match, etag)
+    if cached is not None:
+        return cached
+
     try:
-        stats = await db_service.get_stats()
+        stats = await document_store.get_stats()
 
+        set_etag(response, etag)
         return StatsResponse(
             total=stats["total"],
             government_id=stats["government_id"],
@@ -38,3 +61,116 @@ async def get_stats():
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to get statistics: {str(e)}",
         )
+
+
+@router.get("/tiers", response_model=TierStatsResponse)
+async def get_tier_stats():
+    """
+    Get the size of the hot and archive storage tiers
+
+    Returns:
+        TierStatsResponse with document count, data size, on-disk size
+        and index size of each tier
+
+    Raises:
+        HTTPException: 501 without storage tiers, 500 if stats retrieval fails
+    """
+    try:
+        tiers = await document_store.tier_stats()
+
+        return TierStatsResponse(
+            **tiers,
+            archive_after_days=settings.archive_after_days,
+        )
+
+    except NotImplementedError as e:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail=str(e),
+        )
+    except Exception as e:
+        logger.error(f"Error getting tier stats: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to get tier statistics: {str(e)}",
+        )
+
+
+@router.get("/invoices", response_model=InvoiceRollupResponse)
+async def get_invoice_stats(
+    request: Request,
+    response: Response,
+    granularity: Literal["day", "month"] = "month",
+    group_by: Literal["period", "seller", "period_seller"] = "period",
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    seller_gstin: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    Get invoice totals by period and seller
+
+    Sums summary.grand_total, sgst_amount and cgst_amount of invoices
+    from rollups maintained on every write, so the cost depends on the
+    number of periods and sellers in the range, not on invoices.
+    Invoices are dated by invoice_details.date, or their creation date
+    when it is missing.
+
+    Args:
+        granularity: Bucket by "day" or "month"
+        group_by: "period" for totals per period, "seller" for totals per
+            seller GSTIN over the range, "period_seller" for both
+        date_from: First day, inclusive (optional)
+        date_to: Last day, inclusive (optional); months starting or
+            ending inside the range are included whole
+        seller_gstin: Only this seller's invoices (optional)
+        if_none_match: ETag of the client's copy (optional)
+
+    Returns:
+        InvoiceRollupResponse with one row per group and the range totals
+
+    Raises:
+        HTTPException: 400 for an empty date range, 501 if the storage
+            backend has no rollups, 500 if retrieval fails
+    """
+    if date_from is not None and date_to is not None and date_from > date_to:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="date_from must not be after date_to",
+        )
+
+    etag = version_registry.collection_etag("stats", f"invoices?{query_key(request)}")
+    cached = not_modified(if_none_match, etag)
+    if cached is not None:
+        return cached
+
+    try:
+        buckets = await document_store.invoice_rollups(
+            granularity,
+            date_from=date_from,
+            date_to=date_to,
+            seller_gstin=seller_gstin,
+        )
+        rows = group_buckets(buckets, group_by)
+
+        set_etag(response, etag)
+        return InvoiceRollupResponse(
+            granularity=granularity,
+            group_by=group_by,
+            date_from=date_from.isoformat() if date_from else None,
+            date_to=date_to.isoformat() if date_to else None,
+            rows=[InvoiceRollupRow(**row) for row in rows],
+            totals=InvoiceRollupRow(**rollup_totals(rows)),
+        )
+
+    except NotImplementedError as e:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail=str(e),
+        )
+    except Exception as e:
+        logger.error(f"Error getting invoice stats: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to get invoice statistics: {str(e)}",
+        )
@@ -1,8 +1,30 @@
 """
 Business logic services
 """
+from .storage import DocumentStore
 from .database import DatabaseService
+from .sqlite_store import SQLiteDocumentStore
 from .llamaparse import LlamaParseService
 from .websocket_manager import WebSocketManager
+from .monitoring import PoolMetrics
+from .document_cache import DocumentCache
+from .change_stream import ChangeStreamListener
+from .versions import VersionRegistry
+from .document_events import DocumentEventPublisher
+from .archive import DocumentArchiver
+from .originals import OriginalFileStore
 
-__all__ = ["DatabaseService", "LlamaParseService", "WebSocketManager"]
+__all__ = [
+    "DocumentStore",
+    "DatabaseService",
+    "SQLiteDocumentStore",
+    "LlamaParseService",
+    "WebSocketManager",
+    "PoolMetrics",
+    "DocumentCache",
+    "ChangeStreamListener",
+    "VersionRegistry",
+    "DocumentEventPublisher",
+    "DocumentArchiver",
+    "OriginalFileStore",
+]
@@ -0,0 +1,153 @@
+"""
+Hot/cold tiering of old documents
+"""
+from pymongo import DeleteOne, ReplaceOne
+from typing import Any, Dict, Optional
+from datetime import datetime, timedelta
+import asyncio
+import logging
+
+from ..config import settings
+from ..utils.dates import utc_now
+from .database import DatabaseService, db_service
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentArchiver:
+    """
+    Moves documents older than settings.archive_after_days to the archive
+
+    Each pass copies batches of the oldest hot documents into the
+    zstd-compressed archive collection and then deletes them from the
+    hot collection, pausing between batches to limit the load. A hot
+    document is only deleted if it is still at the copied version; a
+    document updated in between stays hot, its archive copy is dropped,
+    and the next pass retries it. A document deleted by a client while
+    it was being copied has its copy dropped too, so it cannot come back
+    from the archive; deletes made after the copy remove it from both
+    tiers themselves. Copies are upserts by id, so an interrupted pass
+    is safely repeated.
+
+    Only one replica archives at a time, holding a lease in the
+    "leases" collection.
+    """
+
+    def __init__(self, database: DatabaseService):
+        self.database = database
+        self.lease_id = "archiver"
+        self.passes = 0
+        self.archived = 0
+        self.last_pass_at: Optional[datetime] = None
+        self.last_pass_archived = 0
+
+    async def run(self, interval_seconds: float):
+        """
+        Run archive passes periodically until cancelled
+
+        Args:
+            interval_seconds: Delay between passes
+        """
+        while True:
+            try:
+                if await self.database.acquire_lease(self.lease_id, interval_seconds * 2):
+                    await self.archive_pass()
+            except Exception as e:
+                logger.error(f"Archive pass failed: {e}")
+            await asyncio.sleep(interval_seconds)
+
+    async def archive_pass(self) -> int:
+        """
+        Archive every hot document older than the configured age
+
+        Returns:
+            Number of documents moved to the archive
+        """
+        hot = self.database.db[self.database.collection_name]
+        archive = self.database.db[self.database.archive_collection_name]
+        cutoff = utc_now() - timedelta(days=settings.archive_after_days)
+
+        archived = 0
+        while True:
+            documents = await (
+                hot.find({"created_at": {"$lt": cutoff}})
+                .sort("created_at", 1)
+                .limit(settings.archive_batch_size)
+                .to_list(length=settings.archive_batch_size)
+            )
+            if not documents:
+                break
+
+            await archive.bulk_write(
+                [
+                    ReplaceOne({"id": document["id"]}, document, upsert=True)
+                    for document in documents
+                ],
+                ordered=False,
+            )
+
+            # Deleted by a client before the copy was written: drop the copy
+            present = {
+                document["_id"]
+                async for document in hot.find(
+                    {"_id": {"$in": [document["_id"] for document in documents]}},
+                    {"_id": 1},
+                )
+            }
+            gone = [document["id"] for document in documents if document["_id"] not in present]
+            if gone:
+                await archive.delete_many({"id": {"$in": gone}})
+                documents = [document for document in documents if document["_id"] in present]
+                if not documents:
+                    continue
+
+            result = await hot.bulk_write(
+                [
+                    DeleteOne({"_id": document["_id"], "version": document.get("version")})
+                    for document in documents
+                ],
+                ordered=False,
+            )
+            archived += result.deleted_count
+
+            if result.deleted_count < len(documents):
+                # Updated since the copy: keep the hot document, drop the copy
+                changed = [
+                    document["id"]
+                    async for document in hot.find(
+                        {"_id": {"$in": [document["_id"] for document in documents]}},
+                        {"_id": 0, "id": 1},
+                    )
+                ]
+                await archive.delete_many({"id": {"$in": changed}})
+
+            if len(documents) < settings.archive_batch_size:
+                break
+            await asyncio.sleep(settings.archive_batch_pause_seconds)
+
+        self.passes += 1
+        self.archived += archived
+        self.last_pass_at = utc_now()
+        self.last_pass_archived = archived
+        logger.info(f"Archived {archived} documents created before {cutoff.isoformat()}")
+        return archived
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get the archiver counters
+
+        Returns:
+            Dict with pass and archived document counts
+        """
+        return {
+            "enabled": settings.archive_after_days is not None,
+            "archive_after_days": settings.archive_after_days,
+            "passes_total": self.passes,
+            "archived_total": self.archived,
+            "last_pass_at": self.last_pass_at.isoformat() if self.last_pass_at else None,
+            "last_pass_archived": self.last_pass_archived,
+        }
+
+
+# Global document archiver
+document_archiver = DocumentArchiver(db_service)
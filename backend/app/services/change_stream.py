@@ -0,0 +1,242 @@
+"""
+MongoDB change stream listener for cross-replica notifications
+"""
+from motor.motor_asyncio import AsyncIOMotorCollection, AsyncIOMotorDatabase
+from pymongo.errors import OperationFailure, PyMongoError
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+from datetime import datetime, timezone
+import asyncio
+import logging
+import time
+
+from ..config import settings
+from ..utils.dates import utc_now
+from ..utils.ids import from_stored_id
+
+logger = logging.getLogger(__name__)
+
+# Server errors after which a resume token can no longer be used
+# (ChangeStreamFatalError, ChangeStreamHistoryLost)
+NON_RESUMABLE_ERROR_CODES = {280, 286}
+
+# Updates are described by their changed fields; only the id and type of
+# updated and deleted documents are needed from pre-images
+WATCH_PIPELINE = [
+    {
+        "$project": {
+            "operationType": 1,
+            "ns": 1,
+            "documentKey": 1,
+            "fullDocument": 1,
+            "updateDescription": 1,
+            "fullDocumentBeforeChange.id": 1,
+            "fullDocumentBeforeChange.document_type": 1,
+            "clusterTime": 1,
+            "wallTime": 1,
+        }
+    }
+]
+
+ChangeHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+ResetHandler = Callable[[], None]
+
+
+class ChangeStreamListener:
+    """
+    Watches collections and dispatches each change to subscribed handlers
+
+    Every replica runs its own listener, so writes made through any
+    replica reach all of them. Change streams need a replica set; on a
+    standalone server the listener logs a warning and keeps retrying.
+
+    The resume token is checkpointed per consumer, so a restarted
+    replica replays the changes it missed (at least once) instead of
+    skipping them. Checkpoints older than max_replay_seconds are not
+    resumed from, to avoid replaying a long outage to live clients.
+    When the stream starts without being able to resume, reset handlers
+    are called because events may have been missed.
+    """
+
+    def __init__(self, checkpoint_interval_seconds: float, max_replay_seconds: float):
+        self.checkpoint_interval_seconds = checkpoint_interval_seconds
+        self.max_replay_seconds = max_replay_seconds
+        self._handlers: List[ChangeHandler] = []
+        self._reset_handlers: List[ResetHandler] = []
+        self._resume_token: Optional[Dict[str, Any]] = None
+        self._checkpointed_token: Optional[Dict[str, Any]] = None
+        self.running = False
+        self.events = 0
+        self.restarts = 0
+
+    def subscribe(self, handler: ChangeHandler, on_reset: Optional[ResetHandler] = None):
+        """
+        Register a handler for change events
+
+        Args:
+            handler: Coroutine function called with each change event
+            on_reset: Called when events may have been missed (optional)
+        """
+        self._handlers.append(handler)
+        if on_reset is not None:
+            self._reset_handlers.append(on_reset)
+
+    async def run(
+        self,
+        target: Union[AsyncIOMotorCollection, AsyncIOMotorDatabase],
+        retry_seconds: float,
+        checkpoints: Optional[AsyncIOMotorCollection] = None,
+        consumer_id: Optional[str] = None,
+        collections: Optional[List[str]] = None,
+    ):
+        """
+        Consume the change stream of a collection or database until cancelled
+
+        Update events carry the changed fields, and update and delete
+        events the id and type of the document when pre-images are
+        enabled on the collection.
+
+        Args:
+            target: Collection or database to watch
+            retry_seconds: Delay before reopening a failed stream
+            checkpoints: Collection for resume token checkpoints (optional)
+            consumer_id: Checkpoint key of this consumer, e.g. the replica name
+            collections: Collections of a watched database to keep (optional)
+        """
+        if checkpoints is not None:
+            self._resume_token = await self._load_checkpoint(checkpoints, consumer_id)
+
+        pipeline = WATCH_PIPELINE
+        if collections is not None:
+            pipeline = [{"$match": {"ns.coll": {"$in": collections}}}] + WATCH_PIPELINE
+
+        while True:
+            try:
+                async with target.watch(
+                    pipeline,
+                    full_document_before_change="whenAvailable",
+                    resume_after=self._resume_token,
+                ) as stream:
+                    if self._resume_token is None:
+                        self._reset()
+                    self.running = True
+                    logger.info(f"Watching change stream: {target.name}")
+
+                    checkpointed_at = time.monotonic()
+                    while stream.alive:
+                        change = await stream.try_next()
+                        if change is not None:
+                            self.events += 1
+                            await self._dispatch(change)
+                        # Advances while idle too, keeping the checkpoint in the oplog window
+                        self._resume_token = stream.resume_token
+
+                        if (
+                            checkpoints is not None
+                            and time.monotonic() - checkpointed_at >= self.checkpoint_interval_seconds
+                        ):
+                            await self._save_checkpoint(checkpoints, consumer_id)
+                            checkpointed_at = time.monotonic()
+            except asyncio.CancelledError:
+                if checkpoints is not None:
+                    await self._save_checkpoint(checkpoints, consumer_id)
+                raise
+            except PyMongoError as e:
+                if isinstance(e, OperationFailure) and e.code in NON_RESUMABLE_ERROR_CODES:
+                    self._resume_token = None
+                logger.warning(
+                    f"Change stream on {target.name} unavailable, "
+                    f"retrying in {retry_seconds}s: {e}"
+                )
+            finally:
+                self.running = False
+
+            self.restarts += 1
+            await asyncio.sleep(retry_seconds)
+
+    async def _load_checkpoint(
+        self,
+        checkpoints: AsyncIOMotorCollection,
+        consumer_id: Optional[str],
+    ) -> Optional[Dict[str, Any]]:
+        """Get the checkpointed resume token if it is recent enough to replay from"""
+        try:
+            checkpoint = await checkpoints.find_one({"_id": consumer_id})
+        except PyMongoError as e:
+            logger.warning(f"Failed to load change stream checkpoint: {e}")
+            return None
+
+        if checkpoint is None:
+            return None
+
+        saved_at = checkpoint["saved_at"]
+        if saved_at.tzinfo is None:
+            saved_at = saved_at.replace(tzinfo=timezone.utc)
+        age = (datetime.now(timezone.utc) - saved_at).total_seconds()
+        if age > self.max_replay_seconds:
+            logger.info(f"Ignoring change stream checkpoint from {age:.0f}s ago")
+            return None
+
+        self._checkpointed_token = checkpoint["resume_token"]
+        logger.info(f"Resuming change stream from checkpoint of {consumer_id}")
+        return checkpoint["resume_token"]
+
+    async def _save_checkpoint(
+        self,
+        checkpoints: AsyncIOMotorCollection,
+        consumer_id: Optional[str],
+    ):
+        """Persist the current resume token if it moved"""
+        if self._resume_token is None or self._resume_token == self._checkpointed_token:
+            return
+
+        try:
+            await checkpoints.update_one(
+                {"_id": consumer_id},
+                {"$set": {"resume_token": self._resume_token, "saved_at": utc_now()}},
+                upsert=True,
+            )
+            self._checkpointed_token = self._resume_token
+        except PyMongoError as e:
+            logger.warning(f"Failed to save change stream checkpoint: {e}")
+
+    async def _dispatch(self, change: Dict[str, Any]):
+        """Call every handler, isolating their failures"""
+        # Handlers see document IDs in their API string form
+        for field in ("fullDocument", "fullDocumentBeforeChange"):
+            document = change.get(field)
+            if document and "id" in document:
+                document["id"] = from_stored_id(document["id"])
+
+        for handler in self._handlers:
+            try:
+                await handler(change)
+            except Exception as e:
+                logger.error(f"Change stream handler failed: {e}")
+
+    def _reset(self):
+        """Call every reset handler"""
+        for handler in self._reset_handlers:
+            try:
+                handler()
+            except Exception as e:
+                logger.error(f"Change stream reset handler failed: {e}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get the listener state
+
+        Returns:
+            Dict with running flag and event and restart counts
+        """
+        return {
+            "running": self.running,
+            "events_total": self.events,
+            "restarts_total": self.restarts,
+        }
+
+
+# Global change stream listener for the documents collections
+change_stream_listener = ChangeStreamListener(
+    checkpoint_interval_seconds=settings.change_stream_checkpoint_interval_seconds,
+    max_replay_seconds=settings.change_stream_max_replay_seconds,
+)
@@ -1,101 +1,714 @@
 """
 MongoDB database service for document operations
 """
-from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
-from typing import List, Optional, Dict, Any
-from datetime import datetime
+from motor.motor_asyncio import (
+    AsyncIOMotorClient,
+    AsyncIOMotorCollection,
+    AsyncIOMotorDatabase,
+)
+from pymongo import DeleteOne, ReplaceOne, ReturnDocument, UpdateOne
+from bson import ObjectId
+from bson.decimal128 import Decimal128
+from pymongo.errors import BulkWriteError, CollectionInvalid, DuplicateKeyError, OperationFailure
+from typing import AsyncIterator, Iterable, List, Optional, Dict, Any, Set, Tuple
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+import asyncio
 import logging
+import random
 
 from ..config import settings
 from ..models.document import ExtractedDocument
+from ..utils.dates import normalize_datetimes, utc_now
+from ..utils.ids import from_stored_id, id_condition, stored_id_values, to_stored_id
+from ..utils.patch import apply_update
+from ..utils.projection import apply_projection
+from ..utils.rollups import (
+    ROLLUP_AMOUNTS,
+    ROLLUP_GRANULARITIES,
+    ROLLUP_PATHS,
+    ROLLUP_PROJECTION,
+    ROLLUP_STAGES,
+    period_range,
+    rollup_deltas,
+    touches_rollups,
+)
+from .document_cache import document_cache
+from .storage import DocumentStore
+from .sqlite_store import ChangeHandler, SQLiteDocumentStore
+from .versions import version_registry
+from .insert_batcher import InsertBatcher
+from .monitoring import command_metrics, pool_metrics
+from .read_routing import read_preference_for
+from ..migrations.indexes import INDEX_VERSION, index_version, migrate_indexes
 
 logger = logging.getLogger(__name__)
 
+# Reads and version-guarded writes of a bulk update before a document
+# modified concurrently each time is reported as failed
+UPDATE_ATTEMPTS = 3
 
-class DatabaseService:
+class DatabaseService(DocumentStore):
     """MongoDB database operations service"""
 
     def __init__(self):
         self.client: Optional[AsyncIOMotorClient] = None
         self.db: Optional[AsyncIOMotorDatabase] = None
         self.collection_name = "extracted_documents"
+        # Cold tier for old documents (see DocumentArchiver); reads and
+        # writes fall through to it while it is in use
+        self.archive_collection_name = "extracted_documents_archive"
+        self.archive_in_use = False
+        # Incrementally maintained document counters (see get_stats)
+        self.stats_collection_name = "document_stats"
+        self.stats_counter_id = "documents"
+        # Incrementally maintained invoice totals (see invoice_rollups)
+        self.rollups_collection_name = "invoice_rollups"
+        # Change stream resume tokens per replica (see ChangeStreamListener)
+        self.checkpoints_collection_name = "change_stream_checkpoints"
+        # Periodic jobs run by one replica at a time (see acquire_lease)
+        self.leases_collection_name = "leases"
+        self.originals_bucket_name = "originals"
+        # Filter shapes whose query plan has been checked
+        self._checked_query_shapes: set = set()
+        self._background_tasks: set = set()
+        # Handlers of this replica's writes, used instead of the change
+        # stream when it is unavailable (see subscribe)
+        self._handlers: List[ChangeHandler] = []
+        # Connection state reported by readiness()
+        self.ready = False
+        self._ready_event = asyncio.Event()
+        self.connect_attempts = 0
+        self.last_connect_error: Optional[str] = None
+        self.index_version: Optional[int] = None
+        # Write-behind batching of insert_document (see InsertBatcher)
+        self.insert_batcher = InsertBatcher(
+            settings.insert_batch_window_seconds,
+            settings.insert_batch_max_size,
+            settings.insert_buffer_max_size,
+        )
+
+    def _create_client(self):
+        """Create the client; the driver connects lazily on first use"""
+        if self.client is not None:
+            return
+
+        event_listeners = [pool_metrics]
+        if settings.mongodb_command_monitoring:
+            event_listeners.append(command_metrics)
+
+        self.client = AsyncIOMotorClient(
+            settings.mongodb_url,
+            maxPoolSize=settings.mongodb_max_pool_size,
+            minPoolSize=settings.mongodb_min_pool_size,
+            maxIdleTimeMS=settings.mongodb_max_idle_time_ms,
+            waitQueueTimeoutMS=settings.mongodb_wait_queue_timeout_ms,
+            connectTimeoutMS=settings.mongodb_connect_timeout_ms,
+            serverSelectionTimeoutMS=settings.mongodb_server_selection_timeout_ms,
+            socketTimeoutMS=settings.mongodb_socket_timeout_ms,
+            compressors=settings.mongodb_compressors,
+            event_listeners=event_listeners,
+        )
+        self.db = self.client[settings.mongodb_db_name]
 
     async def connect(self):
-        """Connect to MongoDB"""
+        """
+        Connect to MongoDB and prepare the collections
+
+        Indexes are created by the index migrations
+        (python -m app.migrations.indexes, run by start.sh). A database
+        no migration has run on yet is migrated in the background here,
+        so a fresh deployment never runs without its unique and text
+        indexes; any other database behind the expected index version is
+        logged and reported by readiness().
+
+        Raises:
+            PyMongoError: If MongoDB is unreachable
+        """
         try:
-            self.client = AsyncIOMotorClient(settings.mongodb_url)
-            self.db = self.client[settings.mongodb_db_name]
+            self._create_client()
+            hello = await self.client.admin.command("hello")
+            if settings.change_stream_enabled and not (
+                "setName" in hello or hello.get("msg") == "isdbgrid"
+            ):
+                # Change streams need a replica set or sharded cluster
+                logger.warning(
+                    "MongoDB is a standalone server, disabling the change stream: "
+                    "WebSocket events, cache invalidation and ETags follow this "
+                    "replica's own writes, so run a single backend replica"
+                )
+                settings.change_stream_enabled = False
+
+            self.index_version = await index_version(self.db)
+            if self.index_version < INDEX_VERSION:
+                if settings.migrate_indexes_on_startup or self.index_version == 0:
+                    self._spawn(self._migrate_indexes())
+                else:
+                    logger.warning(
+                        f"Indexes at version {self.index_version}, expected {INDEX_VERSION}: "
+                        "run python -m app.migrations.indexes"
+                    )
+
+            if settings.change_stream_enabled:
+                await self._enable_pre_images(self.collection_name)
+
+            # Use the archive tier when enabled or already holding documents
+            archive = self.db[self.archive_collection_name]
+            self.archive_in_use = (
+                settings.archive_after_days is not None
+                or await archive.estimated_document_count() > 0
+            )
+            if self.archive_in_use and settings.change_stream_enabled:
+                await self._enable_pre_images(self.archive_collection_name)
+
+            # Seed the statistics counters from the existing documents
+            stats_collection = self.db[self.stats_collection_name]
+            if await stats_collection.find_one({"_id": self.stats_counter_id}) is None:
+                await self.reconcile_stats()
+            # Build the invoice rollups of a database that predates them
+            rollups_collection = self.db[self.rollups_collection_name]
+            if await rollups_collection.find_one({}, {"_id": 1}) is None:
+                self._spawn(self.rebuild_invoice_rollups())
 
-            # Create indexes
-            await self._create_indexes()
+            if settings.insert_batch_window_seconds > 0:
+                self.insert_batcher.start(self.insert_documents)
 
+            self.ready = True
+            self.last_connect_error = None
+            self._ready_event.set()
             logger.info(f"Connected to MongoDB: {settings.mongodb_db_name}")
         except Exception as e:
             logger.error(f"Failed to connect to MongoDB: {e}")
             raise
 
+    def connect_in_background(self) -> asyncio.Task:
+        """
+        Connect to MongoDB without blocking, retrying with backoff
+
+        The client is created immediately, so collections can be
+        referenced before the connection is up. Attempts back off
+        exponentially with jitter from mongodb_connect_retry_initial_seconds
+        up to mongodb_connect_retry_max_seconds.
+
+        Returns:
+            Task completing once connected
+        """
+        self._create_client()
+        return self._spawn(self._connect_with_retry())
+
+    async def _connect_with_retry(self):
+        """Call connect until it succeeds"""
+        delay = settings.mongodb_connect_retry_initial_seconds
+        while True:
+            self.connect_attempts += 1
+            try:
+                await self.connect()
+                return
+            except Exception as e:
+                self.last_connect_error = str(e)
+
+            wait = delay * random.uniform(0.5, 1.5)
+            logger.warning(
+                f"MongoDB connection attempt {self.connect_attempts} failed, "
+                f"retrying in {wait:.1f}s"
+            )
+            await asyncio.sleep(wait)
+            delay = min(delay * 2, settings.mongodb_connect_retry_max_seconds)
+
+    async def _migrate_indexes(self):
+        """Apply pending index migrations without blocking startup"""
+        try:
+            self.index_version = await migrate_indexes(self.db)
+        except Exception as e:
+            logger.error(f"Index migration failed: {e}")
+
+    async def wait_until_ready(self):
+        """Wait until connect has succeeded"""
+        await self._ready_event.wait()
+
+    def readiness(self) -> Dict[str, Any]:
+        """
+        Get the connection state for readiness checks
+
+        Returns:
+            Dict with ready, connect_attempts, last_error, index_version
+            and expected_index_version
+        """
+        return {
+            "ready": self.ready,
+            "connect_attempts": self.connect_attempts,
+            "last_error": self.last_connect_error,
+            "index_version": self.index_version,
+            "expected_index_version": INDEX_VERSION,
+        }
+
     async def disconnect(self):
-        """Disconnect from MongoDB"""
+        """Write buffered inserts and disconnect from MongoDB"""
+        for task in list(self._background_tasks):
+            task.cancel()
+        await self.insert_batcher.close()
         if self.client:
             self.client.close()
             logger.info("Disconnected from MongoDB")
 
-    async def _create_indexes(self):
-        """Create necessary indexes for the collection"""
-        collection = self.db[self.collection_name]
+    def subscribe(self, handler: ChangeHandler):
+        """
+        Register a handler for change events of this replica's writes
+
+        Handlers are called with events shaped like those of the change
+        stream, for deployments where it is unavailable.
+
+        Args:
+            handler: Coroutine function called with each change event
+        """
+        self._handlers.append(handler)
+
+    async def _publish(self, changes: List[Dict[str, Any]]):
+        """Notify subscribers of committed changes"""
+        for change in changes:
+            for handler in self._handlers:
+                try:
+                    await handler(change)
+                except Exception as e:
+                    logger.error(f"Change handler failed: {e}")
+
+    def _update_change(
+        self,
+        document_id: str,
+        document_type: str,
+        update: Dict[str, Any],
+        version: int,
+        document: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Build the change event of an update made by this replica
 
-        # Create indexes
-        await collection.create_index("id", unique=True)
-        await collection.create_index("document_type")
-        await collection.create_index("created_at")
+        Args:
+            document_id: Document ID
+            document_type: Type of the document before the update
+            update: The $set/$unset/$push update that was applied
+            version: Version of the document after the update
+            document: The updated document, to read arrays appended to
+                by $push (optional)
 
-        logger.info("Database indexes created successfully")
+        Returns:
+            Change event with an updateDescription like the change stream's
+        """
+        updated = dict(update.get("$set", {}))
+        for path in update.get("$push", {}):
+            value = document
+            for part in path.split("."):
+                value = value.get(part) if isinstance(value, dict) else None
+            updated[path] = value
+        updated["version"] = version
+        return {
+            "operationType": "update",
+            "fullDocumentBeforeChange": {"id": document_id, "document_type": document_type},
+            "updateDescription": {
+                "updatedFields": updated,
+                "removedFields": list(update.get("$unset", {})),
+            },
+        }
+
+    def _tiers(self) -> List[AsyncIOMotorCollection]:
+        """Collections to write through, hot tier first"""
+        tiers = [self.db[self.collection_name]]
+        if self.archive_in_use:
+            tiers.append(self.db[self.archive_collection_name])
+        return tiers
+
+    async def _enable_pre_images(self, collection_name: str):
+        """
+        Record pre-images so change stream update and delete events carry the document id
+
+        Requires MongoDB 6.0+ and a replica set; without them updates and
+        deletes are not broadcast to WebSocket clients.
+
+        Args:
+            collection_name: Collection to record pre-images for
+        """
+        try:
+            await self.db.command(
+                "collMod",
+                collection_name,
+                changeStreamPreAndPostImages={"enabled": True},
+            )
+        except OperationFailure as e:
+            logger.warning(f"Change stream pre-images unavailable: {e}")
 
     async def insert_document(self, document: ExtractedDocument) -> str:
         """
         Insert a new document into the database
 
+        With write-behind batching enabled, the document is written with
+        other inserts arriving in the same batch window and this returns
+        once that batch is written.
+
         Args:
             document: ExtractedDocument to insert
 
         Returns:
             Document ID
         """
+        if self.insert_batcher.running:
+            return await self.insert_batcher.submit(document)
+
         collection = self.db[self.collection_name]
 
-        doc_dict = document.model_dump()
-        # Convert datetime to ISO format string for MongoDB
-        doc_dict["created_at"] = document.created_at.isoformat()
-
-        # Convert extracted_data to dict
-        if hasattr(document.extracted_data, "model_dump"):
-            doc_dict["extracted_data"] = document.extracted_data.model_dump()
+        doc_dict = self._to_mongo(document)
 
         await collection.insert_one(doc_dict)
+        self._written([document.id])
+        await self._increment_stats({document.document_type: 1})
+        await self._apply_rollups(added=[doc_dict])
+        if document.original_sha256:
+            await self._reference_originals({document.original_sha256: 1})
+        await self._publish([{"operationType": "insert", "fullDocument": document.model_dump()}])
         logger.info(f"Inserted document: {document.id}")
 
         return document.id
 
-    async def get_document(self, document_id: str) -> Optional[Dict[str, Any]]:
+    async def insert_documents(
+        self,
+        documents: List[ExtractedDocument],
+        ordered: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        Insert many documents with a single insert_many
+
+        Args:
+            documents: ExtractedDocuments to insert
+            ordered: Stop at the first failing document instead of
+                attempting every document
+
+        Returns:
+            Per-document results with index, id, success and error
+        """
+        collection = self.db[self.collection_name]
+
+        doc_dicts = [self._to_mongo(document) for document in documents]
+        errors: Dict[int, str] = {}
+        try:
+            await collection.insert_many(doc_dicts, ordered=ordered)
+        except BulkWriteError as e:
+            errors = self._bulk_write_errors(e, len(documents), ordered)
+        finally:
+            self._written([document.id for document in documents])
+
+        results = []
+        deltas: Dict[str, int] = {}
+        references: Dict[str, int] = {}
+        for index, document in enumerate(documents):
+            error = errors.get(index)
+            if error is None:
+                deltas[document.document_type] = deltas.get(document.document_type, 0) + 1
+                if document.original_sha256:
+                    references[document.original_sha256] = (
+                        references.get(document.original_sha256, 0) + 1
+                    )
+            results.append(
+                {"index": index, "id": document.id, "success": error is None, "error": error}
+            )
+
+        if deltas:
+            await self._increment_stats(deltas)
+        if references:
+            await self._reference_originals(references)
+        await self._apply_rollups(
+            added=[doc_dict for index, doc_dict in enumerate(doc_dicts) if index not in errors]
+        )
+        await self._publish(
+            [
+                {"operationType": "insert", "fullDocument": document.model_dump()}
+                for index, document in enumerate(documents)
+                if index not in errors
+            ]
+        )
+
+        logger.info(f"Bulk inserted {len(documents) - len(errors)}/{len(documents)} documents")
+        return results
+
+    async def update_documents(
+        self,
+        documents: List[ExtractedDocument],
+        ordered: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        Replace the contents of many existing documents with a single bulk_write
+
+        The original created_at of each document is preserved and its
+        version is incremented. Documents that do not exist are reported
+        as not found and are not written. Archived documents are updated
+        in the archive with a second bulk_write.
+
+        Each update only applies if the document is still at the version
+        read before the write, so the statistics and rollup corrections
+        derived from that read are exact. Documents modified in between
+        are read and written again, up to UPDATE_ATTEMPTS times, and
+        then reported as modified concurrently. A document repeated in
+        the batch is written once per round, in order.
+
+        Args:
+            documents: ExtractedDocuments with updated data
+            ordered: Stop at the first failing document instead of
+                attempting every document
+
+        Returns:
+            Per-document results with index, id, success and error
+        """
+        updates = [self._replacement_update(document) for document in documents]
+        errors: Dict[int, str] = {}
+        # Document index -> fields of the document the update replaced
+        replaced: Dict[int, Dict[str, Any]] = {}
+        attempts: Dict[int, int] = {}
+        pending = list(range(len(documents)))
+        while pending:
+            # Document id -> (tier position, rollup fields) of existing documents
+            existing: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+            for tier, collection in enumerate(self._tiers()):
+                unread = [documents[index].id for index in pending]
+                async for doc in collection.find(
+                    self._ids_query([id_ for id_ in unread if id_ not in existing]),
+                    {"_id": 0, "id": 1, "version": 1, **ROLLUP_PROJECTION},
+                ):
+                    existing[from_stored_id(doc["id"])] = (tier, doc)
+
+            tier_operations: Dict[int, List[Tuple[int, UpdateOne]]] = {}
+            queued: Set[str] = set()
+            deferred: List[int] = []
+            for index in pending:
+                document = documents[index]
+                if document.id not in existing:
+                    errors[index] = f"Document not found: {document.id}"
+                    if ordered:
+                        break
+                    continue
+                if document.id in queued:
+                    # A repeated document is written after its earlier update
+                    deferred.append(index)
+                    continue
+                queued.add(document.id)
+
+                tier, previous = existing[document.id]
+                tier_operations.setdefault(tier, []).append(
+                    (
+                        index,
+                        UpdateOne(
+                            {**self._id_query(document.id), "version": previous.get("version")},
+                            updates[index],
+                        ),
+                    )
+                )
+
+            conflicts: List[int] = []
+            for tier, collection in enumerate(self._tiers()):
+                indexed_operations = tier_operations.get(tier, [])
+                if ordered and errors:
+                    indexed_operations = [
+                        (index, operation)
+                        for index, operation in indexed_operations
+                        if index < min(errors)
+                    ]
+                if not indexed_operations:
+                    continue
+
+                operation_indexes = [index for index, _ in indexed_operations]
+                try:
+                    result = await collection.bulk_write(
+                        [operation for _, operation in indexed_operations],
+                        ordered=ordered,
+                    )
+                    matched = result.matched_count
+                except BulkWriteError as e:
+                    matched = e.details.get("nMatched", 0)
+                    for op_index, error in self._bulk_write_errors(
+                        e, len(indexed_operations), ordered
+                    ).items():
+                        errors[operation_indexes[op_index]] = error
+                finally:
+                    self._written([documents[index].id for index in operation_indexes])
+
+                attempted = [index for index in operation_indexes if index not in errors]
+                applied = set(attempted)
+                if matched < len(attempted):
+                    applied = await self._applied_updates(collection, documents, updates, attempted)
+                for index in attempted:
+                    if index in applied:
+                        replaced[index] = existing[documents[index].id][1]
+                        continue
+                    attempts[index] = attempts.get(index, 0) + 1
+                    if attempts[index] < UPDATE_ATTEMPTS:
+                        conflicts.append(index)
+                    else:
+                        errors[index] = f"Document was modified concurrently: {documents[index].id}"
+
+            pending = sorted(conflicts + deferred)
+
+        if ordered and errors:
+            # Documents after a concurrently modified one may be written
+            first_error = min(errors)
+            for index in range(first_error + 1, len(documents)):
+                if index not in replaced:
+                    errors.setdefault(index, "Not attempted: an earlier document failed")
+
+        results = []
+        deltas: Dict[str, int] = {}
+        removed: List[Dict[str, Any]] = []
+        added: List[Dict[str, Any]] = []
+        changes: List[Dict[str, Any]] = []
+        for index, document in enumerate(documents):
+            error = errors.get(index)
+            if error is None:
+                previous = replaced[index]
+                removed.append(previous)
+                added.append({**previous, **updates[index]["$set"]})
+                changes.append(
+                    self._update_change(
+                        document.id,
+                        previous["document_type"],
+                        updates[index],
+                        previous.get("version", 0) + 1,
+                    )
+                )
+                previous_type = previous["document_type"]
+                if previous_type != document.document_type:
+                    deltas[previous_type] = deltas.get(previous_type, 0) - 1
+                    deltas[document.document_type] = deltas.get(document.document_type, 0) + 1
+            results.append(
+                {"index": index, "id": document.id, "success": error is None, "error": error}
+            )
+
+        if deltas:
+            await self._increment_stats(deltas)
+        await self._apply_rollups(removed, added)
+        await self._publish(changes)
+
+        logger.info(f"Bulk updated {len(documents) - len(errors)}/{len(documents)} documents")
+        return results
+
+    async def delete_documents(self, document_ids: List[str]) -> List[Dict[str, Any]]:
+        """
+        Delete many documents by ID with a single delete_many per tier
+
+        Args:
+            document_ids: Document IDs
+
+        Returns:
+            Per-document results with index, id, success and error
+        """
+        existing: Dict[str, Dict[str, Any]] = {}
+        references: Dict[str, int] = {}
+        for collection in self._tiers():
+            if existing:
+                # Copies an archive pass wrote before this delete
+                await collection.delete_many(self._ids_query(list(existing)))
+
+            tier_existing = {}
+            async for doc in collection.find(
+                self._ids_query([id_ for id_ in document_ids if id_ not in existing]),
+                {"_id": 0, "id": 1, "original_sha256": 1, **ROLLUP_PROJECTION},
+            ):
+                tier_existing[from_stored_id(doc["id"])] = doc
+                if doc.get("original_sha256"):
+                    references[doc["original_sha256"]] = references.get(doc["original_sha256"], 0) - 1
+            if not tier_existing:
+                continue
+
+            try:
+                await collection.delete_many(self._ids_query(list(tier_existing)))
+            finally:
+                self._written(list(tier_existing))
+            existing.update(tier_existing)
+
+        results = []
+        deltas: Dict[str, int] = {}
+        removed: List[Dict[str, Any]] = []
+        for index, document_id in enumerate(document_ids):
+            deleted = existing.pop(document_id, None)
+            if deleted is not None:
+                deltas[deleted["document_type"]] = deltas.get(deleted["document_type"], 0) - 1
+                removed.append(deleted)
+                error = None
+            else:
+                error = f"Document not found: {document_id}"
+            results.append(
+                {"index": index, "id": document_id, "success": error is None, "error": error}
+            )
+
+        if deltas:
+            await self._increment_stats(deltas)
+        if references:
+            await self._reference_originals(references)
+        await self._apply_rollups(removed=removed)
+        await self._publish(
+            [
+                {
+                    "operationType": "delete",
+                    "fullDocumentBeforeChange": {
+                        "id": from_stored_id(deleted["id"]),
+                        "document_type": deleted["document_type"],
+                    },
+                }
+                for deleted in removed
+            ]
+        )
+
+        logger.info(f"Bulk deleted {-sum(deltas.values())}/{len(document_ids)} documents")
+        return results
+
+    async def get_document(
+        self,
+        document_id: str,
+        projection: Optional[Dict[str, int]] = None,
+    ) -> Optional[Dict[str, Any]]:
         """
         Get a document by ID
 
+        Reads go through the document cache when it is enabled, with the
+        projection applied to the cached document. Documents missing from
+        the hot collection are looked up in the archive.
+
         Args:
             document_id: Document ID
+            projection: MongoDB projection (optional, full document by default)
 
         Returns:
             Document dict or None if not found
         """
-        collection = self.db[self.collection_name]
-        document = await collection.find_one({"id": document_id}, {"_id": 0})
+        if document_cache.enabled:
+            document = await document_cache.get(document_id, self._load_document)
+            return apply_projection(document, projection) if document else None
 
-        return document
+        collection = self._read_collection("get")
+        document = await collection.find_one(self._id_query(document_id), projection or {"_id": 0})
+        if document is None and self.archive_in_use:
+            archive = self._read_collection("get", self.archive_collection_name)
+            document = await archive.find_one(self._id_query(document_id), projection or {"_id": 0})
+
+        return self._from_mongo(document) if document else None
+
+    async def _load_document(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Load a full document with its _id for the document cache
+
+        Cache fills always read the primary, so an invalidation is never
+        followed by a stale refill from a lagging secondary.
+        """
+        document = None
+        for collection in self._tiers():
+            document = await collection.find_one(self._id_query(document_id))
+            if document is not None:
+                break
+
+        return self._from_mongo(document) if document else None
 
     async def get_documents(
         self,
         document_type: Optional[str] = None,
         limit: int = 100,
         offset: int = 0,
+        projection: Optional[Dict[str, int]] = None,
+        filters: Optional[Dict[str, Any]] = None,
     ) -> List[Dict[str, Any]]:
         """
         Get documents with optional filtering
@@ -104,132 +717,1135 @@ class DatabaseService:
             document_type: Filter by document type (optional)
             limit: Maximum number of documents to return
             offset: Number of documents to skip
+            projection: MongoDB projection (optional, full documents by default)
+            filters: extracted_data conditions from parse_filters (optional)
 
         Returns:
             List of document dicts
         """
-        collection = self.db[self.collection_name]
+        collection = self._read_collection("list")
 
         # Build query
-        query = {}
-        if document_type:
-            query["document_type"] = document_type
+        query = self._document_query(document_type, filters)
 
         # Execute query
         cursor = (
-            collection.find(query, {"_id": 0})
+            collection.find(query, projection or {"_id": 0})
             .sort("created_at", -1)
             .skip(offset)
             .limit(limit)
         )
 
         documents = await cursor.to_list(length=limit)
-        return documents
+        return [self._from_mongo(document) for document in documents]
+
+    async def list_documents(
+        self,
+        document_type: Optional[str] = None,
+        limit: int = 100,
+        offset: int = 0,
+        exact_total: bool = True,
+        projection: Optional[Dict[str, int]] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Get a page of documents together with the total count
+
+        The page query runs concurrently with the count: count_documents
+        with exact_total, otherwise an estimated count (collection
+        metadata for unfiltered listings, the maintained statistics
+        counters for type-filtered ones). Totals for extracted_data
+        filters are always counted exactly.
+
+        Archived documents are older than every hot document, so they
+        follow the hot ones: a page reaching past the end of the hot
+        collection is completed from the archive.
+
+        Args:
+            document_type: Filter by document type (optional)
+            limit: Maximum number of documents to return
+            offset: Number of documents to skip
+            exact_total: Whether the total must be an exact count
+            projection: MongoDB projection (optional, full documents by default)
+            filters: extracted_data conditions from parse_filters (optional)
+
+        Returns:
+            Tuple of (list of document dicts, total count)
+        """
+        collection = self._read_collection("list")
+
+        query = self._document_query(document_type, filters)
+        if filters:
+            self._check_query_plan(query)
+
+        if exact_total:
+            # The page query can walk the created_at index, which it could
+            # not inside a $facet; the counts run alongside it
+            counts = [collection.count_documents(query)]
+            if self.archive_in_use:
+                counts.append(self._count_archive(query))
+            documents, hot_total, *archive_totals = await asyncio.gather(
+                self.get_documents(
+                    document_type=document_type,
+                    limit=limit,
+                    offset=offset,
+                    projection=projection,
+                    filters=filters,
+                ),
+                *counts,
+            )
+            archive_total = sum(archive_totals)
+            if self.archive_in_use and len(documents) < limit and archive_total:
+                documents += await self._list_archive(
+                    query, offset, limit, documents, hot_total, projection
+                )
+            return documents, hot_total + archive_total
 
-    async def delete_document(self, document_id: str) -> bool:
+        documents, total = await asyncio.gather(
+            self.get_documents(
+                document_type=document_type,
+                limit=limit,
+                offset=offset,
+                projection=projection,
+                filters=filters,
+            ),
+            self.count_documents(document_type=document_type, filters=filters)
+            if filters
+            else self.estimate_count(document_type=document_type),
+        )
+        if self.archive_in_use and len(documents) < limit:
+            documents += await self._list_archive(query, offset, limit, documents, None, projection)
+        return documents, total
+
+    async def _list_archive(
+        self,
+        query: Dict[str, Any],
+        offset: int,
+        limit: int,
+        hot_documents: List[Dict[str, Any]],
+        hot_total: Optional[int],
+        projection: Optional[Dict[str, int]],
+    ) -> List[Dict[str, Any]]:
+        """
+        Get the archived part of a page whose hot part came up short
+
+        Args:
+            query: Documents query
+            offset: Page offset across both tiers
+            limit: Page size
+            hot_documents: Documents of the page from the hot collection
+            hot_total: Number of matching hot documents, if already counted
+            projection: MongoDB projection (optional)
+
+        Returns:
+            Archived documents completing the page
+        """
+        if hot_total is None:
+            if hot_documents:
+                # A short non-empty page ends exactly at the last hot document
+                hot_total = offset + len(hot_documents)
+            else:
+                hot_total = await self._read_collection("list").count_documents(query)
+
+        archive = self._read_collection("list", self.archive_collection_name)
+        cursor = (
+            archive.find(query, projection or {"_id": 0})
+            .sort("created_at", -1)
+            .skip(max(0, offset - hot_total))
+            .limit(limit - len(hot_documents))
+        )
+        documents = await cursor.to_list(length=limit - len(hot_documents))
+        return [self._from_mongo(document) for document in documents]
+
+    async def _count_archive(self, query: Dict[str, Any]) -> int:
+        """Count matching archived documents"""
+        archive = self._read_collection("list", self.archive_collection_name)
+        if not query:
+            return await archive.estimated_document_count()
+        return await archive.count_documents(query)
+
+    def export_documents(
+        self,
+        document_type: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream every matching document, oldest first
+
+        Reads one cursor per tier, archive first, in batches of
+        settings.export_batch_size, so only one batch is held in memory
+        at a time. The read preference is resolved when this is called,
+        within the request, not when a streaming response is iterated.
+
+        Args:
+            document_type: Filter by document type (optional)
+            created_from: Earliest created_at, inclusive (optional)
+            created_to: Latest created_at, exclusive (optional)
+            filters: extracted_data conditions from parse_filters (optional)
+
+        Returns:
+            Async iterator of document dicts
+        """
+        query = self._document_query(document_type, filters)
+        created_at: Dict[str, datetime] = {}
+        if created_from is not None:
+            created_at["$gte"] = created_from
+        if created_to is not None:
+            created_at["$lt"] = created_to
+        if created_at:
+            query["created_at"] = created_at
+
+        collection_names = [self.collection_name]
+        if self.archive_in_use:
+            collection_names.insert(0, self.archive_collection_name)
+
+        collections = [
+            self._read_collection("export", collection_name) for collection_name in collection_names
+        ]
+        return self._export_cursors(collections, query)
+
+    async def _export_cursors(
+        self,
+        collections: List[AsyncIOMotorCollection],
+        query: Dict[str, Any],
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield the documents matching a query from each collection in turn"""
+        for collection in collections:
+            cursor = (
+                collection.find(query, {"_id": 0})
+                .sort("created_at", 1)
+                .batch_size(settings.export_batch_size)
+            )
+            try:
+                async for document in cursor:
+                    yield self._from_mongo(document)
+            finally:
+                await cursor.close()
+
+    async def search_documents(
+        self,
+        query: str,
+        document_type: Optional[str] = None,
+        limit: int = 20,
+        after: Optional[Tuple[float, ObjectId]] = None,
+        projection: Optional[Dict[str, int]] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[Tuple[float, ObjectId]]]:
+        """
+        Full-text search over names, identifiers and file names
+
+        Results are ranked by text score and paginated by keyset on
+        (score, _id), so later pages do not re-read earlier ones.
+
+        Args:
+            query: Search terms (MongoDB $text syntax, quotes for phrases)
+            document_type: Filter by document type (optional)
+            limit: Maximum number of documents to return
+            after: (score, _id) of the last document of the previous page
+            projection: MongoDB projection (optional, full documents by default)
+
+        Returns:
+            Tuple of (list of document dicts, position of the last document
+            or None when there are no more results)
+        """
+        collection = self._read_collection("search")
+
+        match: Dict[str, Any] = {"$text": {"$search": query}}
+        if document_type:
+            match["document_type"] = document_type
+
+        pipeline: List[Dict[str, Any]] = [
+            {"$match": match},
+            {"$addFields": {"_score": {"$meta": "textScore"}}},
+        ]
+        if after is not None:
+            score, last_id = after
+            pipeline.append(
+                {
+                    "$match": {
+                        "$or": [
+                            {"_score": {"$lt": score}},
+                            {"_score": score, "_id": {"$gt": last_id}},
+                        ]
+                    }
+                }
+            )
+        pipeline += [
+            {"$sort": {"_score": -1, "_id": 1}},
+            {"$limit": limit + 1},
+        ]
+        if projection and projection != {"_id": 0}:
+            pipeline.append({"$project": {**projection, "_id": 1, "_score": 1}})
+
+        documents = await collection.aggregate(pipeline).to_list(length=limit + 1)
+
+        next_position = None
+        if len(documents) > limit:
+            documents = documents[:limit]
+            next_position = (documents[-1]["_score"], documents[-1]["_id"])
+
+        for document in documents:
+            document.pop("_id")
+            document.pop("_score")
+            self._from_mongo(document)
+
+        return documents, next_position
+
+    async def estimate_count(self, document_type: Optional[str] = None) -> int:
+        """
+        Estimate the number of documents without scanning the collection
+
+        Args:
+            document_type: Filter by document type (optional)
+
+        Returns:
+            Approximate number of documents
+        """
+        collection = self._read_collection("list")
+
+        if not document_type:
+            count = await collection.estimated_document_count()
+            if self.archive_in_use:
+                count += await self._count_archive({})
+            return count
+
+        stats = await self.get_stats()
+        return stats.get(document_type, 0)
+
+    async def delete_document(
+        self,
+        document_id: str,
+        projection: Optional[Dict[str, int]] = None,
+    ) -> Optional[Dict[str, Any]]:
         """
-        Delete a document by ID
+        Delete a document by ID in a single find_one_and_delete
+
+        A document deleted from the hot collection is also removed from
+        the archive, where an archive pass running at the same time may
+        have copied it.
 
         Args:
             document_id: Document ID
+            projection: Fields of the deleted document to return
+                (optional, full document by default)
 
         Returns:
-            True if deleted, False if not found
+            The deleted document, or None if not found
         """
-        collection = self.db[self.collection_name]
-        result = await collection.delete_one({"id": document_id})
+        requested = projection
+        projection = dict(projection or {"_id": 0})
+        if any(projection.get(field) for field in projection if field != "_id"):
+            # Also read what the counters, file links and rollups need,
+            # skipping paths whose parent is already included
+            for path in ("original_sha256",) + ROLLUP_PATHS:
+                parts = path.split(".")
+                if not any(".".join(parts[:i]) in projection for i in range(1, len(parts) + 1)):
+                    projection[path] = 1
+
+        deleted = None
+        for collection in self._tiers():
+            if deleted is not None:
+                # A copy an archive pass wrote before this delete
+                await collection.delete_many(self._id_query(document_id))
+                continue
+            deleted = await collection.find_one_and_delete(
+                self._id_query(document_id),
+                projection=projection,
+            )
+
+        self._written([document_id])
 
-        if result.deleted_count > 0:
+        if deleted is not None:
+            await self._increment_stats({deleted["document_type"]: -1})
+            if deleted.get("original_sha256"):
+                await self._reference_originals({deleted["original_sha256"]: -1})
+            await self._apply_rollups(removed=[deleted])
+            await self._publish(
+                [
+                    {
+                        "operationType": "delete",
+                        "fullDocumentBeforeChange": {
+                            "id": document_id,
+                            "document_type": deleted["document_type"],
+                        },
+                    }
+                ]
+            )
             logger.info(f"Deleted document: {document_id}")
-            return True
+            return apply_projection(self._from_mongo(deleted), requested)
 
         logger.warning(f"Document not found for deletion: {document_id}")
-        return False
+        return None
 
-    async def update_document(self, document: ExtractedDocument) -> bool:
+    async def update_document(self, document: ExtractedDocument) -> Optional[Dict[str, Any]]:
         """
-        Update an existing document
+        Update an existing document in a single find_one_and_update
+
+        Replaces the document contents, keeping its created_at and
+        incrementing its version. The previous document is returned by
+        the update and the updated one is derived from it, so the
+        statistics counters and invoice rollups need no extra read.
 
         Args:
             document: ExtractedDocument with updated data
 
         Returns:
-            True if updated, False if not found
+            The updated document, or None if not found
         """
-        collection = self.db[self.collection_name]
+        update = self._replacement_update(document)
+        previous = None
+        for collection in self._tiers():
+            previous = await collection.find_one_and_update(
+                self._id_query(document.id),
+                update,
+                projection={"_id": 0},
+                return_document=ReturnDocument.BEFORE,
+            )
+            if previous is not None:
+                break
+        self._written([document.id])
 
-        doc_dict = document.model_dump()
-        doc_dict["created_at"] = document.created_at.isoformat()
+        if previous is None:
+            logger.warning(f"Document not found for update: {document.id}")
+            return None
 
-        # Convert extracted_data to dict
-        if hasattr(document.extracted_data, "model_dump"):
-            doc_dict["extracted_data"] = document.extracted_data.model_dump()
+        if previous["document_type"] != document.document_type:
+            await self._increment_stats(
+                {previous["document_type"]: -1, document.document_type: 1}
+            )
 
-        result = await collection.replace_one(
-            {"id": document.id},
-            doc_dict,
+        updated = {**previous, **update["$set"], "version": previous.get("version", 0) + 1}
+        await self._apply_rollups([previous], [updated])
+        await self._publish(
+            [self._update_change(document.id, previous["document_type"], update, updated["version"])]
         )
+        logger.info(f"Updated document: {document.id}")
+        return self._from_mongo(updated)
+
+    async def patch_document(
+        self,
+        document_id: str,
+        patch: Dict[str, Any],
+        expected_version: int,
+    ) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """
+        Apply a compiled patch atomically if the document is at a version
 
-        if result.modified_count > 0 or result.matched_count > 0:
-            logger.info(f"Updated document: {document.id}")
-            return True
+        The update runs as a single find_one_and_update guarded by the
+        version field (documents written before versioning count as
+        version 0) and any conditions of the patch. It returns the
+        replaced document, and the patched one is derived from it.
 
-        logger.warning(f"Document not found for update: {document.id}")
-        return False
+        Args:
+            document_id: Document ID
+            patch: Compiled patch from compile_merge_patch/compile_json_patch
+            expected_version: Version the client last read
+
+        Returns:
+            Tuple of (updated document or None, whether the document exists)
+        """
+        query: Dict[str, Any] = {
+            **self._id_query(document_id),
+            "version": expected_version if expected_version > 0 else None,
+        }
+        query.update(patch["conditions"])
+
+        update = {key: dict(value) for key, value in patch["update"].items()}
+        update.setdefault("$set", {})["updated_at"] = utc_now()
+        update["$inc"] = {"version": 1}
+
+        # The document returned is the one replaced, read atomically with
+        # the write; the patched one is derived from it, so it holds this
+        # patch only, never a concurrent write
+        for collection in self._tiers():
+            previous = await collection.find_one_and_update(
+                query,
+                update,
+                projection={"_id": 0},
+                return_document=ReturnDocument.BEFORE,
+            )
+            if previous is not None:
+                break
+            if await collection.count_documents(self._id_query(document_id), limit=1) > 0:
+                # Exists at another version or a test failed
+                self._written([document_id])
+                return None, True
+        else:
+            return None, False
+
+        self._written([document_id])
+
+        document = apply_update(previous, update)
+        document["version"] = previous.get("version", 0) + 1
+        if touches_rollups(update):
+            if previous["document_type"] != document["document_type"]:
+                await self._increment_stats(
+                    {previous["document_type"]: -1, document["document_type"]: 1}
+                )
+            await self._apply_rollups([previous], [document])
+        await self._publish(
+            [
+                self._update_change(
+                    document_id, previous["document_type"], update, document["version"], document
+                )
+            ]
+        )
+
+        logger.info(f"Patched document: {document_id}")
+        return self._from_mongo(document), True
 
     async def get_stats(self) -> Dict[str, int]:
         """
         Get document statistics
 
+        Reads the counters document maintained by insert, delete and
+        type-changing update, so the cost does not depend on collection
+        size. The counters are rebuilt on first use if missing.
+
         Returns:
             Dict with total, government_id, and invoice counts
         """
+        stats_collection = self._read_collection("stats", self.stats_collection_name)
+        counters = await stats_collection.find_one({"_id": self.stats_counter_id})
+
+        if counters is None:
+            return await self.reconcile_stats()
+
+        return self._build_stats(counters)
+
+    async def tier_stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Get the size of the hot and archive tiers
+
+        Returns:
+            Dict of tier name to document count, uncompressed data size,
+            on-disk storage size and index size in bytes
+        """
+        tiers = {}
+        for tier, collection_name in (
+            ("hot", self.collection_name),
+            ("archive", self.archive_collection_name),
+        ):
+            collection = self._read_collection("stats", collection_name)
+            try:
+                results = await collection.aggregate(
+                    [{"$collStats": {"storageStats": {}}}]
+                ).to_list(length=1)
+            except OperationFailure:
+                # The archive does not exist until tiering is enabled
+                results = []
+            storage = results[0]["storageStats"] if results else {}
+            tiers[tier] = {
+                "documents": storage.get("count", 0),
+                "data_bytes": storage.get("size", 0),
+                "storage_bytes": storage.get("storageSize", 0),
+                "index_bytes": storage.get("totalIndexSize", 0),
+            }
+
+        return tiers
+
+    async def stored_ids(self, collection_name: str, document_ids: List[str]) -> Set[str]:
+        """
+        Find which of the given documents a tier holds
+
+        Args:
+            collection_name: Hot or archive collection name
+            document_ids: Document IDs to look up
+
+        Returns:
+            Set of the IDs present in the collection
+        """
+        collection = self.db[collection_name]
+        return {
+            from_stored_id(document["id"])
+            async for document in collection.find(
+                self._ids_query(document_ids),
+                {"_id": 0, "id": 1},
+            )
+        }
+
+    async def reconcile_stats(self) -> Dict[str, int]:
+        """
+        Recount documents by type and correct the statistics counters
+
+        Corrects any drift between the counters and the collection, e.g.
+        after a crash between a write and its counter update. Archived
+        documents are counted too. The correction is applied as an
+        increment of the difference between the recount and the counters
+        read before it, so writes after the recount are not overwritten;
+        a write racing the recount may leave an error until the next pass.
+
+        Returns:
+            Dict with total, government_id, and invoice counts
+        """
+        collection = self.db[self.collection_name]
+        stats_collection = self.db[self.stats_collection_name]
+        before = await stats_collection.find_one({"_id": self.stats_counter_id}) or {}
+
+        pipeline: List[Dict[str, Any]] = []
+        if self.archive_in_use:
+            pipeline.append({"$unionWith": self.archive_collection_name})
+        pipeline.append({"$group": {"_id": "$document_type", "count": {"$sum": 1}}})
+
+        results = await collection.aggregate(pipeline).to_list(None)
+
+        counted = {"total": 0, "government_id": 0, "invoice": 0}
+        for result in results:
+            counted["total"] += result["count"]
+            if result["_id"] in counted:
+                counted[result["_id"]] = result["count"]
+
+        drift = {
+            name: count - before.get(name, 0)
+            for name, count in counted.items()
+            if count != before.get(name, 0)
+        }
+        if not drift and before:
+            return self._build_stats(before)
+
+        counters = await stats_collection.find_one_and_update(
+            {"_id": self.stats_counter_id},
+            {"$inc": drift},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+
+        logger.info(f"Corrected document statistics drift: {drift}")
+        return self._build_stats(counters)
+
+    async def run_stats_reconciler(self, interval_seconds: float):
+        """
+        Periodically reconcile the statistics counters until cancelled
+
+        Only the replica holding the "stats_reconciler" lease recounts.
+
+        Args:
+            interval_seconds: Delay between reconciliation passes
+        """
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                if await self.acquire_lease("stats_reconciler", interval_seconds * 2):
+                    await self.reconcile_stats()
+            except Exception as e:
+                logger.error(f"Statistics reconciliation failed: {e}")
+
+    async def run_rollup_rebuilder(self, interval_seconds: float):
+        """
+        Periodically rebuild the invoice rollups until cancelled
+
+        Only the replica holding the "invoice_rollups" lease rebuilds, so
+        a deployment runs one full aggregation per interval.
+
+        Args:
+            interval_seconds: Delay between rebuilds
+        """
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                if await self.acquire_lease("invoice_rollups", interval_seconds * 2):
+                    await self.rebuild_invoice_rollups()
+            except Exception as e:
+                logger.error(f"Invoice rollup rebuild failed: {e}")
+
+    async def acquire_lease(self, lease_id: str, ttl_seconds: float) -> bool:
+        """
+        Take or renew a lease for this replica
+
+        Args:
+            lease_id: Name of the job the lease guards
+            ttl_seconds: Time after which another replica may take it over
+
+        Returns:
+            True if this replica holds the lease
+        """
+        leases = self.db[self.leases_collection_name]
+        now = utc_now()
+        try:
+            await leases.find_one_and_update(
+                {
+                    "_id": lease_id,
+                    "$or": [
+                        {"owner": settings.replica_id},
+                        {"expires_at": {"$lt": now}},
+                    ],
+                },
+                {
+                    "$set": {
+                        "owner": settings.replica_id,
+                        "expires_at": now + timedelta(seconds=ttl_seconds),
+                    }
+                },
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # Held by another replica
+            return False
+        return True
+
+    async def invoice_rollups(
+        self,
+        granularity: str,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        seller_gstin: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Read invoice rollup buckets
+
+        Reads only the buckets in the range, one per seller and period,
+        through the granularity, period and seller index, so the cost does
+        not depend on the number of invoices.
+
+        Args:
+            granularity: "day" or "month"
+            date_from: First day (optional)
+            date_to: Last day (optional)
+            seller_gstin: Only this seller's buckets (optional)
+
+        Returns:
+            Buckets with period, seller_gstin ("" if unknown), invoices and
+            amounts, ordered by period and seller
+        """
+        query: Dict[str, Any] = {"granularity": granularity}
+        periods = period_range(granularity, date_from, date_to)
+        if periods:
+            query["period"] = periods
+        if seller_gstin is not None:
+            query["seller_gstin"] = seller_gstin
+
+        collection = self._read_collection("stats", self.rollups_collection_name)
+        cursor = collection.find(query, {"_id": 0, "refreshed_at": 0, "granularity": 0}).sort(
+            [("period", 1), ("seller_gstin", 1)]
+        )
+        buckets = []
+        async for bucket in cursor:
+            for amount in ROLLUP_AMOUNTS:
+                value = bucket.get(amount, 0)
+                bucket[amount] = (
+                    value.to_decimal() if isinstance(value, Decimal128) else Decimal(str(value))
+                )
+            buckets.append(bucket)
+        return buckets
+
+    async def rebuild_invoice_rollups(self) -> int:
+        """
+        Recompute the invoice rollups from the documents
+
+        An aggregation groups invoices of both tiers by seller and day;
+        months are summed from the days. Every bucket is rewritten and
+        buckets no invoice contributes to any more are removed. Corrects
+        drift from writes whose rollup update was lost, e.g. in a crash;
+        a write racing the rebuild may be undone until the next one.
+
+        Returns:
+            Number of buckets written
+        """
         collection = self.db[self.collection_name]
+        rollups_collection = self.db[self.rollups_collection_name]
+        refreshed_at = utc_now()
 
-        # Get total count
-        total = await collection.count_documents({})
+        pipeline: List[Dict[str, Any]] = [ROLLUP_STAGES[0]]
+        if self.archive_in_use:
+            pipeline.append(
+                {"$unionWith": {"coll": self.archive_collection_name, "pipeline": [ROLLUP_STAGES[0]]}}
+            )
+        pipeline.extend(ROLLUP_STAGES[1:])
+        pipeline.append(
+            {
+                "$group": {
+                    "_id": {"seller_gstin": "$seller_gstin", "day": "$day"},
+                    "invoices": {"$sum": 1},
+                    **{amount: {"$sum": f"${amount}"} for amount in ROLLUP_AMOUNTS},
+                }
+            }
+        )
+
+        buckets: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        async for result in collection.aggregate(pipeline):
+            for granularity, length in ROLLUP_GRANULARITIES.items():
+                key = (granularity, result["_id"]["day"][:length], result["_id"]["seller_gstin"])
+                bucket = buckets.setdefault(
+                    key, {"invoices": 0, **{amount: Decimal(0) for amount in ROLLUP_AMOUNTS}}
+                )
+                bucket["invoices"] += result["invoices"]
+                for amount in ROLLUP_AMOUNTS:
+                    value = result[amount]
+                    bucket[amount] += (
+                        value.to_decimal() if isinstance(value, Decimal128) else Decimal(str(value))
+                    )
 
-        # Get counts by type
-        pipeline = [
-            {"$group": {"_id": "$document_type", "count": {"$sum": 1}}}
+        operations = [
+            ReplaceOne(
+                {"_id": self._rollup_id(key)},
+                self._rollup_bucket(key, bucket, refreshed_at),
+                upsert=True,
+            )
+            for key, bucket in buckets.items()
         ]
+        for start in range(0, len(operations), 1000):
+            await rollups_collection.bulk_write(operations[start:start + 1000], ordered=False)
+        # Buckets created by writes since the rebuild started are newer
+        await rollups_collection.delete_many({"refreshed_at": {"$lt": refreshed_at}})
 
-        results = await collection.aggregate(pipeline).to_list(None)
+        logger.info(f"Rebuilt {len(operations)} invoice rollup buckets")
+        return len(operations)
 
-        # Build stats dict
-        stats = {
-            "total": total,
-            "government_id": 0,
-            "invoice": 0,
+    async def _apply_rollups(
+        self,
+        removed: Iterable[Dict[str, Any]] = (),
+        added: Iterable[Dict[str, Any]] = (),
+    ):
+        """
+        Apply the rollup changes of a write
+
+        Args:
+            removed: Previous versions of updated documents and deleted documents
+            added: New versions of updated documents and inserted documents
+        """
+        deltas = rollup_deltas(removed, added)
+        if not deltas:
+            return
+
+        now = utc_now()
+        operations: List[Any] = []
+        for key, delta in deltas.items():
+            operations.append(
+                UpdateOne(
+                    {"_id": self._rollup_id(key)},
+                    {
+                        "$inc": {
+                            "invoices": delta["invoices"],
+                            **{amount: Decimal128(delta[amount]) for amount in ROLLUP_AMOUNTS},
+                        },
+                        "$setOnInsert": {
+                            "granularity": key[0],
+                            "period": key[1],
+                            "seller_gstin": key[2],
+                            "refreshed_at": now,
+                        },
+                    },
+                    upsert=True,
+                )
+            )
+            if delta["invoices"] < 0:
+                # Drop buckets left without invoices in the same round trip
+                operations.append(DeleteOne({"_id": self._rollup_id(key), "invoices": 0}))
+        await self.db[self.rollups_collection_name].bulk_write(operations)
+
+    def _rollup_id(self, key: Tuple[str, str, str]) -> str:
+        """Build a rollup bucket _id from its granularity, period and seller"""
+        return "|".join(key)
+
+    def _rollup_bucket(
+        self,
+        key: Tuple[str, str, str],
+        bucket: Dict[str, Any],
+        refreshed_at: datetime,
+    ) -> Dict[str, Any]:
+        """Build a stored rollup bucket"""
+        granularity, period, seller_gstin = key
+        return {
+            "granularity": granularity,
+            "period": period,
+            "seller_gstin": seller_gstin,
+            "invoices": bucket["invoices"],
+            **{amount: Decimal128(bucket[amount]) for amount in ROLLUP_AMOUNTS},
+            "refreshed_at": refreshed_at,
         }
 
-        for result in results:
-            doc_type = result["_id"]
-            count = result["count"]
-            if doc_type in stats:
-                stats[doc_type] = count
+    async def _increment_stats(self, deltas: Dict[str, int]):
+        """
+        Atomically apply per-type deltas to the statistics counters
+
+        Args:
+            deltas: Mapping of document type to count change
+        """
+        stats_collection = self.db[self.stats_collection_name]
+
+        increments = dict(deltas)
+        increments["total"] = sum(deltas.values())
+
+        await stats_collection.update_one(
+            {"_id": self.stats_counter_id},
+            {"$inc": increments},
+            upsert=True,
+        )
+
+    async def _reference_originals(self, deltas: Dict[str, int]):
+        """
+        Apply link count changes to stored original files
+
+        Args:
+            deltas: Mapping of original file SHA-256 to reference change
+        """
+        operations = [
+            UpdateOne(
+                {"metadata.sha256": sha256},
+                {
+                    "$inc": {"metadata.refcount": delta},
+                    "$set": {"metadata.touched_at": utc_now()},
+                },
+            )
+            for sha256, delta in deltas.items()
+            if delta
+        ]
+        if operations:
+            files = self.db[f"{self.originals_bucket_name}.files"]
+            await files.bulk_write(operations, ordered=False)
+
+    def _written(self, document_ids: List[str]):
+        """
+        Invalidate cached copies and ETags of documents after a write
+
+        Args:
+            document_ids: IDs of the documents the write may have changed
+        """
+        for document_id in document_ids:
+            document_cache.invalidate(document_id)
+        version_registry.bump()
 
+    def _spawn(self, coroutine) -> asyncio.Task:
+        """Run a coroutine in the background, keeping a reference until it is done"""
+        task = asyncio.create_task(coroutine)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
+
+    def _document_query(
+        self,
+        document_type: Optional[str] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Build a documents query from a type filter and extracted_data conditions"""
+        query: Dict[str, Any] = {}
+        if document_type:
+            query["document_type"] = document_type
+        if filters:
+            query.update(filters)
+        return query
+
+    def _check_query_plan(self, query: Dict[str, Any]):
+        """
+        Verify in the background that a filter shape is served by an index
+
+        The plan of each distinct shape (paths and operators, not values)
+        is explained once per process; collection scans are logged.
+        """
+        shape = tuple(
+            sorted(
+                (path, tuple(sorted(condition)) if isinstance(condition, dict) else "$eq")
+                for path, condition in query.items()
+            )
+        )
+        if shape in self._checked_query_shapes:
+            return
+        self._checked_query_shapes.add(shape)
+
+        self._spawn(self._explain_query(query, shape))
+
+    async def _explain_query(self, query: Dict[str, Any], shape: tuple):
+        """Explain a documents query and warn if it scans the collection"""
+        try:
+            plan = await self.explain_documents(query)
+        except Exception as e:
+            logger.warning(f"Could not explain query shape {shape}: {e}")
+            return
+
+        if plan["collection_scan"]:
+            logger.warning(f"Query shape {shape} uses a collection scan")
+        else:
+            logger.info(f"Query shape {shape} uses indexes: {plan['indexes']}")
+
+    async def explain_documents(self, query: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Get the winning plan of a documents listing query
+
+        Args:
+            query: Documents query as built for get_documents
+
+        Returns:
+            Dict with the index names used and whether the plan scans the
+            whole collection
+        """
+        collection = self.db[self.collection_name]
+        explanation = await collection.find(query).sort("created_at", -1).explain()
+
+        stages = []
+        pending = [explanation.get("queryPlanner", {}).get("winningPlan", {})]
+        while pending:
+            node = pending.pop()
+            if isinstance(node, dict):
+                stages.append(node)
+                pending.extend(node.values())
+            elif isinstance(node, list):
+                pending.extend(node)
+
+        return {
+            "indexes": sorted({stage["indexName"] for stage in stages if "indexName" in stage}),
+            "collection_scan": any(stage.get("stage") == "COLLSCAN" for stage in stages),
+        }
+
+    def _read_collection(self, operation: str, collection_name: Optional[str] = None):
+        """
+        Get a collection handle with the read preference routed for an operation
+
+        Args:
+            operation: Read operation name, a key of settings.read_routing
+            collection_name: Collection to read (defaults to the documents collection)
+
+        Returns:
+            AsyncIOMotorCollection using the configured read preference
+        """
+        collection = self.db[collection_name or self.collection_name]
+        return collection.with_options(read_preference=read_preference_for(operation))
+
+    def _to_mongo(self, document: ExtractedDocument) -> Dict[str, Any]:
+        """Convert an ExtractedDocument into the dict stored in MongoDB"""
+        # Datetimes are stored as native BSON dates and UUIDs as binary
+        doc_dict = document.model_dump()
+        doc_dict["id"] = to_stored_id(document.id)
+
+        # Convert extracted_data to dict
+        if hasattr(document.extracted_data, "model_dump"):
+            doc_dict["extracted_data"] = document.extracted_data.model_dump()
+
+        return doc_dict
+
+    def _from_mongo(self, document: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert a stored document in place into the form returned to callers"""
+        normalize_datetimes(document)
+        if "id" in document:
+            document["id"] = from_stored_id(document["id"])
+        return document
+
+    def _id_query(self, document_id: str) -> Dict[str, Any]:
+        """Query matching a document ID in its binary or legacy string form"""
+        return {"id": id_condition(document_id, settings.legacy_string_ids)}
+
+    def _ids_query(self, document_ids: List[str]) -> Dict[str, Any]:
+        """Query matching any of the given document IDs"""
+        return {"id": {"$in": stored_id_values(document_ids, settings.legacy_string_ids)}}
+
+    def _replacement_update(self, document: ExtractedDocument) -> Dict[str, Any]:
+        """
+        Build an update that replaces a document's contents in place
+
+        created_at and the original file link are kept and version
+        incremented; fields not managed by ExtractedDocument are left
+        untouched.
+        """
+        doc_dict = self._to_mongo(document)
+        for field in ("id", "created_at", "version", "original_sha256"):
+            doc_dict.pop(field)
+        return {"$set": doc_dict, "$inc": {"version": 1}}
+
+    async def _applied_updates(
+        self,
+        collection: AsyncIOMotorCollection,
+        documents: List[ExtractedDocument],
+        updates: List[Dict[str, Any]],
+        indexes: List[int],
+    ) -> Set[int]:
+        """
+        Find which version-guarded replacements of a bulk write matched
+
+        A bulk write only reports how many updates matched. A document
+        carrying the updated_at an update set was written by it.
+
+        Args:
+            collection: Collection the updates were written to
+            documents: Documents of the bulk update
+            updates: Replacement update of each document
+            indexes: Indexes of the updates to check
+
+        Returns:
+            Indexes of the updates that were applied
+        """
+        written = {
+            from_stored_id(document["id"])
+            async for document in collection.find(
+                {
+                    "$or": [
+                        {
+                            **self._id_query(documents[index].id),
+                            "updated_at": updates[index]["$set"]["updated_at"],
+                        }
+                        for index in indexes
+                    ]
+                },
+                {"_id": 0, "id": 1},
+            )
+        }
+        return {index for index in indexes if documents[index].id in written}
+
+    def _bulk_write_errors(
+        self, error: BulkWriteError, count: int, ordered: bool
+    ) -> Dict[int, str]:
+        """
+        Map a BulkWriteError to per-operation error messages
+
+        Args:
+            error: Error raised by insert_many or bulk_write
+            count: Number of operations submitted
+            ordered: Whether the operations were submitted ordered
+
+        Returns:
+            Mapping of operation index to error message
+        """
+        errors = {
+            write_error["index"]: write_error["errmsg"]
+            for write_error in error.details.get("writeErrors", [])
+        }
+
+        # An ordered bulk write stops at the first error
+        if ordered and errors:
+            for index in range(min(errors) + 1, count):
+                errors.setdefault(index, "Not attempted: an earlier document failed")
+
+        return errors
+
+    def _build_stats(self, counters: Dict[str, Any]) -> Dict[str, int]:
+        """Build the stats dict returned to callers from a counters document"""
+        stats = {
+            "total": counters.get("total", 0),
+            "government_id": counters.get("government_id", 0),
+            "invoice": counters.get("invoice", 0),
+        }
         return stats
 
-    async def count_documents(self, document_type: Optional[str] = None) -> int:
+    async def count_documents(
+        self,
+        document_type: Optional[str] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> int:
         """
-        Count documents with optional filtering
+        Count documents with optional filtering, across both tiers
 
         Args:
             document_type: Filter by document type (optional)
+            filters: extracted_data conditions from parse_filters (optional)
 
         Returns:
             Number of documents
         """
-        collection = self.db[self.collection_name]
+        collection = self._read_collection("list")
 
-        query = {}
-        if document_type:
-            query["document_type"] = document_type
+        query = self._document_query(document_type, filters)
 
         count = await collection.count_documents(query)
+        if self.archive_in_use:
+            count += await self._count_archive(query)
         return count
 
 
 # Global database service instance
 db_service = DatabaseService()
+
+# Document store used by the API, selected by settings.storage_backend
+document_store: DocumentStore = (
+    SQLiteDocumentStore(settings.sqlite_path, settings.sqlite_pool_size)
+    if settings.storage_backend == "sqlite"
+    else db_service
+)
@@ -0,0 +1,248 @@
+"""
+Read-through cache for single-document reads
+"""
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from datetime import datetime, timezone
+import asyncio
+import logging
+import time
+
+from ..config import settings
+from .change_stream import change_stream_listener
+
+logger = logging.getLogger(__name__)
+
+
+class _LoadCancelled(Exception):
+    """The shared load of a document was cancelled with its caller"""
+
+
+class DocumentCache:
+    """
+    Bounded LRU cache of documents by ID with a time-to-live
+
+    Concurrent misses for the same ID share one load (single-flight).
+    A load that is invalidated while in flight is returned to its
+    callers but not stored, so an update racing a read cannot leave a
+    stale entry behind. A change event that cannot be matched to a
+    document discards every in-flight load. Entries also remember the MongoDB _id of their
+    document, which is all a change stream delete event carries.
+
+    Writes through other replicas only reach the cache through the
+    change stream, so it is bypassed while the stream is enabled but not
+    running.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        # id -> (expires_at, _id, document)
+        self._entries: "OrderedDict[str, Tuple[float, Any, Dict[str, Any]]]" = OrderedDict()
+        self._ids: Dict[Any, str] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.invalidations = 0
+        self.change_events = 0
+        self.lag_seconds_last = 0.0
+        self.lag_seconds_max = 0.0
+        self.lag_seconds_total = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        """Whether reads currently go through the cache"""
+        if settings.change_stream_enabled and not change_stream_listener.running:
+            return False
+        return self.max_size > 0
+
+    async def get(
+        self,
+        document_id: str,
+        loader: Callable[[str], Awaitable[Optional[Dict[str, Any]]]],
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Get a document from the cache, loading it on a miss
+
+        Args:
+            document_id: Document ID
+            loader: Coroutine function returning the document including
+                its MongoDB _id, or None if it does not exist
+
+        Returns:
+            Document dict without _id, or None if not found
+        """
+        entry = self._entries.get(document_id)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._entries.move_to_end(document_id)
+                self.hits += 1
+                return entry[2]
+            self._remove(document_id)
+
+        self.misses += 1
+
+        future = self._inflight.get(document_id)
+        if future is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(future)
+            except _LoadCancelled:
+                # The request that was loading it went away; load it again
+                return await self.get(document_id, loader)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[document_id] = future
+        try:
+            document = await loader(document_id)
+        except BaseException as e:
+            # Waiters must not hang on a load cancelled with its caller
+            future.set_exception(
+                _LoadCancelled() if isinstance(e, asyncio.CancelledError) else e
+            )
+            # Mark retrieved so waiter-less failures are not logged as unhandled
+            future.exception()
+            raise
+        finally:
+            if self._inflight.get(document_id) is future:
+                del self._inflight[document_id]
+                stored = True
+            else:
+                stored = False
+
+        object_id = document.pop("_id", None) if document is not None else None
+        if document is not None and stored:
+            self._store(document_id, object_id, document)
+
+        future.set_result(document)
+        return document
+
+    def invalidate(self, document_id: str):
+        """
+        Drop a document and discard any in-flight load of it
+
+        Args:
+            document_id: Document ID
+        """
+        self._inflight.pop(document_id, None)
+        if self._remove(document_id):
+            self.invalidations += 1
+
+    def invalidate_object_id(self, object_id: Any) -> bool:
+        """
+        Drop the document with a MongoDB _id, if cached
+
+        Args:
+            object_id: MongoDB _id of the document
+
+        Returns:
+            True if an entry was dropped
+        """
+        document_id = self._ids.get(object_id)
+        if document_id is None:
+            return False
+        self.invalidate(document_id)
+        return True
+
+    def clear(self):
+        """Drop every entry, e.g. after change stream events were missed"""
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+        self._ids.clear()
+        self._inflight.clear()
+
+    async def handle_change(self, change: Dict[str, Any]):
+        """
+        Invalidate from a change stream event and record the lag
+
+        The lag is the time between the write on the server and the
+        event reaching this replica.
+
+        Args:
+            change: Change stream event
+        """
+        if change["operationType"] in ("drop", "rename", "dropDatabase", "invalidate"):
+            self.clear()
+            return
+
+        document_key = change.get("documentKey")
+        if document_key is None:
+            return
+
+        # Pre-images carry the document ID, so a load still in flight is
+        # discarded too; without one only the _id of a stored entry is known
+        previous = change.get("fullDocumentBeforeChange") or {}
+        document = change.get("fullDocument") or {}
+        document_id = previous.get("id") or document.get("id")
+        if document_id is not None:
+            self.invalidate(document_id)
+        elif not self.invalidate_object_id(document_key["_id"]):
+            self._inflight.clear()
+
+        wall_time = change.get("wallTime")
+        if wall_time is None and change.get("clusterTime") is not None:
+            wall_time = datetime.fromtimestamp(change["clusterTime"].time, timezone.utc)
+        if wall_time is not None:
+            if wall_time.tzinfo is None:
+                wall_time = wall_time.replace(tzinfo=timezone.utc)
+            lag = max(0.0, (datetime.now(timezone.utc) - wall_time).total_seconds())
+            self.change_events += 1
+            self.lag_seconds_last = lag
+            self.lag_seconds_max = max(self.lag_seconds_max, lag)
+            self.lag_seconds_total += lag
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get the current cache counters
+
+        Returns:
+            Dict of cache size, hit ratio and invalidation lag
+        """
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits_total": self.hits,
+            "misses_total": self.misses,
+            "coalesced_total": self.coalesced,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "invalidations_total": self.invalidations,
+            "invalidation_lag_seconds_last": self.lag_seconds_last,
+            "invalidation_lag_seconds_max": self.lag_seconds_max,
+            "invalidation_lag_seconds_avg": (
+                self.lag_seconds_total / self.change_events if self.change_events else 0.0
+            ),
+        }
+
+    def _store(self, document_id: str, object_id: Any, document: Dict[str, Any]):
+        """Insert an entry, evicting the least recently used beyond max_size"""
+        self._remove(document_id)
+        self._entries[document_id] = (
+            time.monotonic() + self.ttl_seconds,
+            object_id,
+            document,
+        )
+        if object_id is not None:
+            self._ids[object_id] = document_id
+
+        while len(self._entries) > self.max_size:
+            evicted_id, (_, evicted_object_id, _) = self._entries.popitem(last=False)
+            self._ids.pop(evicted_object_id, None)
+
+    def _remove(self, document_id: str) -> bool:
+        """Remove an entry and its _id mapping"""
+        entry = self._entries.pop(document_id, None)
+        if entry is None:
+            return False
+        self._ids.pop(entry[1], None)
+        return True
+
+
+# Global document cache instance
+document_cache = DocumentCache(
+    max_size=settings.document_cache_max_size,
+    ttl_seconds=settings.document_cache_ttl_seconds,
+)
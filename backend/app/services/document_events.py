@@ -0,0 +1,285 @@
+"""
+WebSocket document events sourced from the change stream
+"""
+from fastapi.encoders import jsonable_encoder
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+import asyncio
+import logging
+
+from ..config import settings
+from ..utils.dates import normalize_datetimes
+from ..utils.projection import DOCUMENT_FIELDS
+from .websocket_manager import WebSocketManager, event_topics
+
+logger = logging.getLogger(__name__)
+
+StoredIdsLookup = Callable[[str, List[str]], Awaitable[Set[str]]]
+
+# Event type of a run of consecutive events, and the key of its items
+BULK_EVENTS = {
+    "INSERT": ("BULK_INSERT", "documents"),
+    "UPDATE": ("BULK_UPDATE", "documents"),
+    "DELETE": ("BULK_DELETE", "ids"),
+}
+
+
+def _update_event(
+    previous: Dict[str, Any],
+    updated: Dict[str, Any],
+    removed: List[str],
+) -> Dict[str, Any]:
+    """
+    Build the data of an UPDATE event
+
+    Args:
+        previous: The document before the update, at least its id and type
+        updated: New values by dotted path
+        removed: Removed dotted paths
+
+    Returns:
+        Event data with the id, type, version and update time of the
+        document and its other changed and removed paths, and its
+        previous type if the update changed it
+    """
+    data = {
+        "id": previous["id"],
+        "document_type": updated.get("document_type", previous.get("document_type")),
+        "version": updated.get("version"),
+        "updated_at": updated.get("updated_at"),
+        "changed": {
+            path: value
+            for path, value in updated.items()
+            if path.split(".")[0] in DOCUMENT_FIELDS and path not in ("id", "version", "updated_at")
+        },
+        "removed": [path for path in removed if path.split(".")[0] in DOCUMENT_FIELDS],
+    }
+    if previous.get("document_type") not in (None, data["document_type"]):
+        data["previous_document_type"] = previous["document_type"]
+    return jsonable_encoder(data)
+
+
+def change_to_event(change: Dict[str, Any]) -> Optional[Tuple[str, Any]]:
+    """
+    Translate a change stream event into a WebSocket event
+
+    UPDATE events carry only the paths an update changed, taken from
+    the event's updateDescription, so the change stream does not look up
+    the updated document. A replaced document is reported with all of
+    its fields changed.
+
+    Args:
+        change: Change stream event on the documents collection
+
+    Returns:
+        Tuple of (event type, data), or None if the change is not
+        broadcast
+    """
+    operation = change["operationType"]
+
+    if operation == "insert":
+        document = normalize_datetimes(change["fullDocument"])
+        data = jsonable_encoder(
+            {field: document[field] for field in DOCUMENT_FIELDS if field in document}
+        )
+        return "INSERT", data
+
+    if operation == "replace":
+        document = normalize_datetimes(change["fullDocument"])
+        fields = {field: document[field] for field in DOCUMENT_FIELDS if field in document}
+        previous = {**document, **(change.get("fullDocumentBeforeChange") or {})}
+        return "UPDATE", _update_event(previous, fields, [])
+
+    previous = change.get("fullDocumentBeforeChange") or {}
+    if operation in ("update", "delete") and "id" not in previous:
+        logger.warning(
+            f"{operation.capitalize()} event without pre-image, not broadcast; "
+            "enable changeStreamPreAndPostImages on the collection"
+        )
+        return None
+
+    if operation == "update":
+        description = change.get("updateDescription") or {}
+        updated = normalize_datetimes(dict(description.get("updatedFields") or {}))
+        return "UPDATE", _update_event(previous, updated, description.get("removedFields") or [])
+
+    if operation == "delete":
+        data = {"id": previous["id"]}
+        if "document_type" in previous:
+            data["document_type"] = previous["document_type"]
+        return "DELETE", data
+
+    return None
+
+
+class DocumentEventPublisher:
+    """
+    Broadcasts document changes to this replica's WebSocket clients
+
+    Changes are queued by the change stream listener and published by a
+    single task. Consecutive changes of one kind that arrive within the
+    batch window, such as those of a bulk request, are coalesced into
+    one BULK_INSERT, BULK_UPDATE or BULK_DELETE event; clients subscribed
+    to topics receive only the items of a bulk event that they match.
+
+    With an archive tier, moving a document between tiers is not a
+    client-visible change: inserts and replacements in the archive are
+    archival copies and are dropped, and a delete is dropped while the
+    other tier still holds the document.
+    """
+
+    def __init__(self, batch_window_seconds: float, batch_max_size: int):
+        self.batch_window_seconds = batch_window_seconds
+        self.batch_max_size = batch_max_size
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=batch_max_size * 10)
+        self.published = 0
+        self.archive_collection_name: Optional[str] = None
+        self._tiers: Dict[str, str] = {}
+        self._stored_ids: Optional[StoredIdsLookup] = None
+
+    def track_archive(
+        self,
+        hot_collection_name: str,
+        archive_collection_name: str,
+        stored_ids: StoredIdsLookup,
+    ):
+        """
+        Hide moves between the hot and archive collections from clients
+
+        Args:
+            hot_collection_name: Hot collection name
+            archive_collection_name: Archive collection name
+            stored_ids: Coroutine function returning which of the given
+                IDs a collection holds
+        """
+        self.archive_collection_name = archive_collection_name
+        self._tiers = {
+            hot_collection_name: archive_collection_name,
+            archive_collection_name: hot_collection_name,
+        }
+        self._stored_ids = stored_ids
+
+    async def handle_change(self, change: Dict[str, Any]):
+        """
+        Queue a change stream event for broadcast
+
+        Waits while the queue is full, pausing the change stream rather
+        than dropping events.
+
+        Args:
+            change: Change stream event
+        """
+        collection_name = change.get("ns", {}).get("coll")
+        if (
+            collection_name is not None
+            and collection_name == self.archive_collection_name
+            and change["operationType"] in ("insert", "replace")
+        ):
+            # Archival copy of a hot document
+            return
+
+        event = change_to_event(change)
+        if event is not None:
+            await self._queue.put((collection_name, event))
+
+    async def run(self, manager: WebSocketManager):
+        """
+        Publish queued events until cancelled
+
+        Args:
+            manager: WebSocket manager to broadcast through
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_window_seconds
+            while len(batch) < self.batch_max_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            events = await self._drop_moves(batch)
+            for event_type, run in self._runs(events):
+                try:
+                    await self._publish(manager, event_type, run)
+                    self.published += 1
+                except Exception as e:
+                    logger.error(f"Failed to broadcast {event_type} event: {e}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get the publisher counters
+
+        Returns:
+            Dict with queued and published event counts
+        """
+        return {
+            "queued": self._queue.qsize(),
+            "published_total": self.published,
+        }
+
+    async def _drop_moves(
+        self,
+        batch: List[Tuple[Optional[str], Tuple[str, Any]]],
+    ) -> List[Tuple[str, Any]]:
+        """Drop DELETE events of documents the other tier still holds"""
+        if self._stored_ids is None:
+            return [event for _, event in batch]
+
+        deleted: Dict[str, List[str]] = {}
+        for collection_name, (event_type, data) in batch:
+            if event_type == "DELETE" and collection_name in self._tiers:
+                deleted.setdefault(self._tiers[collection_name], []).append(data["id"])
+
+        moved: Dict[str, Set[str]] = {}
+        for other_tier, document_ids in deleted.items():
+            try:
+                moved[other_tier] = await self._stored_ids(other_tier, document_ids)
+            except Exception as e:
+                logger.error(f"Failed to look up archived documents: {e}")
+                moved[other_tier] = set()
+
+        return [
+            (event_type, data)
+            for collection_name, (event_type, data) in batch
+            if not (
+                event_type == "DELETE"
+                and collection_name in self._tiers
+                and data["id"] in moved[self._tiers[collection_name]]
+            )
+        ]
+
+    def _runs(self, batch: List[Tuple[str, Any]]) -> List[Tuple[str, List[Any]]]:
+        """Group consecutive events of one type into runs"""
+        runs: List[Tuple[str, List[Any]]] = []
+        for event_type, data in batch:
+            if runs and runs[-1][0] == event_type:
+                runs[-1][1].append(data)
+            else:
+                runs.append((event_type, [data]))
+        return runs
+
+    async def _publish(self, manager: WebSocketManager, event_type: str, run: List[Any]):
+        """Broadcast a run of events, merging several into a BULK_* event"""
+        if len(run) == 1:
+            await manager.broadcast(event_type=event_type, data=run[0])
+            return
+
+        bulk_type, key = BULK_EVENTS[event_type]
+        items = [item["id"] for item in run] if key == "ids" else run
+        await manager.broadcast_bulk(
+            event_type=bulk_type,
+            key=key,
+            items=items,
+            item_topics=[event_topics(item) for item in run],
+        )
+
+
+# Global document event publisher
+document_event_publisher = DocumentEventPublisher(
+    batch_window_seconds=settings.websocket_event_batch_window_seconds,
+    batch_max_size=settings.websocket_event_batch_max_size,
+)
@@ -0,0 +1,156 @@
+"""
+Write-behind batching of single-document inserts
+"""
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio
+import logging
+
+from pymongo.errors import WriteError
+
+from ..models.document import ExtractedDocument
+
+logger = logging.getLogger(__name__)
+
+BulkInsert = Callable[[List[ExtractedDocument]], Awaitable[List[Dict[str, Any]]]]
+
+
+class InsertBatcher:
+    """
+    Groups concurrent single-document inserts into one bulk insert
+
+    Inserts submitted within the batch window of the first one are
+    written together, so at high insert rates each batch costs one
+    round trip instead of one per document. Every caller waits on its
+    own future, which resolves only once its document is written, so
+    an acknowledged insert is as durable as an unbatched one.
+
+    The buffer is bounded: when it is full, callers wait for space
+    instead of queueing without limit. close() writes everything
+    already submitted before returning.
+    """
+
+    def __init__(self, batch_window_seconds: float, batch_max_size: int, buffer_max_size: int):
+        self.batch_window_seconds = batch_window_seconds
+        self.batch_max_size = batch_max_size
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=buffer_max_size)
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.batches = 0
+        self.inserted = 0
+        self.failed = 0
+
+    @property
+    def running(self) -> bool:
+        """Whether inserts are currently batched"""
+        return self._task is not None and not self._closing
+
+    def start(self, insert_many: BulkInsert):
+        """
+        Start writing batches
+
+        Args:
+            insert_many: Coroutine function inserting a list of documents
+                unordered and returning per-document results
+        """
+        self._closing = False
+        self._task = asyncio.create_task(self._run(insert_many))
+
+    async def close(self):
+        """Stop accepting inserts and write the buffered ones"""
+        if self._task is None:
+            return
+
+        self._closing = True
+        await self._queue.join()
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def submit(self, document: ExtractedDocument) -> str:
+        """
+        Insert a document as part of the next batch
+
+        Args:
+            document: ExtractedDocument to insert
+
+        Returns:
+            Document ID, once the document is written
+
+        Raises:
+            WriteError: If the document could not be inserted, e.g. a
+                duplicate ID
+            RuntimeError: If the batcher is closing
+        """
+        if not self.running:
+            raise RuntimeError("Insert batcher is not running")
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((document, future))
+        return await future
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get the batcher counters
+
+        Returns:
+            Dict with buffered inserts, batch count, inserted and failed
+            document counts and the mean batch size
+        """
+        return {
+            "enabled": self._task is not None,
+            "buffered": self._queue.qsize(),
+            "batches_total": self.batches,
+            "inserted_total": self.inserted,
+            "failed_total": self.failed,
+            "mean_batch_size": (
+                (self.inserted + self.failed) / self.batches if self.batches else 0.0
+            ),
+        }
+
+    async def _run(self, insert_many: BulkInsert):
+        """Write batches until cancelled"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_window_seconds
+            while len(batch) < self.batch_max_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                await self._write(insert_many, batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _write(
+        self,
+        insert_many: BulkInsert,
+        batch: List[Tuple[ExtractedDocument, asyncio.Future]],
+    ):
+        """Insert one batch and resolve its callers' futures"""
+        self.batches += 1
+        try:
+            results = await insert_many([document for document, _ in batch])
+        except Exception as e:
+            logger.error(f"Batched insert of {len(batch)} documents failed: {e}")
+            self.failed += len(batch)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for result, (document, future) in zip(results, batch):
+            if result["success"]:
+                self.inserted += 1
+                if not future.done():
+                    future.set_result(document.id)
+            else:
+                self.failed += 1
+                if not future.done():
+                    future.set_exception(WriteError(result["error"]))
@@ -0,0 +1,409 @@
+"""
+MongoDB driver monitoring for the metrics endpoint
+"""
+from bson import encode
+from collections import deque
+from contextvars import ContextVar
+from pymongo import monitoring
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+import random
+import threading
+import time
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """
+    Connection pool listener that aggregates pool health counters
+
+    Pool events are delivered on driver threads, so all counters are
+    updated under a lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.pools = 0
+        self.pool_clears = 0
+        self.connections_created = 0
+        self.connections_closed = 0
+        self.connections_checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures: Dict[str, int] = {}
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def pool_created(self, event: monitoring.PoolCreatedEvent):
+        with self._lock:
+            self.pools += 1
+
+    def pool_ready(self, event: monitoring.PoolReadyEvent):
+        pass
+
+    def pool_cleared(self, event: monitoring.PoolClearedEvent):
+        with self._lock:
+            self.pool_clears += 1
+        logger.warning(f"MongoDB connection pool cleared: {event.address}")
+
+    def pool_closed(self, event: monitoring.PoolClosedEvent):
+        with self._lock:
+            self.pools -= 1
+
+    def connection_created(self, event: monitoring.ConnectionCreatedEvent):
+        with self._lock:
+            self.connections_created += 1
+
+    def connection_ready(self, event: monitoring.ConnectionReadyEvent):
+        pass
+
+    def connection_closed(self, event: monitoring.ConnectionClosedEvent):
+        with self._lock:
+            self.connections_closed += 1
+
+    def connection_check_out_started(self, event: monitoring.ConnectionCheckOutStartedEvent):
+        pass
+
+    def connection_check_out_failed(self, event: monitoring.ConnectionCheckOutFailedEvent):
+        with self._lock:
+            self.checkout_failures[event.reason] = self.checkout_failures.get(event.reason, 0) + 1
+            self._record_wait(event.duration)
+
+    def connection_checked_out(self, event: monitoring.ConnectionCheckedOutEvent):
+        with self._lock:
+            self.checkouts += 1
+            self.connections_checked_out += 1
+            self._record_wait(event.duration)
+
+    def connection_checked_in(self, event: monitoring.ConnectionCheckedInEvent):
+        with self._lock:
+            self.connections_checked_out -= 1
+
+    def _record_wait(self, duration):
+        """Accumulate time spent waiting for a connection (lock held)"""
+        if duration is None:
+            return
+        self.wait_seconds_total += duration
+        self.wait_seconds_max = max(self.wait_seconds_max, duration)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get the current pool counters
+
+        Returns:
+            Dict of pool gauges and totals since process start
+        """
+        with self._lock:
+            attempts = self.checkouts + sum(self.checkout_failures.values())
+            return {
+                "pools": self.pools,
+                "pool_clears": self.pool_clears,
+                "connections_open": self.connections_created - self.connections_closed,
+                "connections_checked_out": self.connections_checked_out,
+                "connections_created_total": self.connections_created,
+                "connections_closed_total": self.connections_closed,
+                "checkouts_total": self.checkouts,
+                "checkout_failures_total": dict(self.checkout_failures),
+                "checkout_wait_seconds_avg": (
+                    self.wait_seconds_total / attempts if attempts else 0.0
+                ),
+                "checkout_wait_seconds_max": self.wait_seconds_max,
+                "uptime_seconds": time.time() - self.started_at,
+            }
+
+
+# Endpoint being served, e.g. "GET /api/v1/documents/{document_id}", so
+# commands can be attributed to the requests that issued them
+current_endpoint: ContextVar[Optional[str]] = ContextVar("current_endpoint", default=None)
+
+# Upper bounds of the command latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Handshake and authentication commands are not recorded
+IGNORED_COMMANDS = {
+    "hello",
+    "ismaster",
+    "isMaster",
+    "saslStart",
+    "saslContinue",
+    "authenticate",
+    "getnonce",
+    "endSessions",
+}
+
+# Where each command carries its filter
+FILTER_PATHS = {
+    "find": ("filter",),
+    "count": ("query",),
+    "distinct": ("query",),
+    "findAndModify": ("query",),
+    "delete": ("deletes", 0, "q"),
+    "update": ("updates", 0, "q"),
+}
+
+
+def redact(value: Any) -> Any:
+    """
+    Replace the values of a filter with "?", keeping its field names and operators
+
+    Args:
+        value: Filter, pipeline or value
+
+    Returns:
+        The shape of the value
+    """
+    if isinstance(value, dict):
+        return {key: redact(item) for key, item in value.items()}
+    if isinstance(value, list) and any(isinstance(item, dict) for item in value):
+        return [redact(item) for item in value]
+    return "?"
+
+
+def command_shape(command_name: str, command: Dict[str, Any]) -> Optional[Any]:
+    """
+    Get the redacted filter of a command
+
+    Args:
+        command_name: Command name
+        command: Command document
+
+    Returns:
+        Redacted filter, or pipeline for aggregate, or None if the
+        command has neither
+    """
+    if command_name == "aggregate":
+        return redact(command.get("pipeline", []))
+
+    value: Any = command
+    for key in FILTER_PATHS.get(command_name, ()):
+        try:
+            value = value[key]
+        except (KeyError, IndexError, TypeError):
+            return None
+    return redact(value) if value is not command else None
+
+
+def reply_documents(reply: Dict[str, Any]) -> int:
+    """Number of documents returned or written by a command reply"""
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+    if "value" in reply:
+        # findAndModify
+        return 1 if reply["value"] is not None else 0
+    n = reply.get("n")
+    return n if isinstance(n, int) else 0
+
+
+class CommandHistogram:
+    """Latency histogram and transfer counters of one command on one collection"""
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.failures = 0
+        self.seconds_total = 0.0
+        self.seconds_max = 0.0
+        self.documents = 0
+        # Only sampled commands are encoded to measure their size
+        self.bytes_sampled = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def record(self, seconds: float):
+        """Count one command duration"""
+        index = 0
+        while index < len(LATENCY_BUCKETS) and seconds > LATENCY_BUCKETS[index]:
+            index += 1
+        self.buckets[index] += 1
+        self.count += 1
+        self.seconds_total += seconds
+        self.seconds_max = max(self.seconds_max, seconds)
+
+    def percentile(self, fraction: float) -> float:
+        """Upper bound of the bucket holding a percentile, capped at the maximum"""
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank and count:
+                if index == len(LATENCY_BUCKETS):
+                    return self.seconds_max
+                return min(LATENCY_BUCKETS[index], self.seconds_max)
+        return 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters, mean, percentile estimates and cumulative bucket counts"""
+        cumulative = []
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), self.buckets):
+            seen += count
+            cumulative.append({"le": bound if bound != float("inf") else "+Inf", "count": seen})
+        return {
+            "count": self.count,
+            "failures": self.failures,
+            "seconds_avg": self.seconds_total / self.count if self.count else 0.0,
+            "seconds_max": self.seconds_max,
+            "seconds_p50": self.percentile(0.5),
+            "seconds_p95": self.percentile(0.95),
+            "seconds_p99": self.percentile(0.99),
+            "documents_total": self.documents,
+            "bytes_sampled": self.bytes_sampled,
+            "bytes_sent_avg": self.bytes_sent / self.bytes_sampled if self.bytes_sampled else 0.0,
+            "bytes_received_avg": (
+                self.bytes_received / self.bytes_sampled if self.bytes_sampled else 0.0
+            ),
+            "buckets": cumulative,
+        }
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """
+    Command listener recording latency per command and collection
+
+    Every command gets a latency histogram keyed by command name and
+    collection, with the documents it returned (or wrote). The BSON size
+    of a command and its reply is measured on a sample of commands only,
+    since it takes encoding both again. Commands slower than the slow
+    query threshold are logged with their filter shape, values
+    redacted, and the endpoint that issued them; the shape is only
+    computed for those. Time spent in MongoDB is also totalled per
+    endpoint.
+
+    Command events are delivered on driver threads, so all counters are
+    updated under a lock.
+    """
+
+    def __init__(self, slow_query_seconds: float, slow_query_log_size: int, bytes_sample_rate: float):
+        self.slow_query_seconds = slow_query_seconds
+        self.bytes_sample_rate = bytes_sample_rate
+        self._lock = threading.Lock()
+        self._in_flight: Dict[
+            Tuple[Any, int], Tuple[Optional[str], Dict[str, Any], Optional[str], Optional[int]]
+        ] = {}
+        self._commands: Dict[Tuple[str, str], CommandHistogram] = {}
+        self._endpoints: Dict[str, Dict[str, float]] = {}
+        self.slow_queries: deque = deque(maxlen=slow_query_log_size)
+        self.slow_queries_total = 0
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        if event.command_name in IGNORED_COMMANDS:
+            return
+
+        command = event.command
+        if event.command_name == "getMore":
+            collection = command.get("collection")
+        else:
+            collection = command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = None
+
+        bytes_sent = None
+        if self.bytes_sample_rate and random.random() < self.bytes_sample_rate:
+            bytes_sent = len(encode(command))
+
+        with self._lock:
+            self._in_flight[(event.connection_id, event.request_id)] = (
+                collection,
+                command,
+                current_endpoint.get(),
+                bytes_sent,
+            )
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        self._finish(event, event.reply)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        self._finish(event, None)
+
+    def _finish(self, event, reply: Optional[Dict[str, Any]]):
+        """Record a finished command"""
+        with self._lock:
+            started = self._in_flight.pop((event.connection_id, event.request_id), None)
+        if started is None:
+            return
+
+        collection, command, endpoint, bytes_sent = started
+        seconds = event.duration_micros / 1e6
+        documents = reply_documents(reply) if reply is not None else 0
+        slow = seconds >= self.slow_query_seconds
+        shape = command_shape(event.command_name, command) if slow else None
+        bytes_received = None
+        if bytes_sent is not None:
+            bytes_received = len(encode(reply)) if reply is not None else 0
+
+        with self._lock:
+            key = (event.command_name, collection or "")
+            histogram = self._commands.get(key)
+            if histogram is None:
+                histogram = self._commands[key] = CommandHistogram()
+            histogram.record(seconds)
+            histogram.documents += documents
+            if bytes_received is not None:
+                histogram.bytes_sampled += 1
+                histogram.bytes_sent += bytes_sent
+                histogram.bytes_received += bytes_received
+            if reply is None:
+                histogram.failures += 1
+
+            if endpoint is not None:
+                totals = self._endpoints.setdefault(endpoint, {"commands": 0, "seconds_total": 0.0})
+                totals["commands"] += 1
+                totals["seconds_total"] += seconds
+
+            if slow:
+                self.slow_queries_total += 1
+                self.slow_queries.append(
+                    {
+                        "at": time.time(),
+                        "command": event.command_name,
+                        "collection": collection,
+                        "seconds": seconds,
+                        "documents": documents,
+                        "shape": shape,
+                        "endpoint": endpoint,
+                        "failed": reply is None,
+                    }
+                )
+
+        if slow:
+            logger.warning(
+                f"Slow MongoDB {event.command_name} on {collection} took {seconds * 1000:.0f}ms "
+                f"({documents} documents, endpoint {endpoint}): {shape}"
+            )
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get the command counters
+
+        Returns:
+            Dict with per command and collection histograms, MongoDB time
+            per endpoint and the most recent slow queries
+        """
+        with self._lock:
+            commands: Dict[str, Dict[str, Any]] = {}
+            for (command_name, collection), histogram in sorted(self._commands.items()):
+                commands.setdefault(command_name, {})[collection or "-"] = histogram.snapshot()
+            return {
+                "commands": commands,
+                "endpoints": {
+                    endpoint: dict(totals) for endpoint, totals in sorted(self._endpoints.items())
+                },
+                "slow_query_seconds": self.slow_query_seconds,
+                "slow_queries_total": self.slow_queries_total,
+                "slow_queries": list(self.slow_queries),
+            }
+
+
+# Global pool metrics listener
+pool_metrics = PoolMetrics()
+
+# Global command metrics listener
+command_metrics = CommandMetrics(
+    settings.mongodb_slow_query_seconds,
+    settings.mongodb_slow_query_log_size,
+    settings.mongodb_command_bytes_sample_rate,
+)
@@ -0,0 +1,274 @@
+"""
+Content-addressed store for original uploaded files in GridFS
+"""
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+from pymongo.errors import DuplicateKeyError
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+from datetime import timedelta
+import asyncio
+import hashlib
+import logging
+import mimetypes
+
+from ..utils.dates import utc_now
+from .database import DatabaseService, db_service
+
+logger = logging.getLogger(__name__)
+
+
+class OriginalFileStore:
+    """
+    Stores original uploads once per distinct content
+
+    Files live in the GridFS bucket named by
+    DatabaseService.originals_bucket_name and are looked up by the
+    SHA-256 of their content, held in metadata.sha256 under a unique
+    index, so uploading the same bytes again stores nothing new. The
+    index is created by the index migrations, and again on first use in
+    case they have not run.
+
+    metadata.refcount counts the documents linked to a file through
+    ExtractedDocument.original_sha256 and is maintained by
+    DatabaseService on insert and delete. Files nobody references are
+    removed by sweep once they have been untouched for a grace period,
+    which leaves time to create the document after extraction.
+    """
+
+    def __init__(self, database: DatabaseService):
+        self.database = database
+        self.stored = 0
+        self.deduplicated = 0
+        self.swept = 0
+        self._indexed = False
+
+    @property
+    def _bucket(self) -> AsyncIOMotorGridFSBucket:
+        return AsyncIOMotorGridFSBucket(
+            self.database.db,
+            bucket_name=self.database.originals_bucket_name,
+        )
+
+    @property
+    def _files(self):
+        return self.database.db[f"{self.database.originals_bucket_name}.files"]
+
+    async def put(self, data: bytes, file_name: str) -> str:
+        """
+        Store a file unless identical content is already stored
+
+        Args:
+            data: File contents
+            file_name: Original file name, kept with the first upload
+
+        Returns:
+            SHA-256 hex digest identifying the stored file
+        """
+        sha256 = hashlib.sha256(data).hexdigest()
+        await self._ensure_index()
+
+        if await self._touch(sha256):
+            self.deduplicated += 1
+            return sha256
+
+        content_type = mimetypes.guess_type(file_name)[0] or "application/octet-stream"
+        upload = self._bucket.open_upload_stream(
+            file_name,
+            metadata={
+                "sha256": sha256,
+                "content_type": content_type,
+                "refcount": 0,
+                "touched_at": utc_now(),
+            },
+        )
+        try:
+            await upload.write(data)
+            await upload.close()
+        except DuplicateKeyError:
+            # Stored concurrently by another request; drop this copy's chunks
+            chunks = self.database.db[f"{self.database.originals_bucket_name}.chunks"]
+            await chunks.delete_many({"files_id": upload._id})
+            await self._touch(sha256)
+            self.deduplicated += 1
+            return sha256
+        except BaseException:
+            await upload.abort()
+            raise
+
+        self.stored += 1
+        logger.info(f"Stored original file {file_name} as {sha256}")
+        return sha256
+
+    async def missing(self, hashes: List[str]) -> Set[str]:
+        """
+        Find which content hashes are not stored
+
+        Args:
+            hashes: SHA-256 hex digests
+
+        Returns:
+            Set of the hashes without a stored file
+        """
+        stored = {
+            file["metadata"]["sha256"]
+            async for file in self._files.find(
+                {"metadata.sha256": {"$in": hashes}},
+                {"_id": 0, "metadata.sha256": 1},
+            )
+        }
+        return set(hashes) - stored
+
+    async def get_info(self, sha256: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the metadata of a stored file
+
+        Args:
+            sha256: Content hash
+
+        Returns:
+            Dict with sha256, file_name, length, content_type, refcount
+            and upload_date, or None if not stored
+        """
+        file = await self._files.find_one({"metadata.sha256": sha256})
+        if file is None:
+            return None
+
+        metadata = file.get("metadata") or {}
+        return {
+            "_id": file["_id"],
+            "sha256": sha256,
+            "file_name": file.get("filename"),
+            "length": file["length"],
+            "content_type": metadata.get("content_type", "application/octet-stream"),
+            "refcount": metadata.get("refcount", 0),
+            "upload_date": file.get("uploadDate"),
+        }
+
+    async def read(self, sha256: str) -> Optional[bytes]:
+        """
+        Read a stored file in full
+
+        Args:
+            sha256: Content hash
+
+        Returns:
+            File contents, or None if not stored
+        """
+        info = await self.get_info(sha256)
+        if info is None:
+            return None
+        stream = await self._bucket.open_download_stream(info["_id"])
+        return await stream.read()
+
+    async def stream(
+        self,
+        file_id: Any,
+        start: int,
+        end: int,
+    ) -> AsyncIterator[bytes]:
+        """
+        Stream a byte range of a stored file chunk by chunk
+
+        Args:
+            file_id: GridFS file _id from get_info
+            start: First byte offset
+            end: Last byte offset (inclusive)
+
+        Yields:
+            Parts of the range, at most one GridFS chunk each
+        """
+        stream = await self._bucket.open_download_stream(file_id)
+        try:
+            stream.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = await stream.readchunk()
+                if not chunk:
+                    break
+                chunk = chunk[:remaining]
+                remaining -= len(chunk)
+                yield chunk
+        finally:
+            stream.close()
+
+    async def sweep(self, unreferenced_seconds: float) -> int:
+        """
+        Delete files that no document has referenced for a while
+
+        Args:
+            unreferenced_seconds: Grace period since the last upload,
+                link or unlink of a file
+
+        Returns:
+            Number of files deleted
+        """
+        cutoff = utc_now() - timedelta(seconds=unreferenced_seconds)
+        chunks = self.database.db[f"{self.database.originals_bucket_name}.chunks"]
+
+        deleted = 0
+        while True:
+            # Removing the files document first makes the file invisible
+            # before its chunks go, and loses any race with a new link
+            file = await self._files.find_one_and_delete(
+                {"metadata.refcount": {"$lte": 0}, "metadata.touched_at": {"$lt": cutoff}},
+                projection={"_id": 1},
+            )
+            if file is None:
+                break
+            await chunks.delete_many({"files_id": file["_id"]})
+            deleted += 1
+
+        self.swept += deleted
+        if deleted:
+            logger.info(f"Deleted {deleted} unreferenced original files")
+        return deleted
+
+    async def run_sweeper(self, interval_seconds: float, unreferenced_seconds: float):
+        """
+        Periodically sweep unreferenced files until cancelled
+
+        Args:
+            interval_seconds: Delay between sweeps
+            unreferenced_seconds: Grace period passed to sweep
+        """
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await self.sweep(unreferenced_seconds)
+            except Exception as e:
+                logger.error(f"Original file sweep failed: {e}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get the store counters
+
+        Returns:
+            Dict with stored, deduplicated and swept file counts
+        """
+        return {
+            "stored_total": self.stored,
+            "deduplicated_total": self.deduplicated,
+            "swept_total": self.swept,
+        }
+
+    async def _ensure_index(self):
+        """Create the unique content hash index concurrent uploads rely on"""
+        if self._indexed:
+            return
+        try:
+            await self._files.create_index("metadata.sha256", unique=True, background=True)
+            self._indexed = True
+        except Exception as e:
+            # Uploads still work, but concurrent ones may store duplicates
+            logger.error(f"Failed to create the original file hash index: {e}")
+
+    async def _touch(self, sha256: str) -> bool:
+        """Restart the grace period of a stored file, False if not stored"""
+        result = await self._files.update_one(
+            {"metadata.sha256": sha256},
+            {"$set": {"metadata.touched_at": utc_now()}},
+        )
+        return result.matched_count > 0
+
+
+# Global original file store
+original_file_store = OriginalFileStore(db_service)
@@ -0,0 +1,57 @@
+"""
+Per-operation read preference routing
+
+Analytic and list reads can be served by secondaries, while reads that
+follow a client's own writes are pinned to the primary. The pin is
+request scoped: the read-your-writes middleware in main.py sets it when
+the request carries the recent-write cookie or asks for primary reads.
+"""
+from contextvars import ContextVar
+from pymongo.read_preferences import (
+    Nearest,
+    Primary,
+    PrimaryPreferred,
+    Secondary,
+    SecondaryPreferred,
+    _ServerMode,
+)
+
+from ..config import settings
+
+# Cookie set on responses to mutating requests
+RECENT_WRITE_COOKIE = "docextract_recent_write"
+
+# Header a client can send to force primary reads for one request
+READ_CONSISTENCY_HEADER = "x-read-consistency"
+
+# Whether reads in the current request must go to the primary
+force_primary_reads: ContextVar[bool] = ContextVar("force_primary_reads", default=False)
+
+READ_PREFERENCE_MODES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+def read_preference_for(operation: str) -> _ServerMode:
+    """
+    Get the read preference configured for a read operation
+
+    Args:
+        operation: Operation name, a key of settings.read_routing
+
+    Returns:
+        pymongo read preference, Primary when reads are pinned or the
+        operation is not configured
+    """
+    mode = settings.read_routing.get(operation, "primary")
+    if force_primary_reads.get() or mode == "primary":
+        return Primary()
+
+    if mode not in READ_PREFERENCE_MODES:
+        raise ValueError(f"Unknown read preference for {operation}: {mode}")
+
+    return READ_PREFERENCE_MODES[mode](max_staleness=settings.read_max_staleness_seconds)
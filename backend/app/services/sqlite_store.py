@@ -0,0 +1,915 @@
+"""
+Embedded SQLite document store for single-node deployments
+"""
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+from datetime import date, datetime
+import asyncio
+import json
+import logging
+
+from fastapi.encoders import jsonable_encoder
+
+from ..models.document import ExtractedDocument
+from ..utils.dates import parse_datetime, utc_now
+from ..utils.filters import FILTERABLE_FIELDS, PARTIAL_INDEXES
+from ..utils.patch import apply_update
+from ..utils.projection import apply_projection
+from ..utils.rollups import ROLLUP_AMOUNTS, period_range, rollup_deltas
+from .document_cache import document_cache
+from .storage import DocumentStore
+from .versions import version_registry
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = (
+    "id",
+    "document_type",
+    "file_name",
+    "extracted_data",
+    "created_at",
+    "updated_at",
+    "version",
+    "original_sha256",
+)
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS documents (
+        id TEXT PRIMARY KEY,
+        document_type TEXT NOT NULL,
+        file_name TEXT NOT NULL,
+        extracted_data TEXT NOT NULL CHECK (json_valid(extracted_data)),
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL,
+        version INTEGER NOT NULL DEFAULT 1,
+        original_sha256 TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS documents_created_at ON documents (created_at)",
+    "CREATE INDEX IF NOT EXISTS documents_type_created_at ON documents (document_type, created_at)",
+    """
+    CREATE TABLE IF NOT EXISTS document_stats (
+        document_type TEXT PRIMARY KEY,
+        count INTEGER NOT NULL
+    )
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS invoice_rollups (
+        granularity TEXT NOT NULL,
+        period TEXT NOT NULL,
+        seller_gstin TEXT NOT NULL,
+        invoices INTEGER NOT NULL,
+        {", ".join(f"{amount} REAL NOT NULL" for amount in ROLLUP_AMOUNTS)},
+        PRIMARY KEY (granularity, period, seller_gstin)
+    ) WITHOUT ROWID
+    """,
+]
+
+ChangeHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+def _json_path(path: str) -> str:
+    """Translate a dotted extracted_data path into a JSON1 path"""
+    segments = []
+    for segment in path.split("."):
+        segments.append(f"[{segment}]" if segment.isdigit() else f'."{segment}"')
+    return "$" + "".join(segments)
+
+
+def _field_sql(field: str) -> str:
+    """SQL expression for a document field or an extracted_data path"""
+    if field.startswith("extracted_data."):
+        return f"json_extract(extracted_data, '{_json_path(field[len('extracted_data.'):])}')"
+    if field not in COLUMNS:
+        raise ValueError(f"Unknown document field: {field}")
+    return field
+
+
+def _timestamp(value: datetime) -> str:
+    """Stored form of a datetime, sortable as text"""
+    return parse_datetime(value).isoformat(timespec="microseconds")
+
+
+def _partial_indexes() -> List[str]:
+    """Expression indexes matching the MongoDB partial indexes"""
+    statements = []
+    for document_type, indexes in PARTIAL_INDEXES.items():
+        for paths in indexes:
+            name = f"{document_type}__{'__'.join(paths)}".replace(".", "_")
+            expressions = ", ".join(_field_sql(f"extracted_data.{path}") for path in paths)
+            statements.append(
+                f"CREATE INDEX IF NOT EXISTS {name} ON documents ({expressions}) "
+                f"WHERE document_type = '{document_type}'"
+            )
+    return statements
+
+
+class SQLiteDocumentStore(DocumentStore):
+    """
+    Document store on an embedded SQLite database using JSON1
+
+    Top-level fields are columns and extracted_data is a JSON column,
+    with expression indexes on the hot filter paths (PARTIAL_INDEXES)
+    and counters and invoice rollup tables kept in the same transaction
+    as each write.
+    The database runs in WAL mode: a pool of reader connections
+    serves reads concurrently with the single writer connection, whose
+    writes are serialized by a lock instead of SQLite busy retries.
+    Each connection runs on its own thread (aiosqlite).
+
+    Writes invalidate the document cache and ETags locally and are
+    reported to subscribers as change stream style events, so WebSocket
+    clients are notified without a MongoDB change stream.
+    """
+
+    def __init__(self, path: str, pool_size: int):
+        self.path = path
+        self.pool_size = pool_size
+        self._readers: Optional[asyncio.Queue] = None
+        self._writer = None
+        self._write_lock = asyncio.Lock()
+        self._handlers: List[ChangeHandler] = []
+
+    async def connect(self):
+        """Open the connections and create the schema and indexes"""
+        import aiosqlite
+
+        self._writer = await self._open(aiosqlite)
+        for statement in SCHEMA + _partial_indexes():
+            await self._writer.execute(statement)
+        await self._writer.execute(
+            """
+            INSERT INTO document_stats (document_type, count)
+            SELECT document_type, COUNT(*) FROM documents
+            WHERE NOT EXISTS (SELECT 1 FROM document_stats)
+            GROUP BY document_type
+            """
+        )
+        cursor = await self._writer.execute("SELECT 1 FROM invoice_rollups LIMIT 1")
+        if await cursor.fetchone() is None:
+            await self._rebuild_rollups(self._writer)
+        await self._writer.commit()
+        # Sampled statistics let the planner pick the expression indexes
+        await self._writer.execute("PRAGMA analysis_limit=1000")
+        await self._writer.execute("ANALYZE")
+
+        self._readers = asyncio.Queue()
+        for _ in range(self.pool_size):
+            self._readers.put_nowait(await self._open(aiosqlite))
+
+        logger.info(f"Opened SQLite document store: {self.path}")
+
+    async def disconnect(self):
+        """Close every connection"""
+        if self._readers is not None:
+            while not self._readers.empty():
+                await self._readers.get_nowait().close()
+        if self._writer is not None:
+            await self._writer.execute("PRAGMA optimize")
+            await self._writer.close()
+            self._writer = None
+        logger.info("Closed SQLite document store")
+
+    def readiness(self) -> Dict[str, Any]:
+        """
+        Get the connection state for readiness checks
+
+        Returns:
+            Dict with ready and the database path
+        """
+        return {"ready": self._writer is not None, "path": self.path}
+
+    async def _open(self, aiosqlite):
+        """Open a connection in WAL mode"""
+        connection = await aiosqlite.connect(self.path)
+        connection.row_factory = aiosqlite.Row
+        await connection.execute("PRAGMA journal_mode=WAL")
+        await connection.execute("PRAGMA synchronous=NORMAL")
+        await connection.execute("PRAGMA busy_timeout=5000")
+        return connection
+
+    @asynccontextmanager
+    async def _reader(self):
+        """Borrow a reader connection from the pool"""
+        connection = await self._readers.get()
+        try:
+            yield connection
+        finally:
+            self._readers.put_nowait(connection)
+
+    @asynccontextmanager
+    async def _transaction(self):
+        """Run statements on the writer connection in one transaction"""
+        async with self._write_lock:
+            await self._writer.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._writer
+            except BaseException:
+                await self._writer.rollback()
+                raise
+            await self._writer.commit()
+
+    def subscribe(self, handler: ChangeHandler):
+        """
+        Register a handler for change events of committed writes
+
+        Args:
+            handler: Coroutine function called with each change event
+        """
+        self._handlers.append(handler)
+
+    async def insert_document(self, document: ExtractedDocument) -> str:
+        """
+        Insert a new document
+
+        Args:
+            document: ExtractedDocument to insert
+
+        Returns:
+            Document ID
+        """
+        row = self._to_row(document)
+        inserted = self._from_row(row)
+        async with self._transaction() as connection:
+            await self._insert(connection, row)
+            await self._increment_stats(connection, {document.document_type: 1})
+            await self._apply_rollups(connection, added=[inserted])
+
+        await self._written([{"operationType": "insert", "fullDocument": inserted}])
+        logger.info(f"Inserted document: {document.id}")
+        return document.id
+
+    async def insert_documents(
+        self,
+        documents: List[ExtractedDocument],
+        ordered: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        Insert many documents in one transaction
+
+        Args:
+            documents: ExtractedDocuments to insert
+            ordered: Stop at the first failing document instead of
+                attempting every document
+
+        Returns:
+            Per-document results with index, id, success and error
+        """
+        import aiosqlite
+
+        results = []
+        inserted = []
+        deltas: Dict[str, int] = {}
+        async with self._transaction() as connection:
+            for index, document in enumerate(documents):
+                if ordered and results and not results[-1]["success"]:
+                    error = "Not attempted after an earlier failure"
+                else:
+                    row = self._to_row(document)
+                    try:
+                        await self._insert(connection, row)
+                        error = None
+                        inserted.append(row)
+                        deltas[document.document_type] = deltas.get(document.document_type, 0) + 1
+                    except aiosqlite.IntegrityError as e:
+                        error = str(e)
+                results.append(
+                    {"index": index, "id": document.id, "success": error is None, "error": error}
+                )
+            await self._increment_stats(connection, deltas)
+            inserted = [self._from_row(row) for row in inserted]
+            await self._apply_rollups(connection, added=inserted)
+
+        await self._written(
+            [{"operationType": "insert", "fullDocument": document} for document in inserted]
+        )
+        logger.info(f"Bulk inserted {len(inserted)}/{len(documents)} documents")
+        return results
+
+    async def get_document(
+        self,
+        document_id: str,
+        projection: Optional[Dict[str, int]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Get a document by ID
+
+        Args:
+            document_id: Document ID
+            projection: MongoDB-style projection (optional, full document by default)
+
+        Returns:
+            Document dict or None if not found
+        """
+        async with self._reader() as connection:
+            cursor = await connection.execute("SELECT * FROM documents WHERE id = ?", (document_id,))
+            row = await cursor.fetchone()
+
+        return apply_projection(self._from_row(row), projection) if row else None
+
+    async def list_documents(
+        self,
+        document_type: Optional[str] = None,
+        limit: int = 100,
+        offset: int = 0,
+        exact_total: bool = True,
+        projection: Optional[Dict[str, int]] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Get a page of documents, newest first, together with the total count
+
+        Without exact_total, unfiltered totals come from the counters
+        table.
+
+        Args:
+            document_type: Filter by document type (optional)
+            limit: Maximum number of documents to return
+            offset: Number of documents to skip
+            exact_total: Whether the total must be an exact count
+            projection: MongoDB-style projection (optional, full documents by default)
+            filters: extracted_data conditions from parse_filters (optional)
+
+        Returns:
+            Tuple of (list of document dicts, total count)
+        """
+        where, parameters = self._where(document_type, filters)
+        async with self._reader() as connection:
+            cursor = await connection.execute(
+                f"SELECT * FROM documents {where} ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                (*parameters, limit, offset),
+            )
+            rows = await cursor.fetchall()
+
+            if exact_total or filters:
+                cursor = await connection.execute(
+                    f"SELECT COUNT(*) FROM documents {where}", parameters
+                )
+                total = (await cursor.fetchone())[0]
+            else:
+                stats = await self._read_stats(connection)
+                total = stats.get(document_type, 0) if document_type else stats["total"]
+
+        documents = [apply_projection(self._from_row(row), projection) for row in rows]
+        return documents, total
+
+    async def count_documents(
+        self,
+        document_type: Optional[str] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> int:
+        """
+        Count documents with optional filtering
+
+        Args:
+            document_type: Filter by document type (optional)
+            filters: extracted_data conditions from parse_filters (optional)
+
+        Returns:
+            Number of documents
+        """
+        where, parameters = self._where(document_type, filters)
+        async with self._reader() as connection:
+            cursor = await connection.execute(f"SELECT COUNT(*) FROM documents {where}", parameters)
+            return (await cursor.fetchone())[0]
+
+    async def export_documents(
+        self,
+        document_type: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream documents in created_at order for export
+
+        Rows are fetched in batches of settings.export_batch_size while
+        holding one reader connection.
+
+        Args:
+            document_type: Filter by document type (optional)
+            created_from: Earliest created_at, inclusive (optional)
+            created_to: Latest created_at, exclusive (optional)
+            filters: extracted_data conditions from parse_filters (optional)
+
+        Yields:
+            Document dicts
+        """
+        from ..config import settings
+
+        where, parameters = self._where(document_type, filters)
+        conditions = [where[len("WHERE "):]] if where else []
+        if created_from is not None:
+            conditions.append("created_at >= ?")
+            parameters.append(_timestamp(created_from))
+        if created_to is not None:
+            conditions.append("created_at < ?")
+            parameters.append(_timestamp(created_to))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        async with self._reader() as connection:
+            cursor = await connection.execute(
+                f"SELECT * FROM documents {where} ORDER BY created_at ASC", parameters
+            )
+            try:
+                while True:
+                    rows = await cursor.fetchmany(settings.export_batch_size)
+                    if not rows:
+                        break
+                    for row in rows:
+                        yield self._from_row(row)
+            finally:
+                await cursor.close()
+
+    async def get_stats(self) -> Dict[str, int]:
+        """
+        Get document statistics from the counters table
+
+        Returns:
+            Dict with total, government_id, and invoice counts
+        """
+        async with self._reader() as connection:
+            return await self._read_stats(connection)
+
+    async def invoice_rollups(
+        self,
+        granularity: str,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        seller_gstin: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Read invoice rollup buckets with a primary key range scan
+
+        Args:
+            granularity: "day" or "month"
+            date_from: First day (optional)
+            date_to: Last day (optional)
+            seller_gstin: Only this seller's buckets (optional)
+
+        Returns:
+            Buckets with period, seller_gstin ("" if unknown), invoices and
+            amounts, ordered by period and seller
+        """
+        conditions = ["granularity = ?"]
+        parameters: List[Any] = [granularity]
+        operators = {"$gte": ">=", "$lte": "<="}
+        for operator, period in period_range(granularity, date_from, date_to).items():
+            conditions.append(f"period {operators[operator]} ?")
+            parameters.append(period)
+        if seller_gstin is not None:
+            conditions.append("seller_gstin = ?")
+            parameters.append(seller_gstin)
+
+        async with self._reader() as connection:
+            cursor = await connection.execute(
+                f"""
+                SELECT period, seller_gstin, invoices, {", ".join(ROLLUP_AMOUNTS)}
+                FROM invoice_rollups WHERE {" AND ".join(conditions)}
+                ORDER BY period, seller_gstin
+                """,
+                parameters,
+            )
+            return [dict(row) for row in await cursor.fetchall()]
+
+    async def rebuild_invoice_rollups(self) -> int:
+        """
+        Recompute the invoice rollups from the documents
+
+        Returns:
+            Number of buckets written
+        """
+        async with self._transaction() as connection:
+            await self._rebuild_rollups(connection)
+            cursor = await connection.execute("SELECT COUNT(*) FROM invoice_rollups")
+            (buckets,) = await cursor.fetchone()
+
+        logger.info(f"Rebuilt {buckets} invoice rollup buckets")
+        return buckets
+
+    async def update_document(self, document: ExtractedDocument) -> Optional[Dict[str, Any]]:
+        """
+        Replace the contents of an existing document
+
+        created_at and the original file link are kept and the version
+        is incremented.
+
+        Args:
+            document: ExtractedDocument with updated data
+
+        Returns:
+            The updated document, or None if not found
+        """
+        async with self._transaction() as connection:
+            replaced = await self._replace(connection, document)
+
+        if replaced is None:
+            logger.warning(f"Document not found for update: {document.id}")
+            return None
+
+        previous, updated = replaced
+        await self._written([_replace_change(previous, updated)])
+        logger.info(f"Updated document: {document.id}")
+        return updated
+
+    async def update_documents(
+        self,
+        documents: List[ExtractedDocument],
+        ordered: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        Replace the contents of many existing documents in one transaction
+
+        Args:
+            documents: ExtractedDocuments with updated data
+            ordered: Stop at the first failing document instead of
+                attempting every document
+
+        Returns:
+            Per-document results with index, id, success and error
+        """
+        results = []
+        replaced = []
+        async with self._transaction() as connection:
+            for index, document in enumerate(documents):
+                if ordered and results and not results[-1]["success"]:
+                    error = "Not attempted after an earlier failure"
+                else:
+                    pair = await self._replace(connection, document)
+                    error = None if pair is not None else f"Document not found: {document.id}"
+                    if pair is not None:
+                        replaced.append(pair)
+                results.append(
+                    {"index": index, "id": document.id, "success": error is None, "error": error}
+                )
+
+        await self._written([_replace_change(previous, after) for previous, after in replaced])
+        logger.info(f"Bulk updated {len(replaced)}/{len(documents)} documents")
+        return results
+
+    async def patch_document(
+        self,
+        document_id: str,
+        patch: Dict[str, Any],
+        expected_version: int,
+    ) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """
+        Apply a compiled patch if the document is at a version
+
+        The document is read, patched and written back in one write
+        transaction, so the version check cannot race another write.
+
+        Args:
+            document_id: Document ID
+            patch: Compiled patch from compile_merge_patch/compile_json_patch
+            expected_version: Version the client last read
+
+        Returns:
+            Tuple of (updated document or None, whether the document exists)
+        """
+        async with self._transaction() as connection:
+            cursor = await connection.execute("SELECT * FROM documents WHERE id = ?", (document_id,))
+            row = await cursor.fetchone()
+            if row is None:
+                return None, False
+
+            document = self._from_row(row)
+            conditions_hold = all(
+                _get_path(document, path) == value for path, value in patch["conditions"].items()
+            )
+            if document["version"] != expected_version or not conditions_hold:
+                return None, True
+
+            patched = apply_update(document, patch["update"])
+            patched["updated_at"] = utc_now()
+            patched["version"] = document["version"] + 1
+            await connection.execute(
+                """
+                UPDATE documents
+                SET document_type = ?, file_name = ?, extracted_data = ?, updated_at = ?, version = ?
+                WHERE id = ?
+                """,
+                (
+                    patched["document_type"],
+                    patched["file_name"],
+                    json.dumps(jsonable_encoder(patched["extracted_data"])),
+                    _timestamp(patched["updated_at"]),
+                    patched["version"],
+                    document_id,
+                ),
+            )
+            if patched["document_type"] != document["document_type"]:
+                await self._increment_stats(
+                    connection, {document["document_type"]: -1, patched["document_type"]: 1}
+                )
+            await self._apply_rollups(connection, [document], [patched])
+
+        await self._written([_replace_change(document, patched)])
+        logger.info(f"Patched document: {document_id}")
+        return patched, True
+
+    async def delete_document(
+        self,
+        document_id: str,
+        projection: Optional[Dict[str, int]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Delete a document by ID with a single DELETE ... RETURNING
+
+        Args:
+            document_id: Document ID
+            projection: Fields of the deleted document to return
+                (optional, full document by default)
+
+        Returns:
+            The deleted document, or None if not found
+        """
+        async with self._transaction() as connection:
+            cursor = await connection.execute(
+                "DELETE FROM documents WHERE id = ? RETURNING *", (document_id,)
+            )
+            row = await cursor.fetchone()
+            if row is not None:
+                await self._increment_stats(connection, {row["document_type"]: -1})
+                await self._apply_rollups(connection, removed=[self._from_row(row)])
+
+        if row is None:
+            logger.warning(f"Document not found for deletion: {document_id}")
+            return None
+
+        await self._written(
+            [
+                {
+                    "operationType": "delete",
+                    "fullDocumentBeforeChange": {
+                        "id": document_id,
+                        "document_type": row["document_type"],
+                    },
+                }
+            ]
+        )
+        logger.info(f"Deleted document: {document_id}")
+        return apply_projection(self._from_row(row), projection)
+
+    async def delete_documents(self, document_ids: List[str]) -> List[Dict[str, Any]]:
+        """
+        Delete many documents by ID in one transaction
+
+        Args:
+            document_ids: Document IDs
+
+        Returns:
+            Per-document results with index, id, success and error
+        """
+        placeholders = ", ".join("?" for _ in document_ids)
+        async with self._transaction() as connection:
+            cursor = await connection.execute(
+                f"DELETE FROM documents WHERE id IN ({placeholders}) RETURNING *",
+                document_ids,
+            )
+            existing = {row["id"]: self._from_row(row) for row in await cursor.fetchall()}
+            deltas: Dict[str, int] = {}
+            for deleted in existing.values():
+                deltas[deleted["document_type"]] = deltas.get(deleted["document_type"], 0) - 1
+            await self._increment_stats(connection, deltas)
+            await self._apply_rollups(connection, removed=existing.values())
+
+        await self._written(
+            [
+                {
+                    "operationType": "delete",
+                    "fullDocumentBeforeChange": {
+                        "id": document_id,
+                        "document_type": deleted["document_type"],
+                    },
+                }
+                for document_id, deleted in existing.items()
+            ]
+        )
+
+        results = []
+        for index, document_id in enumerate(document_ids):
+            error = None if existing.pop(document_id, None) else f"Document not found: {document_id}"
+            results.append(
+                {"index": index, "id": document_id, "success": error is None, "error": error}
+            )
+        return results
+
+    async def _insert(self, connection, row: Tuple[Any, ...]):
+        """Insert one document row"""
+        await connection.execute(
+            f"INSERT INTO documents ({', '.join(COLUMNS)}) VALUES ({', '.join('?' for _ in COLUMNS)})",
+            row,
+        )
+
+    async def _replace(
+        self,
+        connection,
+        document: ExtractedDocument,
+    ) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """Replace one document's contents, returning it before and after or None if missing"""
+        cursor = await connection.execute("SELECT * FROM documents WHERE id = ?", (document.id,))
+        previous = await cursor.fetchone()
+        if previous is None:
+            return None
+
+        cursor = await connection.execute(
+            """
+            UPDATE documents
+            SET document_type = ?, file_name = ?, extracted_data = ?, updated_at = ?,
+                version = version + 1
+            WHERE id = ?
+            RETURNING *
+            """,
+            (
+                document.document_type,
+                document.file_name,
+                json.dumps(jsonable_encoder(document.extracted_data)),
+                _timestamp(document.updated_at),
+                document.id,
+            ),
+        )
+        row = await cursor.fetchone()
+
+        if previous["document_type"] != row["document_type"]:
+            await self._increment_stats(
+                connection, {previous["document_type"]: -1, row["document_type"]: 1}
+            )
+        previous = self._from_row(previous)
+        updated = self._from_row(row)
+        await self._apply_rollups(connection, [previous], [updated])
+        return previous, updated
+
+    async def _increment_stats(self, connection, deltas: Dict[str, int]):
+        """Apply per-type deltas to the counters table"""
+        for document_type, delta in deltas.items():
+            if delta:
+                await connection.execute(
+                    """
+                    INSERT INTO document_stats (document_type, count) VALUES (?, ?)
+                    ON CONFLICT (document_type) DO UPDATE SET count = count + excluded.count
+                    """,
+                    (document_type, delta),
+                )
+
+    async def _apply_rollups(
+        self,
+        connection,
+        removed: Iterable[Dict[str, Any]] = (),
+        added: Iterable[Dict[str, Any]] = (),
+    ):
+        """Apply the invoice rollup changes of a write"""
+        columns = ("invoices",) + ROLLUP_AMOUNTS
+        for (granularity, period, seller_gstin), delta in rollup_deltas(removed, added).items():
+            await connection.execute(
+                f"""
+                INSERT INTO invoice_rollups (granularity, period, seller_gstin, {", ".join(columns)})
+                VALUES (?, ?, ?, {", ".join("?" for _ in columns)})
+                ON CONFLICT (granularity, period, seller_gstin) DO UPDATE SET
+                {", ".join(f"{column} = {column} + excluded.{column}" for column in columns)}
+                """,
+                (
+                    granularity,
+                    period,
+                    seller_gstin,
+                    delta["invoices"],
+                    *(float(delta[amount]) for amount in ROLLUP_AMOUNTS),
+                ),
+            )
+            if delta["invoices"] < 0:
+                await connection.execute(
+                    """
+                    DELETE FROM invoice_rollups
+                    WHERE granularity = ? AND period = ? AND seller_gstin = ? AND invoices = 0
+                    """,
+                    (granularity, period, seller_gstin),
+                )
+
+    async def _rebuild_rollups(self, connection):
+        """Recompute the invoice rollups table from the stored invoices"""
+        await connection.execute("DELETE FROM invoice_rollups")
+        cursor = await connection.execute("SELECT * FROM documents WHERE document_type = 'invoice'")
+        try:
+            while True:
+                rows = await cursor.fetchmany(500)
+                if not rows:
+                    break
+                await self._apply_rollups(connection, added=[self._from_row(row) for row in rows])
+        finally:
+            await cursor.close()
+
+    async def _read_stats(self, connection) -> Dict[str, int]:
+        """Read the counters table into the stats dict"""
+        cursor = await connection.execute("SELECT document_type, count FROM document_stats")
+        stats = {"total": 0, "government_id": 0, "invoice": 0}
+        for row in await cursor.fetchall():
+            stats["total"] += row["count"]
+            if row["document_type"] in stats:
+                stats[row["document_type"]] = row["count"]
+        return stats
+
+    async def _written(self, changes: List[Dict[str, Any]]):
+        """Invalidate caches and ETags and notify subscribers of committed changes"""
+        document_ids = [
+            (change.get("fullDocument") or change.get("fullDocumentBeforeChange"))["id"]
+            for change in changes
+        ]
+        for document_id in document_ids:
+            document_cache.invalidate(document_id)
+        version_registry.bump()
+
+        for change in changes:
+            change["ns"] = {"coll": "documents"}
+            for handler in self._handlers:
+                try:
+                    await handler(change)
+                except Exception as e:
+                    logger.error(f"Change handler failed: {e}")
+
+    def _where(
+        self,
+        document_type: Optional[str],
+        filters: Optional[Dict[str, Any]],
+    ) -> Tuple[str, List[Any]]:
+        """
+        Translate a type filter and parse_filters conditions into SQL
+
+        Known document types are inlined as literals so SQLite can use
+        the partial expression indexes, which it cannot match against a
+        bound parameter.
+        """
+        conditions: List[str] = []
+        parameters: List[Any] = []
+
+        if document_type in FILTERABLE_FIELDS:
+            conditions.append(f"document_type = '{document_type}'")
+        elif document_type:
+            conditions.append("document_type = ?")
+            parameters.append(document_type)
+
+        operators = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+        for field, condition in (filters or {}).items():
+            expression = _field_sql(field)
+            for operator, value in condition.items():
+                if operator == "$in":
+                    conditions.append(f"{expression} IN ({', '.join('?' for _ in value)})")
+                    parameters.extend(value)
+                elif operator == "$ne":
+                    # As in MongoDB, documents without the field match $ne
+                    conditions.append(f"({expression} IS NULL OR {expression} != ?)")
+                    parameters.append(value)
+                elif operator in operators:
+                    conditions.append(f"{expression} {operators[operator]} ?")
+                    parameters.append(value)
+                else:
+                    raise ValueError(f"Unsupported filter operator: {operator}")
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return where, parameters
+
+    def _to_row(self, document: ExtractedDocument) -> Tuple[Any, ...]:
+        """Convert an ExtractedDocument into a documents row"""
+        return (
+            document.id,
+            document.document_type,
+            document.file_name,
+            json.dumps(jsonable_encoder(document.extracted_data)),
+            _timestamp(document.created_at),
+            _timestamp(document.updated_at),
+            document.version,
+            document.original_sha256,
+        )
+
+    def _from_row(self, row) -> Dict[str, Any]:
+        """Convert a documents row (or a row tuple from _to_row) into a document dict"""
+        values = dict(zip(COLUMNS, row)) if isinstance(row, tuple) else {
+            column: row[column] for column in COLUMNS
+        }
+        values["extracted_data"] = json.loads(values["extracted_data"])
+        values["created_at"] = datetime.fromisoformat(values["created_at"])
+        values["updated_at"] = datetime.fromisoformat(values["updated_at"])
+        return values
+
+
+def _replace_change(previous: Dict[str, Any], document: Dict[str, Any]) -> Dict[str, Any]:
+    """Replace change event carrying the id and type of the pre-image"""
+    return {
+        "operationType": "replace",
+        "fullDocumentBeforeChange": {"id": previous["id"], "document_type": previous["document_type"]},
+        "fullDocument": document,
+    }
+
+
+def _get_path(document: Dict[str, Any], path: str) -> Any:
+    """Read a dotted path, with array indexes, from a document"""
+    value: Any = document
+    for segment in path.split("."):
+        if isinstance(value, list) and segment.isdigit() and int(segment) < len(value):
+            value = value[int(segment)]
+        elif isinstance(value, dict):
+            value = value.get(segment)
+        else:
+            return None
+    return value
+
@@ -0,0 +1,323 @@
+"""
+Storage interface implemented by the document store backends
+"""
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from datetime import date, datetime
+
+from ..models.document import ExtractedDocument
+
+
+class DocumentStore(ABC):
+    """
+    Document storage operations used by the API
+
+    DatabaseService implements them on MongoDB and SQLiteDocumentStore on
+    an embedded SQLite database. Projections and filters use the MongoDB
+    forms produced by build_projection and parse_filters for both.
+
+    The bulk operations default to one single-document call per
+    document; backends override them with batched writes. Operations a
+    backend does not support raise NotImplementedError.
+    """
+
+    @abstractmethod
+    async def connect(self):
+        """Open the store, creating its schema and indexes"""
+
+    @abstractmethod
+    async def disconnect(self):
+        """Close the store"""
+
+    def readiness(self) -> Dict[str, Any]:
+        """
+        Get the connection state for readiness checks
+
+        Returns:
+            Dict with ready and backend-specific details
+        """
+        return {"ready": True}
+
+    @abstractmethod
+    async def insert_document(self, document: ExtractedDocument) -> str:
+        """
+        Insert a new document
+
+        Args:
+            document: ExtractedDocument to insert
+
+        Returns:
+            Document ID
+        """
+
+    @abstractmethod
+    async def get_document(
+        self,
+        document_id: str,
+        projection: Optional[Dict[str, int]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Get a document by ID
+
+        Args:
+            document_id: Document ID
+            projection: Projection (optional, full document by default)
+
+        Returns:
+            Document dict or None if not found
+        """
+
+    @abstractmethod
+    async def list_documents(
+        self,
+        document_type: Optional[str] = None,
+        limit: int = 100,
+        offset: int = 0,
+        exact_total: bool = True,
+        projection: Optional[Dict[str, int]] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Get a page of documents, newest first, together with the total count
+
+        Args:
+            document_type: Filter by document type (optional)
+            limit: Maximum number of documents to return
+            offset: Number of documents to skip
+            exact_total: Whether the total must be an exact count
+            projection: Projection (optional, full documents by default)
+            filters: extracted_data conditions from parse_filters (optional)
+
+        Returns:
+            Tuple of (list of document dicts, total count)
+        """
+
+    @abstractmethod
+    async def count_documents(
+        self,
+        document_type: Optional[str] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> int:
+        """
+        Count documents with optional filtering
+
+        Args:
+            document_type: Filter by document type (optional)
+            filters: extracted_data conditions from parse_filters (optional)
+
+        Returns:
+            Number of documents
+        """
+
+    @abstractmethod
+    async def get_stats(self) -> Dict[str, int]:
+        """
+        Get document statistics
+
+        Returns:
+            Dict with total, government_id, and invoice counts
+        """
+
+    @abstractmethod
+    async def update_document(self, document: ExtractedDocument) -> Optional[Dict[str, Any]]:
+        """
+        Replace the contents of an existing document
+
+        created_at and the original file link are kept and the version
+        is incremented.
+
+        Args:
+            document: ExtractedDocument with updated data
+
+        Returns:
+            The updated document, or None if not found
+        """
+
+    @abstractmethod
+    async def delete_document(
+        self,
+        document_id: str,
+        projection: Optional[Dict[str, int]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Delete a document by ID
+
+        Args:
+            document_id: Document ID
+            projection: Fields of the deleted document to return
+                (optional, full document by default)
+
+        Returns:
+            The deleted document, or None if not found
+        """
+
+    async def insert_documents(
+        self,
+        documents: List[ExtractedDocument],
+        ordered: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        Insert many documents
+
+        Args:
+            documents: ExtractedDocuments to insert
+            ordered: Stop at the first failing document instead of
+                attempting every document
+
+        Returns:
+            Per-document results with index, id, success and error
+        """
+        results = []
+        for index, document in enumerate(documents):
+            if ordered and results and not results[-1]["success"]:
+                error = "Not attempted after an earlier failure"
+            else:
+                try:
+                    await self.insert_document(document)
+                    error = None
+                except Exception as e:
+                    error = str(e)
+            results.append(
+                {"index": index, "id": document.id, "success": error is None, "error": error}
+            )
+        return results
+
+    async def update_documents(
+        self,
+        documents: List[ExtractedDocument],
+        ordered: bool = False,
+    ) -> List[Dict[str, Any]]:
+        """
+        Replace the contents of many existing documents
+
+        Args:
+            documents: ExtractedDocuments with updated data
+            ordered: Stop at the first failing document instead of
+                attempting every document
+
+        Returns:
+            Per-document results with index, id, success and error
+        """
+        results = []
+        for index, document in enumerate(documents):
+            if ordered and results and not results[-1]["success"]:
+                error = "Not attempted after an earlier failure"
+            else:
+                try:
+                    updated = await self.update_document(document)
+                    error = None if updated is not None else f"Document not found: {document.id}"
+                except Exception as e:
+                    error = str(e)
+            results.append(
+                {"index": index, "id": document.id, "success": error is None, "error": error}
+            )
+        return results
+
+    async def delete_documents(self, document_ids: List[str]) -> List[Dict[str, Any]]:
+        """
+        Delete many documents by ID
+
+        Args:
+            document_ids: Document IDs
+
+        Returns:
+            Per-document results with index, id, success and error
+        """
+        results = []
+        for index, document_id in enumerate(document_ids):
+            deleted = await self.delete_document(document_id, projection={"_id": 0, "id": 1})
+            error = None if deleted is not None else f"Document not found: {document_id}"
+            results.append(
+                {"index": index, "id": document_id, "success": error is None, "error": error}
+            )
+        return results
+
+    async def patch_document(
+        self,
+        document_id: str,
+        patch: Dict[str, Any],
+        expected_version: int,
+    ) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """
+        Apply a compiled patch atomically if the document is at a version
+
+        Args:
+            document_id: Document ID
+            patch: Compiled patch from compile_merge_patch/compile_json_patch
+            expected_version: Version the client last read
+
+        Returns:
+            Tuple of (updated document or None, whether the document exists)
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support patching documents")
+
+    async def search_documents(
+        self,
+        query: str,
+        document_type: Optional[str] = None,
+        limit: int = 20,
+        after: Optional[Tuple[float, Any]] = None,
+        projection: Optional[Dict[str, int]] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[Tuple[float, Any]]]:
+        """
+        Full-text search over names, identifiers and file names
+
+        Args:
+            query: Search terms
+            document_type: Filter by document type (optional)
+            limit: Maximum number of documents to return
+            after: Position of the last document of the previous page
+            projection: Projection (optional, full documents by default)
+
+        Returns:
+            Tuple of (list of document dicts, position of the last document
+            or None when there are no more results)
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support full-text search")
+
+    def export_documents(
+        self,
+        document_type: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        filters: Optional[Dict[str, Any]] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream documents in created_at order for export
+
+        Args:
+            document_type: Filter by document type (optional)
+            created_from: Earliest created_at, inclusive (optional)
+            created_to: Latest created_at, exclusive (optional)
+            filters: extracted_data conditions from parse_filters (optional)
+
+        Returns:
+            Async iterator of document dicts
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support export")
+
+    async def invoice_rollups(
+        self,
+        granularity: str,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None,
+        seller_gstin: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Read invoice rollup buckets (see app.utils.rollups)
+
+        Args:
+            granularity: "day" or "month"
+            date_from: First day (optional)
+            date_to: Last day (optional)
+            seller_gstin: Only this seller's buckets (optional)
+
+        Returns:
+            Buckets with period, seller_gstin ("" if unknown), invoices and
+            amounts, ordered by period and seller
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support invoice rollups")
+
+    async def tier_stats(self) -> Dict[str, Dict[str, int]]:
+        """Size of the hot and archive tiers; see DatabaseService.tier_stats"""
+        raise NotImplementedError(f"{type(self).__name__} has no storage tiers")
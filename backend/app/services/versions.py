@@ -0,0 +1,93 @@
+"""
+Monotonic write counters for ETags and conditional GETs
+"""
+from typing import Any, Dict, Optional
+import hashlib
+import logging
+import time
+import uuid
+
+from pymongo.read_preferences import Primary
+
+from ..config import settings
+from .change_stream import change_stream_listener
+from .read_routing import read_preference_for
+
+logger = logging.getLogger(__name__)
+
+
+class VersionRegistry:
+    """
+    In-process version counter for the documents collection
+
+    Every write bumps the counter. It starts again on every process
+    start, so ETags also carry a random epoch. Single documents do not
+    need a counter: their ETag is derived from the stored version.
+
+    The counter only covers writes this process observes: its own, and
+    other replicas' through the change stream.
+    """
+
+    def __init__(self):
+        self.epoch = uuid.uuid4().hex
+        self.collection_version = 0
+        # Writes from before this process started are assumed recent
+        self.last_write_at = time.monotonic()
+
+    def bump(self):
+        """Record a write"""
+        self.collection_version += 1
+        self.last_write_at = time.monotonic()
+
+    def reset(self):
+        """Start a new epoch, e.g. after change stream events were missed"""
+        self.epoch = uuid.uuid4().hex
+        self.bump()
+
+    def collection_etag(self, operation: str, key: str = "") -> Optional[str]:
+        """
+        Get the ETag of a collection-wide read
+
+        Args:
+            operation: Read operation name, a key of settings.read_routing
+            key: Canonical form of the query parameters
+
+        Returns:
+            Strong ETag, or None if the response could be stale
+        """
+        if not self._is_current(operation):
+            return None
+        return self._etag(operation, self.collection_version, key)
+
+    async def handle_change(self, change: Dict[str, Any]):
+        """
+        Record a write seen on the change stream
+
+        Args:
+            change: Change stream event
+        """
+        self.bump()
+
+    def _is_current(self, operation: str) -> bool:
+        """
+        Whether a read reflects every write counted so far
+
+        All writes must be observed: either through the change stream or,
+        with the change stream disabled, because this is the only
+        replica. Reads that may go to a secondary also wait until the
+        last write is older than the staleness bound.
+        """
+        if settings.change_stream_enabled and not change_stream_listener.running:
+            return False
+        if isinstance(read_preference_for(operation), Primary):
+            return True
+        return time.monotonic() - self.last_write_at >= settings.read_max_staleness_seconds
+
+    def _etag(self, scope: str, version: int, key: str) -> str:
+        """Build a strong ETag from the epoch, a version and a query key"""
+        digest = hashlib.sha1(f"{scope}\n{key}".encode()).hexdigest()[:16]
+        return f'"{self.epoch[:12]}-{version}-{digest}"'
+
+
+# Global version registry for the documents collection
+version_registry = VersionRegistry()
@@ -2,94 +2,482 @@
 WebSocket manager for real-time document updates
 """
 from fastapi import WebSocket
-from typing import List, Dict, Any
+from typing import Dict, Any, Iterable, List, Optional, Set, Tuple
+import asyncio
 import logging
 import json
 from datetime import datetime
 
+from ..config import settings
+from ..utils.patch import DOCUMENT_TYPES
+
 logger = logging.getLogger(__name__)
 
+# Close code sent to evicted slow consumers (policy violation)
+SLOW_CONSUMER_CLOSE_CODE = 1008
+
+# Subscription topics and the event data field each one matches
+TOPIC_FIELDS = {"document_type": "document_type", "id": "id"}
+
+Topic = Tuple[str, str]
+
+
+def event_topics(data: Dict[str, Any]) -> List[Topic]:
+    """
+    Get the subscription topics of one document event
+
+    An update that changed the document type also matches subscribers
+    of the previous type, so they see the document leave it.
+
+    Args:
+        data: Event data of a single document
+
+    Returns:
+        List of (topic, value) pairs
+    """
+    topics = [
+        (topic, str(data[field]))
+        for topic, field in TOPIC_FIELDS.items()
+        if data.get(field) is not None
+    ]
+    if data.get("previous_document_type") is not None:
+        topics.append(("document_type", str(data["previous_document_type"])))
+    return topics
+
+
+def parse_subscription(message: Dict[str, Any]) -> List[Topic]:
+    """
+    Get the topics of a subscribe or unsubscribe request
+
+    Args:
+        message: Request with a string or list of strings per topic,
+            e.g. {"action": "subscribe", "document_type": "invoice"}
+
+    Returns:
+        List of (topic, value) pairs
+
+    Raises:
+        ValueError: If a topic or value is invalid
+    """
+    topics: List[Topic] = []
+    for topic, values in message.items():
+        if topic == "action":
+            continue
+        if topic not in TOPIC_FIELDS:
+            raise ValueError(
+                f"Unknown topic '{topic}'; expected one of: {', '.join(TOPIC_FIELDS)}"
+            )
+        if isinstance(values, str):
+            values = [values]
+        if not isinstance(values, list) or not all(isinstance(v, str) for v in values):
+            raise ValueError(f"Topic '{topic}' takes a string or a list of strings")
+        if topic == "document_type":
+            for value in values:
+                if value not in DOCUMENT_TYPES:
+                    raise ValueError(f"Unknown document type '{value}'")
+        topics.extend((topic, value) for value in values)
+    return topics
+
+
+class ClientConnection:
+    """A connected client with its bounded outbound queue and writer task"""
+
+    def __init__(self, websocket: WebSocket, queue_size: int):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.writer: Optional[asyncio.Task] = None
+        self.max_depth = 0
+        # None until the client subscribes; it then receives only events
+        # matching one of its topics
+        self.subscriptions: Optional[Set[Topic]] = None
+
 
 class WebSocketManager:
-    """Manages WebSocket connections for real-time updates"""
+    """
+    Manages WebSocket connections for real-time updates
 
-    def __init__(self):
+    Every connection has a bounded send queue drained by its own writer
+    task, so a broadcast only enqueues one serialized message per
+    connection and never waits on a client. A client whose queue
+    overflows, or whose send does not complete within the send timeout,
+    is disconnected instead of holding up the others or growing memory
+    without bound.
+
+    Clients that subscribe to topics (a document type or document id)
+    receive only matching events. Subscribers are indexed by topic, so
+    an event costs one lookup per topic and one enqueue per matching
+    connection rather than a pass over every connection. Clients that
+    never subscribe receive every event.
+    """
+
+    def __init__(
+        self,
+        send_queue_size: int,
+        send_timeout_seconds: float,
+        max_subscriptions: int,
+    ):
+        self.send_queue_size = send_queue_size
+        self.send_timeout_seconds = send_timeout_seconds
+        self.max_subscriptions = max_subscriptions
         # Store active connections
-        self.active_connections: List[WebSocket] = []
+        self.active_connections: Dict[WebSocket, ClientConnection] = {}
+        # Connections without subscriptions, and subscribers by topic
+        self._unfiltered: Set[ClientConnection] = set()
+        self._subscribers: Dict[Topic, Set[ClientConnection]] = {}
+        self.sent = 0
+        self.filtered = 0
+        self.evictions = {"overflow": 0, "timeout": 0, "error": 0}
+        self._closing: set = set()
 
     async def connect(self, websocket: WebSocket):
         """
-        Accept a new WebSocket connection
+        Accept a new WebSocket connection and start its writer
 
         Args:
             websocket: WebSocket connection to accept
         """
         await websocket.accept()
-        self.active_connections.append(websocket)
+        connection = ClientConnection(websocket, self.send_queue_size)
+        connection.writer = asyncio.create_task(self._write(connection))
+        self.active_connections[websocket] = connection
+        self._unfiltered.add(connection)
         logger.info(f"WebSocket connected. Total connections: {len(self.active_connections)}")
 
     def disconnect(self, websocket: WebSocket):
         """
-        Remove a WebSocket connection
+        Remove a WebSocket connection and stop its writer
 
         Args:
             websocket: WebSocket connection to remove
         """
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
-            logger.info(
-                f"WebSocket disconnected. Total connections: {len(self.active_connections)}"
-            )
+        connection = self.active_connections.pop(websocket, None)
+        if connection is None:
+            return
+
+        self._unfiltered.discard(connection)
+        self._unindex(connection, connection.subscriptions or ())
+        if connection.writer is not None and connection.writer is not asyncio.current_task():
+            connection.writer.cancel()
+        logger.info(f"WebSocket disconnected. Total connections: {len(self.active_connections)}")
 
     async def broadcast(self, event_type: str, data: Dict[str, Any]):
         """
-        Broadcast a message to all connected clients
+        Queue a single document event for the clients it matches
+
+        The message is serialized once; each receiving connection costs
+        one non-blocking enqueue.
 
         Args:
             event_type: Type of event (INSERT, UPDATE, DELETE)
             data: Event data to broadcast
         """
-        message = {
-            "type": event_type,
-            "timestamp": datetime.utcnow().isoformat(),
-            "data": data,
-        }
+        # Enqueueing may evict clients, which changes the connection sets
+        connected = len(self.active_connections)
+        recipients = list(self._unfiltered | self._subscribers_of(event_topics(data)))
+        message_json = self._serialize(event_type, data, self._timestamp())
+        for connection in recipients:
+            self._enqueue(connection, message_json)
 
-        # Convert message to JSON
-        message_json = json.dumps(message)
+        self.filtered += connected - len(recipients)
+        logger.debug(f"Queued {event_type} event for {len(recipients)} clients")
 
-        # Send to all connected clients
-        disconnected = []
+    async def broadcast_bulk(
+        self,
+        event_type: str,
+        key: str,
+        items: List[Any],
+        item_topics: List[List[Topic]],
+    ):
+        """
+        Queue a bulk event, giving each subscriber only its matching items
 
-        for connection in self.active_connections:
-            try:
-                await connection.send_text(message_json)
-            except Exception as e:
-                logger.error(f"Error sending to WebSocket: {e}")
-                disconnected.append(connection)
+        Subscribers that match the same items share one serialized
+        message.
 
-        # Remove disconnected clients
-        for connection in disconnected:
-            self.disconnect(connection)
+        Args:
+            event_type: Type of event (BULK_INSERT, BULK_UPDATE, BULK_DELETE)
+            key: Key of the item list in the event data
+            items: Documents or document ids of the event
+            item_topics: Topics of each item
+        """
+        # Select every recipient before enqueueing, which may evict clients
+        connected = len(self.active_connections)
+        unfiltered = list(self._unfiltered)
+        selected: Dict[ClientConnection, List[int]] = {}
+        for index, topics in enumerate(item_topics):
+            for connection in self._subscribers_of(topics):
+                selected.setdefault(connection, []).append(index)
 
-        logger.info(
-            f"Broadcasted {event_type} event to {len(self.active_connections)} clients"
-        )
+        timestamp = self._timestamp()
+        message_json = self._serialize(event_type, {key: items}, timestamp)
+        for connection in unfiltered:
+            self._enqueue(connection, message_json)
+
+        groups: Dict[Tuple[int, ...], List[ClientConnection]] = {}
+        for connection, indexes in selected.items():
+            groups.setdefault(tuple(indexes), []).append(connection)
+
+        for indexes, connections in groups.items():
+            if len(indexes) < len(items):
+                subset = [items[index] for index in indexes]
+                group_json = self._serialize(event_type, {key: subset}, timestamp)
+            else:
+                group_json = message_json
+            for connection in connections:
+                self._enqueue(connection, group_json)
+
+        recipients = len(unfiltered) + len(selected)
+        self.filtered += connected - recipients
+        logger.debug(f"Queued {event_type} event for {recipients} clients")
+
+    def subscribe(self, websocket: WebSocket, topics: Iterable[Topic]) -> Dict[str, List[str]]:
+        """
+        Add topics to a client's subscriptions
+
+        From its first subscription on, the client receives only events
+        matching one of its topics.
+
+        Args:
+            websocket: Subscribing WebSocket connection
+            topics: (topic, value) pairs to add
+
+        Returns:
+            The client's subscriptions by topic
+
+        Raises:
+            ValueError: If the client would exceed the subscription limit
+        """
+        connection = self.active_connections[websocket]
+        current = connection.subscriptions or set()
+        added = set(topics) - current
+        if len(current) + len(added) > self.max_subscriptions:
+            raise ValueError(f"At most {self.max_subscriptions} subscriptions per connection")
+
+        connection.subscriptions = current | added
+        self._unfiltered.discard(connection)
+        for topic in added:
+            self._subscribers.setdefault(topic, set()).add(connection)
+        return self.subscriptions(websocket)
+
+    def unsubscribe(
+        self,
+        websocket: WebSocket,
+        topics: Optional[Iterable[Topic]] = None,
+    ) -> Dict[str, List[str]]:
+        """
+        Remove topics from a client's subscriptions
+
+        A client that unsubscribes from everything receives no events
+        until it subscribes again.
+
+        Args:
+            websocket: WebSocket connection
+            topics: (topic, value) pairs to remove, or None for all
+
+        Returns:
+            The client's subscriptions by topic
+        """
+        connection = self.active_connections[websocket]
+        current = connection.subscriptions or set()
+        removed = current if topics is None else current & set(topics)
+
+        connection.subscriptions = current - removed
+        self._unfiltered.discard(connection)
+        self._unindex(connection, removed)
+        return self.subscriptions(websocket)
+
+    def subscriptions(self, websocket: WebSocket) -> Dict[str, List[str]]:
+        """
+        Get a client's subscriptions
+
+        Args:
+            websocket: WebSocket connection
+
+        Returns:
+            Subscribed values by topic
+        """
+        connection = self.active_connections[websocket]
+        subscribed: Dict[str, List[str]] = {topic: [] for topic in TOPIC_FIELDS}
+        for topic, value in sorted(connection.subscriptions or ()):
+            subscribed[topic].append(value)
+        return subscribed
+
+    async def receive(self, websocket: WebSocket, message: str):
+        """
+        Handle a message from a client
+
+        Subscribe and unsubscribe requests are answered with a
+        SUBSCRIPTIONS message listing the client's subscriptions, or an
+        ERROR message; other messages are echoed back.
+
+        Args:
+            websocket: WebSocket connection the message came from
+            message: Message text
+        """
+        if websocket not in self.active_connections:
+            return
+
+        try:
+            request = json.loads(message)
+        except ValueError:
+            request = None
+        action = request.get("action") if isinstance(request, dict) else None
+        if action is None:
+            await self.send_personal_message(f"Received: {message}", websocket)
+            return
+
+        timestamp = self._timestamp()
+        try:
+            if action not in ("subscribe", "unsubscribe"):
+                raise ValueError(f"Unknown action '{action}'")
+            topics = parse_subscription(request)
+            if action == "subscribe":
+                if not topics:
+                    raise ValueError("No topics to subscribe to")
+                subscribed = self.subscribe(websocket, topics)
+            else:
+                subscribed = self.unsubscribe(websocket, topics or None)
+        except ValueError as e:
+            reply = self._serialize("ERROR", {"detail": str(e)}, timestamp)
+        else:
+            reply = self._serialize("SUBSCRIPTIONS", subscribed, timestamp)
+        await self.send_personal_message(reply, websocket)
 
     async def send_personal_message(self, message: str, websocket: WebSocket):
         """
-        Send a message to a specific client
+        Queue a message for a specific client
 
         Args:
             message: Message to send
             websocket: Target WebSocket connection
         """
+        connection = self.active_connections.get(websocket)
+        if connection is not None:
+            self._enqueue(connection, message)
+
+    async def close(self):
+        """Stop every writer, e.g. on shutdown"""
+        connections = list(self.active_connections.values())
+        self.active_connections.clear()
+        for connection in connections:
+            connection.writer.cancel()
+        await asyncio.gather(
+            *(connection.writer for connection in connections), return_exceptions=True
+        )
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get the connection and send queue metrics
+
+        Returns:
+            Dict with connection count, queued messages in total and in the
+            fullest queue, the highest depth any current queue reached,
+            messages sent, evictions by reason, subscription counts and
+            event deliveries skipped by subscription filtering
+        """
+        depths = [connection.queue.qsize() for connection in self.active_connections.values()]
+        return {
+            "connections": len(depths),
+            "queued_messages": sum(depths),
+            "queue_depth_max": max(depths, default=0),
+            "queue_depth_high_watermark": max(
+                (connection.max_depth for connection in self.active_connections.values()),
+                default=0,
+            ),
+            "send_queue_size": self.send_queue_size,
+            "messages_sent_total": self.sent,
+            "evictions_total": dict(self.evictions),
+            "subscribed_connections": len(depths) - len(self._unfiltered),
+            "subscribed_topics": len(self._subscribers),
+            "deliveries_filtered_total": self.filtered,
+        }
+
+    def _subscribers_of(self, topics: Iterable[Topic]) -> Set[ClientConnection]:
+        """Get the connections subscribed to any of the topics"""
+        subscribers: Set[ClientConnection] = set()
+        for topic in topics:
+            subscribers.update(self._subscribers.get(topic, ()))
+        return subscribers
+
+    def _unindex(self, connection: ClientConnection, topics: Iterable[Topic]):
+        """Remove a connection from the subscriber index of the topics"""
+        for topic in topics:
+            subscribers = self._subscribers.get(topic)
+            if subscribers is not None:
+                subscribers.discard(connection)
+                if not subscribers:
+                    del self._subscribers[topic]
+
+    @staticmethod
+    def _timestamp() -> str:
+        """Get the timestamp of an outgoing message"""
+        return datetime.utcnow().isoformat()
+
+    @staticmethod
+    def _serialize(event_type: str, data: Any, timestamp: str) -> str:
+        """Serialize an outgoing message"""
+        return json.dumps({"type": event_type, "timestamp": timestamp, "data": data})
+
+    def _enqueue(self, connection: ClientConnection, message: str):
+        """Queue a message without waiting, evicting the client if its queue is full"""
+        if self.active_connections.get(connection.websocket) is not connection:
+            # Evicted earlier in the same broadcast
+            return
         try:
-            await websocket.send_text(message)
+            connection.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self._evict(connection, "overflow")
+            return
+        connection.max_depth = max(connection.max_depth, connection.queue.qsize())
+
+    async def _write(self, connection: ClientConnection):
+        """Send queued messages to one client until cancelled or evicted"""
+        while True:
+            message = await connection.queue.get()
+            try:
+                await asyncio.wait_for(
+                    connection.websocket.send_text(message), self.send_timeout_seconds
+                )
+                self.sent += 1
+            except asyncio.TimeoutError:
+                self._evict(connection, "timeout")
+                return
+            except Exception as e:
+                logger.error(f"Error sending to WebSocket: {e}")
+                self._evict(connection, "error")
+                return
+
+    def _evict(self, connection: ClientConnection, reason: str):
+        """Disconnect a client that cannot keep up and close its socket"""
+        if self.active_connections.get(connection.websocket) is not connection:
+            return
+
+        self.evictions[reason] += 1
+        logger.warning(
+            f"Evicting WebSocket client ({reason}, {connection.queue.qsize()} messages queued)"
+        )
+        self.disconnect(connection.websocket)
+        if reason != "error":
+            task = asyncio.create_task(self._close(connection))
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+
+    async def _close(self, connection: ClientConnection):
+        """Close an evicted client's socket, giving up after the send timeout"""
+        if connection.writer is not None:
+            await asyncio.gather(connection.writer, return_exceptions=True)
+        try:
+            await asyncio.wait_for(
+                connection.websocket.close(code=SLOW_CONSUMER_CLOSE_CODE, reason="Slow consumer"),
+                self.send_timeout_seconds,
+            )
         except Exception as e:
-            logger.error(f"Error sending personal message: {e}")
-            self.disconnect(websocket)
+            logger.debug(f"Closing evicted WebSocket failed: {e}")
 
 
 # Global WebSocket manager instance
-ws_manager = WebSocketManager()
+ws_manager = WebSocketManager(
+    send_queue_size=settings.websocket_send_queue_size,
+    send_timeout_seconds=settings.websocket_send_timeout_seconds,
+    max_subscriptions=settings.websocket_max_subscriptions,
+)
@@ -2,5 +2,21 @@
 Utility functions
 """
 from .validators import validate_document_type
+from .projection import build_projection, apply_projection
+from .dates import parse_datetime, normalize_datetimes
+from .cursor import encode_cursor, decode_cursor
+from .filters import parse_filters
+from .patch import compile_merge_patch, compile_json_patch
 
-__all__ = ["validate_document_type"]
+__all__ = [
+    "validate_document_type",
+    "build_projection",
+    "apply_projection",
+    "parse_datetime",
+    "normalize_datetimes",
+    "encode_cursor",
+    "decode_cursor",
+    "parse_filters",
+    "compile_merge_patch",
+    "compile_json_patch",
+]
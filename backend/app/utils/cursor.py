@@ -0,0 +1,44 @@
+"""
+Opaque pagination cursor utilities
+"""
+from typing import Any, Dict
+import base64
+import json
+
+
+def encode_cursor(position: Dict[str, Any]) -> str:
+    """
+    Encode a pagination position as an opaque URL-safe cursor
+
+    Args:
+        position: JSON-serializable position dict
+
+    Returns:
+        Cursor string
+    """
+    raw = json.dumps(position, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """
+    Decode a cursor produced by encode_cursor
+
+    Args:
+        cursor: Cursor string
+
+    Returns:
+        Position dict
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        position = json.loads(raw)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+    if not isinstance(position, dict):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return position
@@ -0,0 +1,57 @@
+"""
+Datetime utilities for stored documents
+
+Documents written before created_at was stored as a native BSON date
+hold it as an ISO format string. These helpers let the read path accept
+both representations until the datetime migration has run.
+"""
+from datetime import datetime, timezone
+from typing import Any, Dict, Union
+
+# Document fields stored as datetimes
+DATETIME_FIELDS = ("created_at", "updated_at")
+
+
+def utc_now() -> datetime:
+    """
+    Current naive UTC time truncated to BSON date (millisecond) precision
+
+    Returns:
+        Naive UTC datetime
+    """
+    now = datetime.utcnow()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+def parse_datetime(value: Union[str, datetime]) -> datetime:
+    """
+    Convert a stored datetime value to a datetime
+
+    Args:
+        value: BSON datetime or legacy ISO format string
+
+    Returns:
+        Naive UTC datetime
+    """
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def normalize_datetimes(document: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert legacy string datetime fields of a stored document in place
+
+    Args:
+        document: Document dict read from MongoDB
+
+    Returns:
+        The same document dict
+    """
+    for field in DATETIME_FIELDS:
+        if isinstance(document.get(field), str):
+            document[field] = parse_datetime(document[field])
+
+    return document
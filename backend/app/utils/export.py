@@ -0,0 +1,322 @@
+"""
+Streaming document export in NDJSON, CSV and Parquet
+
+Documents are consumed from an async iterator and serialized into
+chunks of roughly chunk_bytes, so memory use does not depend on the
+number of documents exported. CSV and Parquet are flat: invoices become
+one row per line item, with the invoice fields repeated on each row.
+"""
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+import csv
+import importlib.util
+import io
+import json
+
+from fastapi.encoders import jsonable_encoder
+
+# Columns as (name, type); types are "string", "float", "int" or "timestamp"
+BASE_COLUMNS: List[Tuple[str, str]] = [
+    ("id", "string"),
+    ("document_type", "string"),
+    ("file_name", "string"),
+    ("created_at", "timestamp"),
+    ("updated_at", "timestamp"),
+    ("version", "int"),
+]
+
+GOVERNMENT_ID_COLUMNS: List[Tuple[str, str]] = [
+    (f"extracted_data.{field}", "string")
+    for field in (
+        "full_name",
+        "id_number",
+        "date_of_birth",
+        "gender",
+        "address",
+        "issue_date",
+        "expiry_date",
+        "nationality",
+        "document_type",
+    )
+]
+
+INVOICE_COLUMNS: List[Tuple[str, str]] = [
+    ("extracted_data.seller_info.name", "string"),
+    ("extracted_data.seller_info.gstin", "string"),
+    ("extracted_data.seller_info.contact_numbers", "string"),
+    ("extracted_data.customer_info.name", "string"),
+    ("extracted_data.customer_info.address", "string"),
+    ("extracted_data.customer_info.contact", "string"),
+    ("extracted_data.customer_info.gstin", "string"),
+    ("extracted_data.invoice_details.date", "string"),
+    ("extracted_data.invoice_details.bill_no", "string"),
+    ("extracted_data.invoice_details.gold_price_per_unit", "float"),
+    ("extracted_data.summary.sub_total", "float"),
+    ("extracted_data.summary.discount", "float"),
+    ("extracted_data.summary.taxable_amount", "float"),
+    ("extracted_data.summary.sgst_percentage", "float"),
+    ("extracted_data.summary.sgst_amount", "float"),
+    ("extracted_data.summary.cgst_percentage", "float"),
+    ("extracted_data.summary.cgst_amount", "float"),
+    ("extracted_data.summary.grand_total", "float"),
+    ("extracted_data.payment_details.cash", "float"),
+    ("extracted_data.payment_details.upi", "float"),
+    ("extracted_data.payment_details.card", "float"),
+    ("extracted_data.total_amount_in_words", "string"),
+]
+
+LINE_ITEM_PREFIX = "extracted_data.line_items."
+
+LINE_ITEM_COLUMNS: List[Tuple[str, str]] = [("line_item_index", "int")] + [
+    (f"{LINE_ITEM_PREFIX}{field}", kind)
+    for field, kind in (
+        ("description", "string"),
+        ("hsn_code", "string"),
+        ("weight", "float"),
+        ("rate", "float"),
+        ("wastage_allowance_percentage", "float"),
+        ("making_charges_percentage", "float"),
+        ("amount", "float"),
+    )
+]
+
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+
+def export_columns(document_type: Optional[str] = None) -> List[Tuple[str, str]]:
+    """
+    Get the flat export columns for a document type
+
+    Args:
+        document_type: Exported document type, or None for all types
+
+    Returns:
+        List of (column name, column type)
+    """
+    columns = list(BASE_COLUMNS)
+    if document_type in (None, "government_id"):
+        columns += GOVERNMENT_ID_COLUMNS
+    if document_type in (None, "invoice"):
+        columns += INVOICE_COLUMNS + LINE_ITEM_COLUMNS
+    return columns
+
+
+def flatten_document(document: Dict[str, Any], columns: List[Tuple[str, str]]) -> Iterator[Dict[str, Any]]:
+    """
+    Flatten a document into export rows
+
+    Invoices yield one row per line item (a single row without line
+    items); other documents yield one row. Fields without a column are
+    dropped.
+
+    Args:
+        document: Document dict
+        columns: Columns from export_columns
+
+    Yields:
+        Row dicts keyed by column name, with values converted to the
+        column types
+    """
+    row = {
+        name: _convert(_get_path(document, name), kind)
+        for name, kind in columns
+        if name != "line_item_index" and not name.startswith(LINE_ITEM_PREFIX)
+    }
+
+    line_items = (document.get("extracted_data") or {}).get("line_items")
+    if document.get("document_type") != "invoice" or not isinstance(line_items, list) or not line_items:
+        yield row
+        return
+
+    line_columns = [(name, kind) for name, kind in columns if name.startswith(LINE_ITEM_PREFIX)]
+    for index, item in enumerate(line_items):
+        line_row = dict(row)
+        line_row["line_item_index"] = index
+        for name, kind in line_columns:
+            value = item.get(name[len(LINE_ITEM_PREFIX):]) if isinstance(item, dict) else None
+            line_row[name] = _convert(value, kind)
+        yield line_row
+
+
+def parquet_supported() -> bool:
+    """Whether the optional pyarrow dependency for Parquet is installed"""
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+async def stream_ndjson(
+    documents: AsyncIterator[Dict[str, Any]],
+    chunk_bytes: int,
+) -> AsyncIterator[bytes]:
+    """
+    Serialize documents as newline-delimited JSON
+
+    Args:
+        documents: Documents to export
+        chunk_bytes: Approximate size of the yielded chunks
+
+    Yields:
+        Encoded chunks
+    """
+    buffer = io.StringIO()
+    async for document in documents:
+        buffer.write(json.dumps(jsonable_encoder(document), ensure_ascii=False))
+        buffer.write("\n")
+        if buffer.tell() >= chunk_bytes:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+async def stream_csv(
+    documents: AsyncIterator[Dict[str, Any]],
+    columns: List[Tuple[str, str]],
+    chunk_bytes: int,
+) -> AsyncIterator[bytes]:
+    """
+    Serialize documents as CSV rows with a header
+
+    Args:
+        documents: Documents to export
+        columns: Columns from export_columns
+        chunk_bytes: Approximate size of the yielded chunks
+
+    Yields:
+        Encoded chunks
+    """
+    names = [name for name, _ in columns]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(names)
+
+    async for document in documents:
+        for row in flatten_document(document, columns):
+            writer.writerow(_csv_value(row.get(name)) for name in names)
+        if buffer.tell() >= chunk_bytes:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+async def stream_parquet(
+    documents: AsyncIterator[Dict[str, Any]],
+    columns: List[Tuple[str, str]],
+    row_group_size: int,
+) -> AsyncIterator[bytes]:
+    """
+    Serialize documents as a Parquet file, one row group at a time
+
+    Requires pyarrow (see parquet_supported).
+
+    Args:
+        documents: Documents to export
+        columns: Columns from export_columns
+        row_group_size: Rows buffered per row group
+
+    Yields:
+        Encoded chunks, each holding at least one complete row group
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    arrow_types = {
+        "string": pa.string(),
+        "float": pa.float64(),
+        "int": pa.int64(),
+        "timestamp": pa.timestamp("ms"),
+    }
+    schema = pa.schema([(name, arrow_types[kind]) for name, kind in columns])
+
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        rows: List[Dict[str, Any]] = []
+        async for document in documents:
+            rows.extend(flatten_document(document, columns))
+            if len(rows) >= row_group_size:
+                writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+                rows = []
+                yield sink.drain()
+
+        if rows:
+            writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+    finally:
+        writer.close()
+
+    yield sink.drain()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file collecting Parquet output until drained"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _get_path(document: Dict[str, Any], path: str) -> Any:
+    """Read a dotted path from a document, None if absent"""
+    value: Any = document
+    for segment in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(segment)
+    return value
+
+
+def _convert(value: Any, kind: str) -> Any:
+    """Convert an extracted value to a column type, None if it does not fit"""
+    if value is None:
+        return None
+
+    if kind == "timestamp":
+        return value if isinstance(value, datetime) else None
+
+    if kind in ("float", "int"):
+        if isinstance(value, str):
+            value = value.replace(",", "").strip()
+        try:
+            return float(value) if kind == "float" else int(value)
+        except (TypeError, ValueError):
+            return None
+
+    if isinstance(value, list):
+        return "; ".join(str(item) for item in value)
+    if isinstance(value, dict):
+        return json.dumps(jsonable_encoder(value), ensure_ascii=False)
+    return str(value)
+
+
+def _csv_value(value: Any) -> Any:
+    """Format a converted value for CSV"""
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
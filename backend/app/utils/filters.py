@@ -0,0 +1,115 @@
+"""
+Structured filter DSL over extracted_data
+
+Filters are written as "path:op:value", where path is relative to
+extracted_data and must be whitelisted for the document type, e.g.
+"summary.grand_total:gt:50000" or "expiry_date:lte:2024-03-31".
+"""
+from datetime import date
+from typing import Any, Dict, List
+
+# Filterable extracted_data paths per document type, with their value type
+FILTERABLE_FIELDS: Dict[str, Dict[str, str]] = {
+    "invoice": {
+        "seller_info.name": "string",
+        "seller_info.gstin": "string",
+        "customer_info.name": "string",
+        "customer_info.gstin": "string",
+        "invoice_details.date": "date",
+        "invoice_details.bill_no": "string",
+        "summary.taxable_amount": "number",
+        "summary.sgst_amount": "number",
+        "summary.cgst_amount": "number",
+        "summary.grand_total": "number",
+    },
+    "government_id": {
+        "full_name": "string",
+        "id_number": "string",
+        "nationality": "string",
+        "document_type": "string",
+        "date_of_birth": "date",
+        "issue_date": "date",
+        "expiry_date": "date",
+    },
+}
+
+# Hot filter paths, indexed with a partial index per document type
+PARTIAL_INDEXES: Dict[str, List[List[str]]] = {
+    "invoice": [
+        ["seller_info.gstin", "invoice_details.date"],
+        ["invoice_details.date"],
+        ["summary.grand_total"],
+    ],
+    "government_id": [
+        ["expiry_date"],
+        ["id_number"],
+    ],
+}
+
+OPERATORS = {
+    "eq": "$eq",
+    "ne": "$ne",
+    "gt": "$gt",
+    "gte": "$gte",
+    "lt": "$lt",
+    "lte": "$lte",
+    "in": "$in",
+}
+
+
+def _parse_value(value: str, value_type: str) -> Any:
+    """Convert a filter value to the stored representation of its type"""
+    if value_type == "number":
+        return float(value)
+    if value_type == "date":
+        # Dates are stored as YYYY-MM-DD strings, which sort chronologically
+        return date.fromisoformat(value).isoformat()
+    return value
+
+
+def parse_filters(document_type: str, filters: List[str]) -> Dict[str, Any]:
+    """
+    Compile filter expressions into a MongoDB query on extracted_data
+
+    Conditions on the same path are combined, so a range is written as
+    two filters ("invoice_details.date:gte:2024-03-01" and
+    "invoice_details.date:lt:2024-04-01"). Values for "in" are separated
+    by "|".
+
+    Args:
+        document_type: Document type the filters apply to
+        filters: Filter expressions in "path:op:value" form
+
+    Returns:
+        MongoDB query fragment keyed by extracted_data paths
+
+    Raises:
+        ValueError: If a filter is malformed or its path is not filterable
+    """
+    fields = FILTERABLE_FIELDS.get(document_type)
+    if fields is None:
+        raise ValueError("Filters require document_type to be government_id or invoice")
+
+    query: Dict[str, Dict[str, Any]] = {}
+    for expression in filters:
+        parts = expression.split(":", 2)
+        if len(parts) != 3:
+            raise ValueError(f"Invalid filter (expected path:op:value): {expression}")
+
+        path, op, value = parts
+        if path not in fields:
+            raise ValueError(f"Field is not filterable for {document_type}: {path}")
+        if op not in OPERATORS:
+            raise ValueError(f"Unknown filter operator: {op}")
+
+        try:
+            if op == "in":
+                parsed = [_parse_value(item, fields[path]) for item in value.split("|")]
+            else:
+                parsed = _parse_value(value, fields[path])
+        except ValueError:
+            raise ValueError(f"Invalid {fields[path]} value in filter: {expression}")
+
+        query.setdefault(f"extracted_data.{path}", {})[OPERATORS[op]] = parsed
+
+    return query
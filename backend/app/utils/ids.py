@@ -0,0 +1,137 @@
+"""
+Time-ordered document IDs
+
+New document IDs are UUIDv7 (RFC 9562): a millisecond timestamp
+followed by a counter and random bits, so IDs created later sort later
+and inserts append to the right edge of the id index instead of
+landing on random pages. MongoDB stores them as 16-byte BSON binary
+(subtype 4); the API exposes the usual hyphenated string.
+
+Documents created before binary IDs keep their uuid4 string until the
+binary_ids migration converts them; while settings.legacy_string_ids is
+enabled, lookups match both forms.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Union
+import os
+import threading
+import time
+import uuid
+
+from bson.binary import Binary, UUID_SUBTYPE
+
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+
+def uuid7() -> uuid.UUID:
+    """
+    Generate a UUIDv7
+
+    IDs generated by this process are strictly increasing: within one
+    millisecond a 12-bit counter orders them, and when it runs out the
+    timestamp is advanced.
+
+    Returns:
+        UUID with version 7
+    """
+    global _last_ms, _counter
+
+    with _lock:
+        now_ms = time.time_ns() // 1_000_000
+        if now_ms > _last_ms:
+            _last_ms = now_ms
+            # Random start, leaving headroom for IDs in the same millisecond
+            _counter = int.from_bytes(os.urandom(2), "big") & 0x7FF
+        else:
+            _counter += 1
+            if _counter > 0xFFF:
+                _last_ms += 1
+                _counter = 0
+        timestamp_ms, counter = _last_ms, _counter
+
+    random_bits = int.from_bytes(os.urandom(8), "big") & ((1 << 62) - 1)
+    return uuid.UUID(
+        int=(timestamp_ms << 80) | (0x7 << 76) | (counter << 64) | (0b10 << 62) | random_bits
+    )
+
+
+def new_document_id() -> str:
+    """Generate the ID of a new document"""
+    return str(uuid7())
+
+
+def _canonical_uuid(document_id: str) -> Optional[uuid.UUID]:
+    """Parse an ID that is a UUID in canonical lowercase hyphenated form"""
+    try:
+        value = uuid.UUID(document_id)
+    except (ValueError, TypeError, AttributeError):
+        return None
+    return value if str(value) == document_id else None
+
+
+def to_stored_id(document_id: str) -> Union[Binary, str]:
+    """
+    Convert an API document ID to its stored form
+
+    Args:
+        document_id: Document ID string
+
+    Returns:
+        BSON binary UUID for canonical UUID strings, otherwise the string
+    """
+    value = _canonical_uuid(document_id)
+    return Binary.from_uuid(value) if value is not None else document_id
+
+
+def from_stored_id(stored: Any) -> Any:
+    """
+    Convert a stored document ID to its API string
+
+    Args:
+        stored: BSON binary UUID or legacy string
+
+    Returns:
+        Document ID string; other values are returned unchanged
+    """
+    if isinstance(stored, Binary) and stored.subtype == UUID_SUBTYPE:
+        return str(stored.as_uuid())
+    if isinstance(stored, uuid.UUID):
+        return str(stored)
+    return stored
+
+
+def stored_id_values(document_ids: Iterable[str], legacy_strings: bool) -> List[Union[Binary, str]]:
+    """
+    Get the stored values that may hold the given document IDs
+
+    Args:
+        document_ids: Document ID strings
+        legacy_strings: Also include the string form of UUID IDs, for
+            documents written before binary IDs
+
+    Returns:
+        Values to match with $in
+    """
+    values: List[Union[Binary, str]] = []
+    for document_id in document_ids:
+        stored = to_stored_id(document_id)
+        values.append(stored)
+        if legacy_strings and isinstance(stored, Binary):
+            values.append(document_id)
+    return values
+
+
+def id_condition(document_id: str, legacy_strings: bool) -> Union[Binary, str, Dict[str, Any]]:
+    """
+    Build the query condition on the id field matching one document ID
+
+    Args:
+        document_id: Document ID string
+        legacy_strings: Also match the ID stored as a string
+
+    Returns:
+        Equality value, or an $in condition when both forms may be stored
+    """
+    values = stored_id_values([document_id], legacy_strings)
+    return values[0] if len(values) == 1 else {"$in": values}
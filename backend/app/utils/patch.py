@@ -0,0 +1,258 @@
+"""
+Compile JSON Merge Patch (RFC 7396) and JSON Patch (RFC 6902) documents
+into MongoDB update operators
+
+Only document_type, file_name and paths below extracted_data can be
+patched. The compiled form is a dict with:
+    update: MongoDB update document ($set/$unset/$push)
+    conditions: extra filter conditions from JSON Patch "test" operations
+    changed: dotted paths whose new value should be reported
+    removed: dotted paths that were removed
+"""
+from typing import Any, Dict, List, Tuple
+import copy
+
+# Top-level document fields that may be patched
+PATCHABLE_FIELDS = ("document_type", "file_name", "extracted_data")
+
+DOCUMENT_TYPES = ("government_id", "invoice")
+
+
+def _check_key(key: str):
+    """Reject keys MongoDB would interpret as paths or operators"""
+    if not key or "." in key or key.startswith("$"):
+        raise ValueError(f"Invalid field name in patch: {key!r}")
+
+
+def _check_top_level(field: str, value: Any, removing: bool = False):
+    """Validate a change to a top-level document field"""
+    if field not in PATCHABLE_FIELDS:
+        raise ValueError(f"Field cannot be patched: {field}")
+    if removing:
+        raise ValueError(f"Field cannot be removed: {field}")
+    if field == "document_type" and value not in DOCUMENT_TYPES:
+        raise ValueError(f"Invalid document type: {value}")
+    if field == "file_name" and not isinstance(value, str):
+        raise ValueError("file_name must be a string")
+    if field == "extracted_data" and not isinstance(value, dict):
+        raise ValueError("extracted_data must be an object")
+
+
+def _check_overlaps(paths: List[str]):
+    """Reject patches touching the same path twice or a path and its parent"""
+    seen = sorted(paths)
+    for previous, current in zip(seen, seen[1:]):
+        if current == previous or current.startswith(previous + "."):
+            raise ValueError(f"Patch touches overlapping paths: {previous}, {current}")
+
+
+def _compiled(sets, unsets, pushes, conditions) -> Dict[str, Any]:
+    """Assemble the compiled patch dict"""
+    _check_overlaps(list(sets) + list(unsets) + list(pushes))
+
+    update: Dict[str, Any] = {}
+    if sets:
+        update["$set"] = sets
+    if unsets:
+        update["$unset"] = {path: "" for path in unsets}
+    if pushes:
+        update["$push"] = pushes
+    if not update:
+        raise ValueError("Patch does not change anything")
+
+    return {
+        "update": update,
+        "conditions": conditions,
+        "changed": list(sets) + list(pushes),
+        "removed": list(unsets),
+    }
+
+
+def compile_merge_patch(patch: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Compile a JSON Merge Patch into $set/$unset operators
+
+    Nested objects are merged path by path, null removes a field, and any
+    other value (including arrays) replaces the field.
+
+    Args:
+        patch: Merge patch object
+
+    Returns:
+        Compiled patch dict (see module docstring)
+
+    Raises:
+        ValueError: If the patch is invalid or touches protected fields
+    """
+    if not isinstance(patch, dict):
+        raise ValueError("Merge patch must be a JSON object")
+
+    sets: Dict[str, Any] = {}
+    unsets: List[str] = []
+
+    def walk(prefix: str, value: Dict[str, Any]):
+        for key, item in value.items():
+            _check_key(key)
+            path = f"{prefix}.{key}"
+            if item is None:
+                unsets.append(path)
+            elif isinstance(item, dict):
+                walk(path, item)
+            else:
+                sets[path] = item
+
+    for field, value in patch.items():
+        _check_top_level(field, value, removing=value is None)
+        if field == "extracted_data":
+            walk(field, value)
+        else:
+            sets[field] = value
+
+    return _compiled(sets, unsets, {}, {})
+
+
+def _pointer_to_path(pointer: str) -> List[str]:
+    """Convert a JSON Pointer into path segments"""
+    if not pointer.startswith("/"):
+        raise ValueError(f"Invalid JSON Pointer: {pointer!r}")
+    segments = [
+        segment.replace("~1", "/").replace("~0", "~")
+        for segment in pointer[1:].split("/")
+    ]
+    for segment in segments:
+        if segment != "-":
+            _check_key(segment)
+    return segments
+
+
+def compile_json_patch(operations: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Compile a JSON Patch into MongoDB update operators
+
+    Supported operations are add, replace, remove and test. "add" to an
+    array index or "-" inserts with $push; "test" becomes a filter
+    condition, so the patch only applies if it holds. Removing array
+    elements, move and copy cannot be expressed as a single update and
+    are rejected.
+
+    Args:
+        operations: JSON Patch operation list
+
+    Returns:
+        Compiled patch dict (see module docstring)
+
+    Raises:
+        ValueError: If the patch is invalid or unsupported
+    """
+    if not isinstance(operations, list):
+        raise ValueError("JSON Patch must be an array of operations")
+
+    sets: Dict[str, Any] = {}
+    unsets: List[str] = []
+    pushes: Dict[str, Any] = {}
+    conditions: Dict[str, Any] = {}
+
+    for operation in operations:
+        if not isinstance(operation, dict) or "op" not in operation or "path" not in operation:
+            raise ValueError(f"Invalid JSON Patch operation: {operation!r}")
+
+        op = operation["op"]
+        segments = _pointer_to_path(operation["path"])
+        if op in ("add", "replace", "test") and "value" not in operation:
+            raise ValueError(f"Operation {op} requires a value")
+        value = operation.get("value")
+
+        if len(segments) == 1:
+            _check_top_level(segments[0], value, removing=op == "remove")
+        elif segments[0] != "extracted_data":
+            raise ValueError(f"Field cannot be patched: {operation['path']}")
+
+        last = segments[-1]
+        if last == "-" and op != "add":
+            raise ValueError(f"'-' is only valid for add: {operation['path']}")
+
+        if op == "test":
+            conditions[".".join(segments)] = value
+        elif op == "add" and (last == "-" or last.isdigit()):
+            array_path = ".".join(segments[:-1])
+            push: Dict[str, Any] = {"$each": [value]}
+            if last != "-":
+                push["$position"] = int(last)
+            if array_path in pushes:
+                raise ValueError(f"Only one insert per array is supported: {array_path}")
+            pushes[array_path] = push
+        elif op in ("add", "replace"):
+            sets[".".join(segments)] = value
+        elif op == "remove":
+            if last.isdigit():
+                raise ValueError(
+                    f"Removing array elements is not supported, replace the array: {operation['path']}"
+                )
+            unsets.append(".".join(segments))
+        else:
+            raise ValueError(f"Unsupported JSON Patch operation: {op}")
+
+    return _compiled(sets, unsets, pushes, conditions)
+
+
+def apply_update(document: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Apply the $set, $unset and $push operators of a compiled patch
+
+    Mirrors what MongoDB does with the update, so a store can derive a
+    patched document from the document it replaced.
+
+    Args:
+        document: Document before the patch
+        update: MongoDB update document of a compiled patch
+
+    Returns:
+        Patched copy of the document
+
+    Raises:
+        ValueError: If a path runs through a value that is not an object
+            or array, which MongoDB also rejects
+    """
+    patched = copy.deepcopy(document)
+
+    def parent(path: str, create: bool) -> Tuple[Any, str]:
+        *segments, last = path.split(".")
+        container: Any = patched
+        for segment in segments:
+            if isinstance(container, list) and segment.isdigit():
+                container = container[int(segment)]
+            elif isinstance(container, dict):
+                if segment not in container and create:
+                    container[segment] = {}
+                container = container.get(segment)
+            else:
+                raise ValueError(f"Cannot apply patch at {path}")
+        return container, last
+
+    for path, value in update.get("$set", {}).items():
+        container, key = parent(path, create=True)
+        if isinstance(container, list) and key.isdigit():
+            index = int(key)
+            container.extend([None] * (index + 1 - len(container)))
+            container[index] = value
+        elif isinstance(container, dict):
+            container[key] = value
+        else:
+            raise ValueError(f"Cannot apply patch at {path}")
+
+    for path in update.get("$unset", {}):
+        container, key = parent(path, create=False)
+        if isinstance(container, dict):
+            container.pop(key, None)
+
+    for path, push in update.get("$push", {}).items():
+        container, key = parent(path, create=True)
+        if not isinstance(container, dict):
+            raise ValueError(f"Cannot apply patch at {path}")
+        array = container.setdefault(key, [])
+        if not isinstance(array, list):
+            raise ValueError(f"Cannot push to a non-array field: {path}")
+        position = push.get("$position", len(array))
+        array[position:position] = push["$each"]
+
+    return patched
@@ -0,0 +1,109 @@
+"""
+Sparse fieldset utilities for document reads
+"""
+from typing import Any, Dict, List, Optional
+
+# Top-level document fields that may be requested
+DOCUMENT_FIELDS = [
+    "id",
+    "document_type",
+    "file_name",
+    "extracted_data",
+    "created_at",
+    "updated_at",
+    "version",
+    "original_sha256",
+]
+
+
+def build_projection(fields: Optional[str]) -> Dict[str, int]:
+    """
+    Translate a comma-separated fields parameter into a MongoDB projection
+
+    Dotted paths are accepted below extracted_data
+    (e.g. "extracted_data.seller_info.name"). The document id is always
+    included. A path is dropped when one of its parents is also requested,
+    since MongoDB rejects overlapping projection paths.
+
+    Args:
+        fields: Comma-separated field paths, or None for full documents
+
+    Returns:
+        MongoDB projection dict
+
+    Raises:
+        ValueError: If a field is not a known document field
+    """
+    if not fields:
+        return {"_id": 0}
+
+    paths = {"id"}
+    for field in fields.split(","):
+        field = field.strip()
+        if not field:
+            continue
+
+        top_level = field.split(".", 1)[0]
+        if top_level not in DOCUMENT_FIELDS or (
+            "." in field and top_level != "extracted_data"
+        ):
+            raise ValueError(f"Unknown field: {field}")
+        if any(not part for part in field.split(".")) or "$" in field:
+            raise ValueError(f"Invalid field path: {field}")
+
+        paths.add(field)
+
+    projection = {"_id": 0}
+    for path in sorted(paths):
+        parts = path.split(".")
+        if any(".".join(parts[:i]) in paths for i in range(1, len(parts))):
+            continue
+        projection[path] = 1
+
+    return projection
+
+
+def apply_projection(document: Dict[str, Any], projection: Optional[Dict[str, int]]) -> Dict[str, Any]:
+    """
+    Apply an inclusion projection from build_projection to a document in memory
+
+    Mirrors MongoDB for the paths build_projection produces: dotted paths
+    descend into embedded documents and into the documents of arrays,
+    and missing paths are omitted.
+
+    Args:
+        document: Full document dict
+        projection: MongoDB projection, or None for the full document
+
+    Returns:
+        New document dict with only the projected fields
+    """
+    paths = [
+        path for path, include in (projection or {}).items()
+        if path != "_id" and include
+    ]
+    if not paths:
+        return {key: value for key, value in document.items() if key != "_id"}
+
+    projected: Dict[str, Any] = {}
+    for path in paths:
+        _include_path(document, projected, path.split("."))
+    return projected
+
+
+def _include_path(source: Dict[str, Any], target: Dict[str, Any], parts: List[str]):
+    """Copy one projection path from source into target"""
+    head, rest = parts[0], parts[1:]
+    if head not in source:
+        return
+
+    value = source[head]
+    if not rest:
+        target[head] = value
+    elif isinstance(value, dict):
+        _include_path(value, target.setdefault(head, {}), rest)
+    elif isinstance(value, list):
+        items = [item for item in value if isinstance(item, dict)]
+        projected_items = target.setdefault(head, [{} for _ in items])
+        for item, projected_item in zip(items, projected_items):
+            _include_path(item, projected_item, rest)
@@ -0,0 +1,330 @@
+"""
+Invoice financial rollups
+
+Invoices are summed into buckets per seller GSTIN and period, by day
+and by month. Stores keep the buckets up to date by applying the
+deltas of every write (rollup_deltas), so a report reads one bucket per
+seller and period instead of scanning invoices. ROLLUP_STAGES computes
+the same contributions in a MongoDB aggregation, to rebuild the
+buckets from the documents.
+
+An invoice is bucketed by its invoice_details.date, or by its creation
+date when that is missing or not a YYYY-MM-DD date. Amounts that are
+missing or not numbers count as zero.
+"""
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import re
+
+from .dates import parse_datetime
+
+# Summed summary amounts
+ROLLUP_AMOUNTS = ("grand_total", "sgst_amount", "cgst_amount")
+
+# Bucket granularity -> length of its period key ("2024-01-15", "2024-01")
+ROLLUP_GRANULARITIES = {"day": 10, "month": 7}
+
+# Document paths an invoice's contribution depends on
+ROLLUP_PATHS = (
+    "document_type",
+    "created_at",
+    "extracted_data.seller_info.gstin",
+    "extracted_data.invoice_details.date",
+) + tuple(f"extracted_data.summary.{amount}" for amount in ROLLUP_AMOUNTS)
+
+# Projection reading just those paths
+ROLLUP_PROJECTION = {path: 1 for path in ROLLUP_PATHS}
+
+_DATE_PATTERN = r"^\d{4}-\d{2}-\d{2}$"
+
+BucketKey = Tuple[str, str, str]
+
+
+def _get(document: Dict[str, Any], path: str) -> Any:
+    """Read a dotted path of nested dicts"""
+    value: Any = document
+    for segment in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(segment)
+    return value
+
+
+def _amount(value: Any) -> Decimal:
+    """Convert a stored amount to a Decimal, zero if it is not a number"""
+    if isinstance(value, bool) or value is None:
+        return Decimal(0)
+    try:
+        amount = Decimal(str(value).strip())
+    except InvalidOperation:
+        return Decimal(0)
+    return amount if amount.is_finite() else Decimal(0)
+
+
+def _invoice_day(document: Dict[str, Any]) -> Optional[str]:
+    """Day an invoice is bucketed under, as YYYY-MM-DD"""
+    invoice_date = _get(document, "extracted_data.invoice_details.date")
+    if isinstance(invoice_date, str) and re.match(_DATE_PATTERN, invoice_date.strip()):
+        try:
+            return date.fromisoformat(invoice_date.strip()).isoformat()
+        except ValueError:
+            pass
+
+    created_at = document.get("created_at")
+    if isinstance(created_at, (str, datetime)):
+        try:
+            return parse_datetime(created_at).date().isoformat()
+        except ValueError:
+            return None
+    return None
+
+
+def invoice_contribution(
+    document: Dict[str, Any],
+) -> Optional[Tuple[str, str, Dict[str, Decimal]]]:
+    """
+    Get what a stored document adds to the rollups
+
+    Args:
+        document: Document dict including at least ROLLUP_PATHS
+
+    Returns:
+        Tuple of (seller GSTIN, "" if unknown, day, amounts), or None
+        for documents that are not invoices or have no date
+    """
+    if document.get("document_type") != "invoice":
+        return None
+
+    day = _invoice_day(document)
+    if day is None:
+        return None
+
+    gstin = _get(document, "extracted_data.seller_info.gstin")
+    gstin = gstin.strip() if isinstance(gstin, str) else ""
+    amounts = {
+        amount: _amount(_get(document, f"extracted_data.summary.{amount}"))
+        for amount in ROLLUP_AMOUNTS
+    }
+    return gstin, day, amounts
+
+
+def rollup_deltas(
+    removed: Iterable[Dict[str, Any]] = (),
+    added: Iterable[Dict[str, Any]] = (),
+) -> Dict[BucketKey, Dict[str, Any]]:
+    """
+    Compute the bucket changes of a write
+
+    Args:
+        removed: Previous versions of updated documents and deleted documents
+        added: New versions of updated documents and inserted documents
+
+    Returns:
+        Mapping of (granularity, period, seller GSTIN) to the invoices
+        count and amount changes; buckets left unchanged are omitted
+    """
+    deltas: Dict[BucketKey, Dict[str, Any]] = {}
+    for sign, documents in ((-1, removed), (1, added)):
+        for document in documents:
+            contribution = invoice_contribution(document)
+            if contribution is None:
+                continue
+            gstin, day, amounts = contribution
+            for granularity, length in ROLLUP_GRANULARITIES.items():
+                bucket = deltas.setdefault(
+                    (granularity, day[:length], gstin),
+                    {"invoices": 0, **{amount: Decimal(0) for amount in ROLLUP_AMOUNTS}},
+                )
+                bucket["invoices"] += sign
+                for amount, value in amounts.items():
+                    bucket[amount] += sign * value
+
+    return {
+        key: bucket
+        for key, bucket in deltas.items()
+        if bucket["invoices"] or any(bucket[amount] for amount in ROLLUP_AMOUNTS)
+    }
+
+
+def touches_rollups(update: Dict[str, Dict[str, Any]]) -> bool:
+    """
+    Whether a MongoDB update document may change a document's contribution
+
+    Args:
+        update: Update document ($set/$unset/$push)
+
+    Returns:
+        True if any updated path is, contains or lies under a ROLLUP_PATHS path
+    """
+    for fields in update.values():
+        for path in fields:
+            for rollup_path in ROLLUP_PATHS:
+                if (
+                    path == rollup_path
+                    or rollup_path.startswith(f"{path}.")
+                    or path.startswith(f"{rollup_path}.")
+                ):
+                    return True
+    return False
+
+
+def period_range(
+    granularity: str,
+    date_from: Optional[date],
+    date_to: Optional[date],
+) -> Dict[str, str]:
+    """
+    Build a period key range query for a date range
+
+    Months are included whole when the range starts or ends inside them.
+
+    Args:
+        granularity: "day" or "month"
+        date_from: First day (optional)
+        date_to: Last day (optional)
+
+    Returns:
+        Range conditions on the period key, e.g. {"$gte": "2024-01"}
+    """
+    length = ROLLUP_GRANULARITIES[granularity]
+    conditions = {}
+    if date_from is not None:
+        conditions["$gte"] = date_from.isoformat()[:length]
+    if date_to is not None:
+        conditions["$lte"] = date_to.isoformat()[:length]
+    return conditions
+
+
+def group_buckets(buckets: Iterable[Dict[str, Any]], group_by: str) -> List[Dict[str, Any]]:
+    """
+    Combine stored buckets for a report
+
+    Args:
+        buckets: Buckets with period, seller_gstin, invoices and amounts,
+            ordered by period
+        group_by: "period_seller" to keep every bucket, "period" to sum
+            sellers per period, "seller" to sum periods per seller
+
+    Returns:
+        Report rows in period (or seller) order, without empty buckets
+    """
+    rows: Dict[Tuple[Optional[str], Optional[str]], Dict[str, Any]] = {}
+    for bucket in buckets:
+        if not bucket["invoices"]:
+            continue
+        period = None if group_by == "seller" else bucket["period"]
+        seller_gstin = None if group_by == "period" else (bucket["seller_gstin"] or None)
+        row = rows.setdefault(
+            (period, seller_gstin),
+            {
+                "period": period,
+                "seller_gstin": seller_gstin,
+                "invoices": 0,
+                **{amount: Decimal(0) for amount in ROLLUP_AMOUNTS},
+            },
+        )
+        row["invoices"] += bucket["invoices"]
+        for amount in ROLLUP_AMOUNTS:
+            row[amount] += Decimal(str(bucket[amount]))
+
+    ordered = list(rows.values())
+    if group_by == "seller":
+        ordered.sort(key=lambda row: row["seller_gstin"] or "")
+    return ordered
+
+
+def rollup_totals(rows: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Sum report rows
+
+    Args:
+        rows: Rows from group_buckets
+
+    Returns:
+        Dict with the invoices count and amounts of all rows
+    """
+    totals: Dict[str, Any] = {"invoices": 0, **{amount: Decimal(0) for amount in ROLLUP_AMOUNTS}}
+    for row in rows:
+        totals["invoices"] += row["invoices"]
+        for amount in ROLLUP_AMOUNTS:
+            totals[amount] += row[amount]
+    return totals
+
+
+def _string_or_null(path: str) -> Dict[str, Any]:
+    """Aggregation expression: trimmed string value of a path, else null"""
+    return {
+        "$cond": [
+            {"$eq": [{"$type": f"${path}"}, "string"]},
+            {"$trim": {"input": f"${path}"}},
+            None,
+        ]
+    }
+
+
+# Aggregation stages computing invoice_contribution for each document as
+# {seller_gstin, day, grand_total, sgst_amount, cgst_amount}
+ROLLUP_STAGES: List[Dict[str, Any]] = [
+    {"$match": {"document_type": "invoice"}},
+    {
+        "$set": {
+            "_invoice_date": _string_or_null("extracted_data.invoice_details.date"),
+        }
+    },
+    {
+        "$project": {
+            "_id": 0,
+            "seller_gstin": {
+                "$ifNull": [_string_or_null("extracted_data.seller_info.gstin"), ""]
+            },
+            "day": {
+                "$dateToString": {
+                    "format": "%Y-%m-%d",
+                    "date": {
+                        "$ifNull": [
+                            {
+                                "$cond": [
+                                    {
+                                        "$regexMatch": {
+                                            "input": {"$ifNull": ["$_invoice_date", ""]},
+                                            "regex": _DATE_PATTERN,
+                                        }
+                                    },
+                                    {
+                                        "$dateFromString": {
+                                            "dateString": "$_invoice_date",
+                                            "format": "%Y-%m-%d",
+                                            "onError": None,
+                                        }
+                                    },
+                                    None,
+                                ]
+                            },
+                            {
+                                "$convert": {
+                                    "input": "$created_at",
+                                    "to": "date",
+                                    "onError": None,
+                                    "onNull": None,
+                                }
+                            },
+                        ]
+                    },
+                }
+            },
+            **{
+                amount: {
+                    "$convert": {
+                        "input": f"$extracted_data.summary.{amount}",
+                        "to": "decimal",
+                        "onError": {"$toDecimal": 0},
+                        "onNull": {"$toDecimal": 0},
+                    }
+                }
+                for amount in ROLLUP_AMOUNTS
+            },
+        }
+    },
+    {"$match": {"day": {"$ne": None}}},
+]
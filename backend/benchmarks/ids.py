@@ -0,0 +1,100 @@
+"""
+Document ID benchmark
+
+Inserts documents keyed by each ID scheme into a collection with a
+unique index on id and prints insert throughput (overall and over the
+last tenth, when the index is largest) and the size of the id index:
+
+- uuid4-string: random 36-character strings (IDs before binary UUIDs)
+- uuid4-binary: random 16-byte binary UUIDs
+- uuid7-binary: time-ordered 16-byte binary UUIDs (current IDs)
+
+Usage (from backend/):
+    python -m benchmarks.ids --documents 10000000
+    python -m benchmarks.ids --documents 1000000 --schemes uuid4-string,uuid7-binary
+
+Uses MONGODB_URL with a throwaway database. At 10M documents, run it
+against a server whose WiredTiger cache is smaller than the uuid4 index
+to see the effect of random inserts on cache misses.
+"""
+import argparse
+import asyncio
+import os
+import time
+import uuid
+from typing import Any, Callable, Dict
+
+os.environ.setdefault("LLAMA_CLOUD_API_KEY", "benchmark")
+
+from bson.binary import Binary  # noqa: E402
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+
+from app.config import settings  # noqa: E402
+from app.utils.ids import uuid7  # noqa: E402
+
+SCHEMES: Dict[str, Callable[[], Any]] = {
+    "uuid4-string": lambda: str(uuid.uuid4()),
+    "uuid4-binary": lambda: Binary.from_uuid(uuid.uuid4()),
+    "uuid7-binary": lambda: Binary.from_uuid(uuid7()),
+}
+
+
+async def run_scheme(db, scheme: str, documents: int, batch_size: int) -> Dict[str, float]:
+    """Insert documents with one ID scheme and measure throughput and index size"""
+    collection = db[f"ids_{scheme.replace('-', '_')}"]
+    await collection.create_index("id", unique=True)
+    make_id = SCHEMES[scheme]
+    filler = "x" * 200
+
+    tail_start = documents - documents // 10
+    tail_elapsed = 0.0
+    start = time.perf_counter()
+    for offset in range(0, documents, batch_size):
+        count = min(batch_size, documents - offset)
+        batch = [{"id": make_id(), "n": offset + i, "payload": filler} for i in range(count)]
+        batch_start = time.perf_counter()
+        await collection.insert_many(batch, ordered=False)
+        if offset >= tail_start:
+            tail_elapsed += time.perf_counter() - batch_start
+    elapsed = time.perf_counter() - start
+
+    stats = await db.command("collStats", collection.name)
+    return {
+        "scheme": scheme,
+        "inserts_per_second": documents / elapsed,
+        "tail_inserts_per_second": (documents // 10) / tail_elapsed if tail_elapsed else 0.0,
+        "id_index_mb": stats["indexSizes"]["id_1"] / 1e6,
+        "id_index_bytes_per_document": stats["indexSizes"]["id_1"] / documents,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--documents", type=int, default=10_000_000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--schemes", default=",".join(SCHEMES))
+    args = parser.parse_args()
+
+    client = AsyncIOMotorClient(settings.mongodb_url)
+    db_name = f"docextract_id_benchmark_{int(time.time())}"
+    try:
+        results = [
+            await run_scheme(client[db_name], scheme, args.documents, args.batch_size)
+            for scheme in args.schemes.split(",")
+        ]
+    finally:
+        await client.drop_database(db_name)
+        client.close()
+
+    print(f"\n{args.documents} documents, batches of {args.batch_size}")
+    print(f"{'scheme':<15}{'ins/s':>10}{'tail ins/s':>12}{'index MB':>10}{'B/doc':>8}")
+    for result in results:
+        print(
+            f"{result['scheme']:<15}{result['inserts_per_second']:>10.0f}"
+            f"{result['tail_inserts_per_second']:>12.0f}{result['id_index_mb']:>10.1f}"
+            f"{result['id_index_bytes_per_document']:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,161 @@
+"""
+Storage backend benchmark
+
+Runs the same workload through the DocumentStore interface against
+MongoDB and the embedded SQLite store and prints throughput and latency
+percentiles per operation.
+
+Usage (from backend/):
+    python -m benchmarks.storage --documents 5000 --concurrency 16
+    python -m benchmarks.storage --backend sqlite
+
+The MongoDB run uses MONGODB_URL with a throwaway database; the SQLite
+run uses a temporary database file.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from typing import Awaitable, Callable, Dict, List
+
+os.environ.setdefault("LLAMA_CLOUD_API_KEY", "benchmark")
+
+from app.config import settings  # noqa: E402
+from app.models.document import ExtractedDocument  # noqa: E402
+from app.services.database import DatabaseService  # noqa: E402
+from app.services.sqlite_store import SQLiteDocumentStore  # noqa: E402
+from app.services.storage import DocumentStore  # noqa: E402
+from app.utils.filters import parse_filters  # noqa: E402
+
+
+def make_invoice(index: int) -> ExtractedDocument:
+    """Build a synthetic invoice"""
+    return ExtractedDocument(
+        document_type="invoice",
+        file_name=f"invoice-{index}.pdf",
+        extracted_data={
+            "seller_info": {"name": f"Seller {index % 50}", "gstin": f"29ABCDE{index % 50:04d}F1Z5"},
+            "customer_info": {"name": f"Customer {index}"},
+            "invoice_details": {"date": f"2024-{index % 12 + 1:02d}-{index % 28 + 1:02d}", "bill_no": f"INV-{index}"},
+            "items": [
+                {"description": f"Item {item}", "quantity": item + 1, "amount": 100.0 * (item + 1)}
+                for item in range(index % 5 + 1)
+            ],
+            "summary": {"grand_total": float(index % 100000), "sgst_amount": 9.0, "cgst_amount": 9.0},
+        },
+    )
+
+
+async def measure(
+    name: str,
+    calls: List[Callable[[], Awaitable]],
+    concurrency: int,
+) -> Dict[str, float]:
+    """Run calls with bounded concurrency and collect latencies"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def timed(call):
+        async with semaphore:
+            start = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(timed(call) for call in calls))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "operation": name,
+        "ops_per_second": len(calls) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+async def run_workload(store: DocumentStore, documents: int, concurrency: int) -> List[Dict[str, float]]:
+    """Insert, read, list, count, update and delete through a store"""
+    invoices = [make_invoice(index) for index in range(documents)]
+    ids = [invoice.id for invoice in invoices]
+    filters = parse_filters("invoice", ["summary.grand_total:gte:50000"])
+    reads = min(documents, 2000)
+
+    def updated(invoice: ExtractedDocument) -> ExtractedDocument:
+        invoice.file_name = f"updated-{invoice.file_name}"
+        return invoice
+
+    results = [
+        await measure("insert", [lambda i=i: store.insert_document(i) for i in invoices], concurrency),
+        await measure(
+            "get",
+            [lambda: store.get_document(random.choice(ids)) for _ in range(reads)],
+            concurrency,
+        ),
+        await measure(
+            "list",
+            [
+                lambda: store.list_documents("invoice", limit=20, offset=random.randrange(0, 500))
+                for _ in range(reads // 10)
+            ],
+            concurrency,
+        ),
+        await measure(
+            "list_filtered",
+            [lambda: store.list_documents("invoice", limit=20, filters=filters) for _ in range(reads // 10)],
+            concurrency,
+        ),
+        await measure(
+            "count", [lambda: store.count_documents("invoice") for _ in range(reads // 10)], concurrency
+        ),
+        await measure("stats", [lambda: store.get_stats() for _ in range(reads)], concurrency),
+        await measure(
+            "update",
+            [lambda i=i: store.update_document(updated(i)) for i in invoices[:reads]],
+            concurrency,
+        ),
+        await measure(
+            "delete", [lambda i=i: store.delete_document(i) for i in ids], concurrency
+        ),
+    ]
+    return results
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--backend", choices=["mongodb", "sqlite", "both"], default="both")
+    parser.add_argument("--documents", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    backends = ["mongodb", "sqlite"] if args.backend == "both" else [args.backend]
+    for backend in backends:
+        if backend == "mongodb":
+            settings.mongodb_db_name = f"docextract_benchmark_{int(time.time())}"
+            store: DocumentStore = DatabaseService()
+        else:
+            path = os.path.join(tempfile.mkdtemp(), "benchmark.db")
+            store = SQLiteDocumentStore(path, settings.sqlite_pool_size)
+
+        await store.connect()
+        try:
+            results = await run_workload(store, args.documents, args.concurrency)
+        finally:
+            if backend == "mongodb":
+                await store.client.drop_database(settings.mongodb_db_name)
+            await store.disconnect()
+
+        print(f"\n{backend} ({args.documents} documents, concurrency {args.concurrency})")
+        print(f"{'operation':<14}{'ops/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+        for result in results:
+            print(
+                f"{result['operation']:<14}{result['ops_per_second']:>10.0f}"
+                f"{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
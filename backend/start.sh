@@ -6,6 +6,12 @@
 # Use Railway's PORT if provided, otherwise default to 8000
 PORT=${PORT:-8000}
 
+# Apply pending index migrations (idempotent; only new ones are built)
+if [ "${STORAGE_BACKEND:-mongodb}" = "mongodb" ]; then
+    echo "Applying index migrations"
+    python -m app.migrations.indexes || echo "Index migrations failed; the API will report the index version in /ready"
+fi
+
 echo "Starting server on port $PORT"
 
 # Start uvicorn
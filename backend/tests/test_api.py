@@ -1,13 +1,30 @@
 """
 Basic API endpoint tests for DocExtract backend
 """
+import os
+import tempfile
+
 import pytest
 from fastapi.testclient import TestClient
+
+# Run against the embedded SQLite backend so no MongoDB server is needed
+os.environ.setdefault("STORAGE_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_PATH", os.path.join(tempfile.mkdtemp(), "test.db"))
+
 from app.main import app
+from app.services.database import document_store
+from app.services.read_routing import RECENT_WRITE_COOKIE
 
 client = TestClient(app)
 
 
+@pytest.fixture(autouse=True, scope="module")
+def lifespan():
+    """Connect the document store for the duration of the tests"""
+    with client:
+        yield
+
+
 def test_root_endpoint():
     """Test root endpoint returns API info"""
     response = client.get("/")
@@ -27,6 +44,32 @@ def test_health_check():
     assert data["status"] == "healthy"
 
 
+def test_readiness_check():
+    """Test readiness endpoint reports the connected document store"""
+    response = client.get("/ready")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "ready"
+    assert data["ready"] is True
+
+
+def test_unavailable_response_has_cors_headers(monkeypatch):
+    """Test the 503 before the document store connects still carries CORS headers"""
+    monkeypatch.setattr(document_store, "readiness", lambda: {"ready": False})
+    origin = {"Origin": "http://localhost:3000"}
+
+    response = client.get("/api/v1/documents", headers=origin)
+    assert response.status_code == 503
+    assert response.headers["Access-Control-Allow-Origin"]
+
+    response = client.options(
+        "/api/v1/documents",
+        headers={**origin, "Access-Control-Request-Method": "GET"},
+    )
+    assert response.status_code == 200
+    assert response.headers["Access-Control-Allow-Origin"]
+
+
 def test_docs_available():
     """Test that API documentation is available"""
     response = client.get("/docs")
@@ -43,6 +86,58 @@ def test_stats_endpoint():
     assert "invoice" in data
 
 
+def test_invoice_stats_endpoint():
+    """Test invoice rollups endpoint returns rows and range totals"""
+    response = client.get("/api/v1/stats/invoices?granularity=day&group_by=period_seller")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["granularity"] == "day"
+    assert isinstance(data["rows"], list)
+    assert "grand_total" in data["totals"]
+
+
+def test_invoice_stats_invalid_range():
+    """Test invoice rollups endpoint rejects a date range ending before it starts"""
+    response = client.get("/api/v1/stats/invoices?date_from=2024-02-01&date_to=2024-01-01")
+    assert response.status_code == 400
+
+
+def test_metrics_endpoint():
+    """Test metrics endpoint reports connection pool metrics"""
+    response = client.get("/api/v1/metrics")
+    assert response.status_code == 200
+    data = response.json()
+    assert "connections_checked_out" in data["mongodb_pool"]
+    assert "checkout_wait_seconds_avg" in data["mongodb_pool"]
+    assert "hit_ratio" in data["document_cache"]
+    assert "invalidation_lag_seconds_avg" in data["document_cache"]
+    assert "archived_total" in data["archive"]
+    assert "batches_total" in data["insert_batching"]
+    assert "slow_queries" in data["mongodb_commands"]
+    assert "queue_depth_max" in data["websocket_connections"]
+
+
+def test_websocket_subscribe():
+    """Test WebSocket clients can subscribe to document types and ids"""
+    with client.websocket_connect("/ws/documents") as websocket:
+        websocket.send_json({"action": "subscribe", "document_type": "invoice", "id": ["abc-123"]})
+        reply = websocket.receive_json()
+        assert reply["type"] == "SUBSCRIPTIONS"
+        assert reply["data"] == {"document_type": ["invoice"], "id": ["abc-123"]}
+
+        websocket.send_json({"action": "unsubscribe", "id": "abc-123"})
+        reply = websocket.receive_json()
+        assert reply["data"] == {"document_type": ["invoice"], "id": []}
+
+
+def test_websocket_subscribe_unknown_topic():
+    """Test WebSocket subscriptions reject unknown topics"""
+    with client.websocket_connect("/ws/documents") as websocket:
+        websocket.send_json({"action": "subscribe", "document_type": "passport"})
+        reply = websocket.receive_json()
+        assert reply["type"] == "ERROR"
+
+
 def test_extract_endpoint_invalid_type():
     """Test extraction endpoint with invalid document type"""
     payload = {
@@ -65,6 +160,22 @@ def test_extract_endpoint_invalid_base64():
     assert response.status_code == 400
 
 
+def test_extract_endpoint_missing_file():
+    """Test extraction endpoint without file data or a stored original"""
+    payload = {
+        "file_name": "test.pdf",
+        "document_type": "invoice",
+    }
+    response = client.post("/api/v1/extract", json=payload)
+    assert response.status_code == 400
+
+
+def test_original_download_invalid_hash():
+    """Test original file download rejects malformed content hashes"""
+    response = client.get("/api/v1/originals/not-a-sha256")
+    assert response.status_code == 422
+
+
 def test_documents_list_endpoint():
     """Test documents list endpoint"""
     response = client.get("/api/v1/documents")
@@ -76,17 +187,259 @@ def test_documents_list_endpoint():
     assert isinstance(data["total"], int)
 
 
+def test_documents_list_page_and_totals():
+    """Test a page comes with its exact or estimated total, which agree with the counters"""
+    ids = [
+        client.post(
+            "/api/v1/documents",
+            json={"document_type": "government_id", "file_name": f"{n}.pdf", "extracted_data": {}},
+        ).json()["id"]
+        for n in range(3)
+    ]
+    count = client.get("/api/v1/stats").json()["government_id"]
+
+    exact = client.get("/api/v1/documents?document_type=government_id&limit=2&offset=1").json()
+    estimated = client.get(
+        "/api/v1/documents?document_type=government_id&limit=2&exact_total=false"
+    ).json()
+    assert exact["total"] == estimated["total"] == count
+    assert len(exact["documents"]) == len(estimated["documents"]) == 2
+
+    for document_id in ids:
+        client.delete(f"/api/v1/documents/{document_id}")
+
+
+def test_documents_list_estimate_for_unseen_type():
+    """Test an estimated total for a type without documents is zero"""
+    response = client.get("/api/v1/documents?document_type=passport&exact_total=false")
+    assert response.status_code == 200
+    assert response.json()["total"] == 0
+
+
+def test_documents_list_unknown_field():
+    """Test documents list rejects unknown fields in a sparse fieldset"""
+    response = client.get("/api/v1/documents?fields=file_name,unknown")
+    assert response.status_code == 400
+
+
+def test_documents_list_filter_requires_type():
+    """Test extracted_data filters are rejected without a document type"""
+    response = client.get("/api/v1/documents?filter=summary.grand_total:gt:50000")
+    assert response.status_code == 400
+
+
+def test_documents_export_invalid_format():
+    """Test export rejects unknown formats"""
+    response = client.get("/api/v1/documents/export?format=xml")
+    assert response.status_code == 422
+
+
+def test_documents_export_filters():
+    """Test export streams only the documents matching its type and filters"""
+    ids = []
+    for total in (100, 60000):
+        created = client.post(
+            "/api/v1/documents",
+            json={
+                "document_type": "invoice",
+                "file_name": "export.pdf",
+                "extracted_data": {"summary": {"grand_total": total}},
+            },
+        )
+        ids.append(created.json()["id"])
+
+    response = client.get(
+        "/api/v1/documents/export?format=ndjson&document_type=invoice"
+        "&filter=summary.grand_total:gt:50000"
+    )
+    assert response.status_code == 200
+    assert response.headers["Content-Type"] == "application/x-ndjson"
+    assert 'filename="invoice-export.ndjson"' in response.headers["Content-Disposition"]
+    assert ids[1] in response.text and ids[0] not in response.text
+
+    response = client.get("/api/v1/documents/export?format=csv&document_type=invoice")
+    assert response.text.splitlines()[0].startswith("id,document_type,file_name")
+    assert ids[0] in response.text
+
+    response = client.get("/api/v1/documents/export?filter=summary.grand_total:gt:50000")
+    assert response.status_code == 400
+
+    for document_id in ids:
+        client.delete(f"/api/v1/documents/{document_id}")
+
+
+def test_documents_search_invalid_cursor():
+    """Test documents search rejects a malformed cursor"""
+    response = client.get("/api/v1/documents/search?q=john&cursor=not-a-cursor")
+    assert response.status_code == 400
+
+
 def test_document_get_nonexistent():
     """Test getting a nonexistent document"""
     response = client.get("/api/v1/documents/nonexistent-id")
     assert response.status_code == 404
 
 
+def test_document_patch_requires_if_match():
+    """Test patching a document requires the expected version"""
+    response = client.patch(
+        "/api/v1/documents/some-id",
+        json={"file_name": "renamed.pdf"},
+    )
+    assert response.status_code == 428
+
+
+def test_document_write_nonexistent():
+    """Test replacing or patching a nonexistent document"""
+    response = client.put(
+        "/api/v1/documents/nonexistent-id",
+        json={"document_type": "invoice", "file_name": "x.pdf", "extracted_data": {}},
+    )
+    assert response.status_code == 404
+
+    response = client.patch(
+        "/api/v1/documents/nonexistent-id",
+        json={"file_name": "renamed.pdf"},
+        headers={"If-Match": '"1"'},
+    )
+    assert response.status_code == 404
+
+
+def test_document_json_patch():
+    """Test JSON Patch applies atomically and fails as a whole on a failed test"""
+    created = client.post(
+        "/api/v1/documents",
+        json={
+            "document_type": "invoice",
+            "file_name": "patch.pdf",
+            "extracted_data": {"line_items": [{"sku": "A1"}]},
+        },
+    )
+    document_id = created.json()["id"]
+    headers = {"Content-Type": "application/json-patch+json", "If-Match": '"1"'}
+
+    response = client.patch(
+        f"/api/v1/documents/{document_id}",
+        content='[{"op": "test", "path": "/file_name", "value": "other.pdf"},'
+        ' {"op": "replace", "path": "/file_name", "value": "renamed.pdf"}]',
+        headers=headers,
+    )
+    assert response.status_code == 409
+
+    response = client.patch(
+        f"/api/v1/documents/{document_id}",
+        content='[{"op": "add", "path": "/extracted_data/line_items/-", "value": {"sku": "B2"}}]',
+        headers=headers,
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["version"] == 2
+    assert data["file_name"] == "patch.pdf"
+    assert data["extracted_data"]["line_items"] == [{"sku": "A1"}, {"sku": "B2"}]
+    client.delete(f"/api/v1/documents/{document_id}")
+
+
+def test_writes_set_read_your_writes_cookie():
+    """Test successful writes pin the client's following reads, failed ones do not"""
+    response = client.delete("/api/v1/documents/nonexistent-id")
+    assert RECENT_WRITE_COOKIE not in response.cookies
+
+    created = client.post(
+        "/api/v1/documents",
+        json={"document_type": "invoice", "file_name": "pin.pdf", "extracted_data": {}},
+    )
+    assert created.cookies[RECENT_WRITE_COOKIE] == "1"
+    client.delete(f"/api/v1/documents/{created.json()['id']}")
+    client.cookies.clear()
+
+
+def test_document_etag_is_patch_validator():
+    """Test the ETag of a document read is accepted by PATCH in If-Match"""
+    created = client.post(
+        "/api/v1/documents",
+        json={
+            "document_type": "government_id",
+            "file_name": "etag.pdf",
+            "extracted_data": {"full_name": "Jane Doe"},
+        },
+    )
+    assert created.status_code == 201
+    document_id = created.json()["id"]
+
+    response = client.get(f"/api/v1/documents/{document_id}?fields=file_name")
+    etag = response.headers["ETag"]
+    assert "version" not in response.json()
+    response = client.get(f"/api/v1/documents/{document_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+    response = client.patch(
+        f"/api/v1/documents/{document_id}",
+        json={"file_name": "renamed.pdf"},
+        headers={"If-Match": etag},
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+    response = client.patch(
+        f"/api/v1/documents/{document_id}",
+        json={"file_name": "again.pdf"},
+        headers={"If-Match": etag},
+    )
+    assert response.status_code == 409
+    client.delete(f"/api/v1/documents/{document_id}")
+
+
 def test_document_delete_nonexistent():
     """Test deleting a nonexistent document"""
     response = client.delete("/api/v1/documents/nonexistent-id")
     assert response.status_code == 404
 
 
+def test_documents_bulk_create_empty():
+    """Test bulk create rejects an empty batch"""
+    response = client.post("/api/v1/documents/bulk", json={"documents": []})
+    assert response.status_code == 400
+
+
+def test_documents_bulk_round_trip():
+    """Test bulk create, update and delete report per-document results and keep stats"""
+    before = client.get("/api/v1/stats").json()
+
+    response = client.post(
+        "/api/v1/documents/bulk",
+        json={
+            "documents": [
+                {"document_type": "government_id", "file_name": f"{n}.pdf", "extracted_data": {}}
+                for n in range(2)
+            ]
+        },
+    )
+    assert response.status_code == 200
+    assert response.json()["succeeded"] == 2
+    ids = [result["id"] for result in response.json()["results"]]
+
+    response = client.put(
+        "/api/v1/documents/bulk",
+        json={
+            "documents": [
+                {"id": ids[0], "document_type": "invoice", "file_name": "0.pdf", "extracted_data": {}},
+                {"id": "missing-id", "document_type": "invoice", "file_name": "x.pdf", "extracted_data": {}},
+            ]
+        },
+    )
+    results = response.json()["results"]
+    assert [result["success"] for result in results] == [True, False]
+    assert results[1]["error"] == "Document not found: missing-id"
+    assert client.get(f"/api/v1/documents/{ids[0]}").json()["version"] == 2
+
+    stats = client.get("/api/v1/stats").json()
+    assert stats["government_id"] == before["government_id"] + 1
+    assert stats["invoice"] == before["invoice"] + 1
+
+    response = client.request("DELETE", "/api/v1/documents/bulk", json={"ids": ids + ["missing-id"]})
+    assert (response.json()["succeeded"], response.json()["failed"]) == (2, 1)
+    assert client.get("/api/v1/stats").json() == before
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
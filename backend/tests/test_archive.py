@@ -0,0 +1,120 @@
+"""
+Archiver tests: archive passes racing client updates and deletes
+"""
+import asyncio
+from datetime import timedelta
+from types import SimpleNamespace
+
+from app.config import settings
+from app.services.archive import DocumentArchiver
+from app.utils.dates import utc_now
+
+
+def _matches(document, query):
+    """Evaluate the equality, $lt and $in conditions the archiver uses"""
+    for field, condition in query.items():
+        value = document.get(field)
+        if isinstance(condition, dict):
+            if "$lt" in condition and not (value is not None and value < condition["$lt"]):
+                return False
+            if "$in" in condition and value not in condition["$in"]:
+                return False
+        elif value != condition:
+            return False
+    return True
+
+
+class FakeCursor:
+    """Cursor over a snapshot of matching documents"""
+
+    def __init__(self, documents):
+        self.documents = documents
+
+    def sort(self, field, direction):
+        self.documents.sort(key=lambda document: document[field], reverse=direction < 0)
+        return self
+
+    def limit(self, count):
+        self.documents = self.documents[:count]
+        return self
+
+    async def to_list(self, length):
+        return self.documents[:length]
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for document in self.documents:
+            yield document
+
+
+class FakeCollection:
+    """In-memory collection with the operations an archive pass issues"""
+
+    def __init__(self, documents=()):
+        self.documents = [dict(document) for document in documents]
+        self.before_bulk_write = None
+
+    def find(self, query, projection=None):
+        return FakeCursor([dict(document) for document in self.documents if _matches(document, query)])
+
+    async def bulk_write(self, requests, ordered=True):
+        if self.before_bulk_write is not None:
+            self.before_bulk_write()
+        deleted = 0
+        for request in requests:
+            matched = [document for document in self.documents if _matches(document, request._filter)]
+            if hasattr(request, "_doc"):
+                for document in matched:
+                    self.documents.remove(document)
+                self.documents.append(dict(request._doc))
+            elif matched:
+                self.documents.remove(matched[0])
+                deleted += 1
+        return SimpleNamespace(deleted_count=deleted)
+
+    async def delete_many(self, query):
+        self.documents = [document for document in self.documents if not _matches(document, query)]
+
+    def ids(self):
+        return sorted(document["id"] for document in self.documents)
+
+
+def test_archive_pass_keeps_documents_changed_during_the_copy(monkeypatch):
+    """Test a document updated or deleted while being copied is not archived"""
+    monkeypatch.setattr(settings, "archive_after_days", 30)
+    monkeypatch.setattr(settings, "archive_batch_size", 10)
+    old = utc_now() - timedelta(days=60)
+    hot = FakeCollection(
+        [
+            {"_id": n, "id": name, "version": 1, "created_at": old + timedelta(minutes=n)}
+            for n, name in enumerate(("kept", "updated", "deleted"))
+        ]
+        + [{"_id": 3, "id": "recent", "version": 1, "created_at": utc_now()}]
+    )
+    archive = FakeCollection()
+
+    def client_writes():
+        # A client updates one document and deletes another mid-pass
+        hot.documents[1]["version"] = 2
+        hot.documents.pop(2)
+        archive.before_bulk_write = None
+
+    archive.before_bulk_write = client_writes
+    database = SimpleNamespace(
+        db={"hot": hot, "archive": archive},
+        collection_name="hot",
+        archive_collection_name="archive",
+    )
+    archiver = DocumentArchiver(database)
+
+    assert asyncio.run(archiver.archive_pass()) == 1
+    assert hot.ids() == ["recent", "updated"]
+    assert archive.ids() == ["kept"]
+
+    # The updated document is archived by the next pass
+    assert asyncio.run(archiver.archive_pass()) == 1
+    assert hot.ids() == ["recent"]
+    assert archive.ids() == ["kept", "updated"]
+    assert archiver.snapshot()["archived_total"] == 2
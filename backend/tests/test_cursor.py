@@ -0,0 +1,21 @@
+"""
+Pagination cursor tests
+"""
+import pytest
+
+from app.utils.cursor import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    """Test positions survive encoding as URL-safe cursors without padding"""
+    position = {"score": 1.25, "id": "65a1f0c2e4b0a1b2c3d4e5f6"}
+    cursor = encode_cursor(position)
+    assert "=" not in cursor and "+" not in cursor and "/" not in cursor
+    assert decode_cursor(cursor) == position
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", encode_cursor([1, 2]), "AAAA"])
+def test_malformed_cursor_rejected(cursor):
+    """Test malformed cursors and non-object positions raise ValueError"""
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
@@ -0,0 +1,176 @@
+"""
+MongoDB document service tests: connection retries, missing documents and statistics counters
+"""
+import asyncio
+
+import pytest
+from pymongo.errors import ServerSelectionTimeoutError
+
+from app.config import settings
+from app.models.document import ExtractedDocument
+from app.services.database import DatabaseService
+
+
+class FakeCollection:
+    """Collection matching no document, recording the commands it receives"""
+
+    def __init__(self, exists: bool = False):
+        self.exists = exists
+        self.calls = []
+
+    async def find_one_and_update(self, query, update, **kwargs):
+        self.calls.append("find_one_and_update")
+        return None
+
+    async def find_one_and_delete(self, query, **kwargs):
+        self.calls.append("find_one_and_delete")
+        return None
+
+    async def count_documents(self, query, **kwargs):
+        self.calls.append("count_documents")
+        return int(self.exists)
+
+    async def delete_many(self, query):
+        self.calls.append("delete_many")
+
+
+def _service(archive_in_use: bool = False, exists: bool = False):
+    """Service over a fake hot tier and, optionally, a fake archive tier"""
+    service = DatabaseService()
+    service.db = {
+        service.collection_name: FakeCollection(exists),
+        service.archive_collection_name: FakeCollection(),
+    }
+    service.archive_in_use = archive_in_use
+    events = []
+
+    async def handler(change):
+        events.append(change)
+
+    service.subscribe(handler)
+    return service, events
+
+
+def test_connect_retries_until_mongodb_is_reachable(monkeypatch):
+    """Test a background connect keeps retrying and records the last failure"""
+    monkeypatch.setattr(settings, "mongodb_connect_retry_initial_seconds", 0.001)
+    monkeypatch.setattr(settings, "mongodb_connect_retry_max_seconds", 0.002)
+    service = DatabaseService()
+    failures = [ServerSelectionTimeoutError("no servers"), ServerSelectionTimeoutError("still none")]
+    readiness = []
+
+    async def connect():
+        readiness.append(service.readiness())
+        if failures:
+            raise failures.pop(0)
+        service.ready = True
+
+    monkeypatch.setattr(service, "connect", connect)
+    asyncio.run(service._connect_with_retry())
+
+    assert [state["ready"] for state in readiness] == [False, False, False]
+    assert readiness[-1]["last_error"] == "still none"
+    assert service.readiness()["connect_attempts"] == 3
+    assert service.readiness()["ready"]
+
+
+@pytest.mark.parametrize("archive_in_use", [False, True])
+def test_missing_document_update_and_delete(archive_in_use):
+    """Test updates and deletes of a missing document try each tier once and publish nothing"""
+    service, events = _service(archive_in_use)
+    document = ExtractedDocument(document_type="invoice", file_name="x.pdf", extracted_data={})
+
+    assert asyncio.run(service.update_document(document)) is None
+    assert asyncio.run(service.delete_document(document.id)) is None
+
+    hot = service.db[service.collection_name]
+    archive = service.db[service.archive_collection_name]
+    assert hot.calls == ["find_one_and_update", "find_one_and_delete"]
+    assert archive.calls == (["find_one_and_update", "find_one_and_delete"] if archive_in_use else [])
+    assert events == []
+
+
+def test_patch_distinguishes_missing_from_conflicting():
+    """Test a failed patch reports whether the document exists"""
+    patch = {"update": {"$set": {"file_name": "renamed.pdf"}}, "conditions": {}}
+
+    service, events = _service(exists=False)
+    assert asyncio.run(service.patch_document("abc", patch, 1)) == (None, False)
+
+    service, events = _service(exists=True)
+    assert asyncio.run(service.patch_document("abc", patch, 1)) == (None, True)
+    assert service.db[service.collection_name].calls == ["find_one_and_update", "count_documents"]
+    assert events == []
+
+
+class FakeCounters:
+    """Statistics collection holding one counters document"""
+
+    def __init__(self, counters=None):
+        self.counters = counters
+
+    def with_options(self, **kwargs):
+        return self
+
+    async def find_one(self, query):
+        return dict(self.counters) if self.counters is not None else None
+
+    async def update_one(self, query, update, upsert=False):
+        self.counters = self.counters or {"_id": query["_id"]}
+        for name, delta in update["$inc"].items():
+            self.counters[name] = self.counters.get(name, 0) + delta
+
+    async def find_one_and_update(self, query, update, upsert=False, return_document=None):
+        await self.update_one(query, update, upsert)
+        return dict(self.counters)
+
+
+class FakeDocuments:
+    """Documents collection whose type counts are aggregated"""
+
+    def __init__(self, counts, during_aggregate=None):
+        self.counts = counts
+        self.during_aggregate = during_aggregate
+
+    def aggregate(self, pipeline):
+        return self
+
+    async def to_list(self, length):
+        if self.during_aggregate is not None:
+            await self.during_aggregate()
+        return [{"_id": document_type, "count": count} for document_type, count in self.counts.items()]
+
+
+def _stats_service(counters, counts):
+    """Service over fake statistics and documents collections"""
+    service = DatabaseService()
+    service.db = {
+        service.stats_collection_name: FakeCounters(counters),
+        service.collection_name: FakeDocuments(counts),
+    }
+    return service
+
+
+def test_stats_counters_are_seeded_and_incremented():
+    """Test missing counters are rebuilt by a recount and writes then apply deltas"""
+    service = _stats_service(None, {"government_id": 2, "invoice": 1})
+
+    async def run():
+        assert await service.get_stats() == {"total": 3, "government_id": 2, "invoice": 1}
+        await service._increment_stats({"government_id": -1, "invoice": 1})
+        assert await service.get_stats() == {"total": 3, "government_id": 1, "invoice": 2}
+
+    asyncio.run(run())
+
+
+def test_reconcile_corrects_drift_without_losing_racing_writes():
+    """Test a recount applies its difference as an increment, keeping writes made meanwhile"""
+    service = _stats_service(
+        {"total": 6, "government_id": 4, "invoice": 2},
+        {"government_id": 3, "invoice": 2},
+    )
+    service.db[service.collection_name].during_aggregate = lambda: service._increment_stats(
+        {"invoice": 1}
+    )
+
+    assert asyncio.run(service.reconcile_stats()) == {"total": 6, "government_id": 3, "invoice": 3}
@@ -0,0 +1,135 @@
+"""
+Datetime tests: legacy string created_at values and their online migration
+"""
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+from app.migrations.datetime_fields import MIGRATION_ID, migrate_datetime_fields
+from app.utils.dates import normalize_datetimes, parse_datetime
+
+
+def _matches(document, query):
+    """Evaluate the $or, $type, $exists and $gt conditions the migration uses"""
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(_matches(document, branch) for branch in condition):
+                return False
+            continue
+        value = document.get(field)
+        if not isinstance(condition, dict):
+            if value != condition:
+                return False
+            continue
+        if condition.get("$type") == "string" and not isinstance(value, str):
+            return False
+        if "$exists" in condition and (field in document) != condition["$exists"]:
+            return False
+        if "$gt" in condition and not (value is not None and value > condition["$gt"]):
+            return False
+    return True
+
+
+class FakeCursor:
+    """Cursor over a snapshot of matching documents"""
+
+    def __init__(self, documents):
+        self.documents = documents
+
+    def sort(self, field, direction):
+        self.documents.sort(key=lambda document: document[field], reverse=direction < 0)
+        return self
+
+    def limit(self, count):
+        self.documents = self.documents[:count]
+        return self
+
+    async def to_list(self, length):
+        return self.documents[:length]
+
+
+class FakeCollection:
+    """In-memory collection with the operations of the datetime migration"""
+
+    def __init__(self, documents=()):
+        self.documents = [dict(document) for document in documents]
+        self.before_bulk_write = None
+
+    def find(self, query, projection=None):
+        return FakeCursor([dict(document) for document in self.documents if _matches(document, query)])
+
+    async def find_one(self, query):
+        return next((document for document in self.documents if _matches(document, query)), None)
+
+    async def update_one(self, query, update, upsert=False):
+        document = await self.find_one(query)
+        if document is None:
+            if not upsert:
+                return SimpleNamespace(modified_count=0)
+            document = dict(query)
+            self.documents.append(document)
+        document.update(update.get("$set", {}))
+        for field, value in update.get("$inc", {}).items():
+            document[field] = document.get(field, 0) + value
+        return SimpleNamespace(modified_count=1)
+
+    async def bulk_write(self, requests, ordered=True):
+        if self.before_bulk_write is not None:
+            self.before_bulk_write()
+            self.before_bulk_write = None
+        modified = 0
+        for request in requests:
+            modified += (await self.update_one(request._filter, request._doc)).modified_count
+        return SimpleNamespace(modified_count=modified)
+
+
+def test_legacy_string_datetimes_are_parsed():
+    """Test ISO strings, with or without an offset, read as naive UTC datetimes"""
+    assert parse_datetime("2024-01-15T10:30:00") == datetime(2024, 1, 15, 10, 30)
+    assert parse_datetime("2024-01-15T16:00:00+05:30") == datetime(2024, 1, 15, 10, 30)
+    assert parse_datetime("2024-01-15T10:30:00Z") == datetime(2024, 1, 15, 10, 30)
+
+    document = {"created_at": "2024-01-15T10:30:00.123000", "updated_at": datetime(2024, 2, 1)}
+    assert normalize_datetimes(document) == {
+        "created_at": datetime(2024, 1, 15, 10, 30, 0, 123000),
+        "updated_at": datetime(2024, 2, 1),
+    }
+
+
+def test_migration_converts_legacy_documents_and_resumes():
+    """Test string created_at values become dates, skipping documents rewritten meanwhile"""
+    documents = FakeCollection(
+        [
+            {"_id": 1, "created_at": "2024-01-15T10:30:00"},
+            {"_id": 2, "created_at": "2024-01-16T08:00:00+02:00", "updated_at": "2024-01-17T00:00:00"},
+            {"_id": 3, "created_at": datetime(2024, 1, 18), "updated_at": datetime(2024, 1, 18)},
+            {"_id": 4, "created_at": "2024-01-19T00:00:00"},
+            {"_id": 5, "created_at": datetime(2024, 1, 20)},
+        ]
+    )
+    migrations = FakeCollection()
+    db = {"extracted_documents": documents, "migrations": migrations}
+
+    def application_write():
+        # The application rewrites document 2 after the migration read it
+        documents.documents[1].update(
+            {"created_at": datetime(2024, 1, 16, 6), "updated_at": datetime(2024, 3, 1)}
+        )
+
+    documents.before_bulk_write = application_write
+    migrated = asyncio.run(migrate_datetime_fields(db, batch_size=2, pause_seconds=0))
+
+    assert migrated == 3
+    by_id = {document["_id"]: document for document in documents.documents}
+    assert by_id[1]["created_at"] == by_id[1]["updated_at"] == datetime(2024, 1, 15, 10, 30)
+    assert by_id[2]["updated_at"] == datetime(2024, 3, 1)
+    assert by_id[4]["created_at"] == datetime(2024, 1, 19)
+    assert by_id[5]["updated_at"] == datetime(2024, 1, 20)
+
+    state = asyncio.run(migrations.find_one({"_id": MIGRATION_ID}))
+    assert (state["last_id"], state["migrated"], state["completed"]) == (5, 3, True)
+
+    # A resumed run starts after the recorded position
+    documents.documents.insert(0, {"_id": 0, "created_at": "2024-01-01T00:00:00"})
+    assert asyncio.run(migrate_datetime_fields(db, batch_size=2, pause_seconds=0)) == 0
+    assert asyncio.run(migrate_datetime_fields(db, batch_size=2, pause_seconds=0, restart=True)) == 1
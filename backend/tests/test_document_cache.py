@@ -0,0 +1,87 @@
+"""
+Document cache tests: single-flight loads, invalidation and bypass
+"""
+import asyncio
+
+from app.config import settings
+from app.services.document_cache import DocumentCache
+
+
+def test_concurrent_misses_share_one_load(monkeypatch):
+    """Test concurrent misses for one document call the loader once"""
+    monkeypatch.setattr(settings, "change_stream_enabled", False)
+    loads = []
+
+    async def loader(document_id):
+        loads.append(document_id)
+        await asyncio.sleep(0.01)
+        return {"_id": 1, "id": document_id}
+
+    async def run():
+        cache = DocumentCache(max_size=10, ttl_seconds=60)
+        results = await asyncio.gather(*(cache.get("abc", loader) for _ in range(5)))
+        assert all(result == {"id": "abc"} for result in results)
+        assert await cache.get("abc", loader) == {"id": "abc"}
+        assert cache.coalesced == 4 and cache.hits == 1
+
+        cache.invalidate_object_id(1)
+        await cache.get("abc", loader)
+
+    asyncio.run(run())
+    assert loads == ["abc", "abc"]
+
+
+def test_cancelled_load_does_not_strand_waiters(monkeypatch):
+    """Test waiters load again when the request loading a document is cancelled"""
+    monkeypatch.setattr(settings, "change_stream_enabled", False)
+
+    async def loader(document_id):
+        await asyncio.sleep(0.01)
+        return {"id": document_id}
+
+    async def run():
+        cache = DocumentCache(max_size=10, ttl_seconds=60)
+        leader = asyncio.create_task(cache.get("abc", loader))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.get("abc", loader))
+        await asyncio.sleep(0)
+        leader.cancel()
+        assert await asyncio.wait_for(waiter, 1) == {"id": "abc"}
+
+    asyncio.run(run())
+
+
+def test_bypassed_while_change_stream_is_down(monkeypatch):
+    """Test the cache is not used while the enabled change stream is not running"""
+    monkeypatch.setattr(settings, "change_stream_enabled", True)
+    assert not DocumentCache(max_size=10, ttl_seconds=60).enabled
+
+    monkeypatch.setattr(settings, "change_stream_enabled", False)
+    assert DocumentCache(max_size=10, ttl_seconds=60).enabled
+
+
+def test_change_event_discards_inflight_load(monkeypatch):
+    """Test a change event arriving during a load keeps the loaded document out of the cache"""
+    monkeypatch.setattr(settings, "change_stream_enabled", False)
+    versions = iter([1, 2, 3])
+
+    async def loader(document_id):
+        version = next(versions)
+        await asyncio.sleep(0.01)
+        return {"_id": 1, "id": document_id, "version": version}
+
+    async def run():
+        cache = DocumentCache(max_size=10, ttl_seconds=60)
+        for change in (
+            {"operationType": "update", "documentKey": {"_id": 1}, "fullDocumentBeforeChange": {"id": "abc"}},
+            {"operationType": "update", "documentKey": {"_id": 1}},
+        ):
+            load = asyncio.create_task(cache.get("abc", loader))
+            await asyncio.sleep(0)
+            await cache.handle_change(change)
+            await load
+            assert "abc" not in cache._entries
+
+        assert (await cache.get("abc", loader))["version"] == 3
+
+    asyncio.run(run())
@@ -0,0 +1,69 @@
+"""
+Document event tests: translating change stream events to WebSocket events
+"""
+from datetime import datetime
+
+from app.services.document_events import change_to_event
+
+
+def test_update_event_carries_changed_paths():
+    """Test update events are built from the update description"""
+    event_type, data = change_to_event(
+        {
+            "operationType": "update",
+            "fullDocumentBeforeChange": {"id": "abc", "document_type": "invoice"},
+            "updateDescription": {
+                "updatedFields": {
+                    "file_name": "renamed.pdf",
+                    "version": 3,
+                    "updated_at": datetime(2024, 1, 16, 9, 0),
+                },
+                "removedFields": ["extracted_data.notes"],
+            },
+        }
+    )
+    assert event_type == "UPDATE"
+    assert data == {
+        "id": "abc",
+        "document_type": "invoice",
+        "version": 3,
+        "updated_at": "2024-01-16T09:00:00",
+        "changed": {"file_name": "renamed.pdf"},
+        "removed": ["extracted_data.notes"],
+    }
+
+
+def test_type_change_carries_previous_type():
+    """Test update and replace events that change the type name the previous type"""
+    _, data = change_to_event(
+        {
+            "operationType": "update",
+            "fullDocumentBeforeChange": {"id": "abc", "document_type": "government_id"},
+            "updateDescription": {"updatedFields": {"document_type": "invoice", "version": 2}},
+        }
+    )
+    assert (data["document_type"], data["previous_document_type"]) == ("invoice", "government_id")
+
+    _, data = change_to_event(
+        {
+            "operationType": "replace",
+            "fullDocumentBeforeChange": {"id": "abc", "document_type": "invoice"},
+            "fullDocument": {"id": "abc", "document_type": "invoice", "version": 3},
+        }
+    )
+    assert "previous_document_type" not in data
+
+
+def test_update_event_requires_pre_image():
+    """Test update events without the document id are not broadcast"""
+    assert change_to_event({"operationType": "update", "updateDescription": {}}) is None
+
+
+def test_delete_event_carries_type():
+    """Test delete events carry the id and type of the deleted document"""
+    assert change_to_event(
+        {
+            "operationType": "delete",
+            "fullDocumentBeforeChange": {"id": "abc", "document_type": "government_id"},
+        }
+    ) == ("DELETE", {"id": "abc", "document_type": "government_id"})
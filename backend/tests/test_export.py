@@ -0,0 +1,89 @@
+"""
+Export serialization tests: flat rows, chunked CSV and NDJSON, and Parquet
+"""
+import asyncio
+import csv
+import io
+import json
+from datetime import datetime
+
+import pytest
+
+from app.utils.export import (
+    export_columns,
+    flatten_document,
+    parquet_supported,
+    stream_csv,
+    stream_ndjson,
+    stream_parquet,
+)
+
+INVOICE = {
+    "id": "i1",
+    "document_type": "invoice",
+    "file_name": "invoice.pdf",
+    "created_at": datetime(2024, 1, 15, 10, 30),
+    "version": 1,
+    "extracted_data": {
+        "seller_info": {"name": "Acme", "gstin": "29ABC"},
+        "summary": {"grand_total": "1200.50"},
+        "line_items": [{"description": "Ring", "weight": 4.2}, {"description": "Chain", "amount": "x"}],
+        "notes": "not exported",
+    },
+}
+
+
+async def _documents(documents):
+    """Async iterator over documents, as the document store yields them"""
+    for document in documents:
+        yield document
+
+
+async def _collect(chunks):
+    """Concatenate the chunks of a stream"""
+    return [chunk async for chunk in chunks]
+
+
+def test_invoice_flattens_to_one_row_per_line_item():
+    """Test invoice fields repeat per line item and values are converted to column types"""
+    rows = list(flatten_document(INVOICE, export_columns("invoice")))
+    assert [row["line_item_index"] for row in rows] == [0, 1]
+    assert all(row["extracted_data.seller_info.name"] == "Acme" for row in rows)
+    assert rows[0]["extracted_data.summary.grand_total"] == 1200.5
+    assert rows[0]["extracted_data.line_items.weight"] == 4.2
+    assert rows[1]["extracted_data.line_items.amount"] is None
+    assert "extracted_data.notes" not in rows[0]
+
+    government_id = {"id": "g1", "document_type": "government_id", "extracted_data": {"full_name": "Jane"}}
+    assert len(list(flatten_document(government_id, export_columns()))) == 1
+
+
+def test_csv_and_ndjson_stream_in_chunks():
+    """Test output is split into chunks that join into the complete file"""
+    documents = [dict(INVOICE, id=f"i{n}") for n in range(20)]
+
+    chunks = asyncio.run(_collect(stream_csv(_documents(documents), export_columns("invoice"), 256)))
+    assert len(chunks) > 1
+    rows = list(csv.DictReader(io.StringIO(b"".join(chunks).decode())))
+    assert len(rows) == 40
+    assert rows[0]["created_at"] == "2024-01-15T10:30:00"
+
+    chunks = asyncio.run(_collect(stream_ndjson(_documents(documents), 256)))
+    lines = b"".join(chunks).decode().splitlines()
+    assert [json.loads(line)["id"] for line in lines] == [f"i{n}" for n in range(20)]
+
+
+@pytest.mark.skipif(not parquet_supported(), reason="pyarrow is not installed")
+def test_parquet_round_trip():
+    """Test Parquet output is typed and written in row groups"""
+    import pyarrow.parquet as pq
+
+    documents = [dict(INVOICE, id=f"i{n}") for n in range(5)]
+    chunks = asyncio.run(_collect(stream_parquet(_documents(documents), export_columns("invoice"), 4)))
+    parquet = pq.ParquetFile(io.BytesIO(b"".join(chunks)))
+    assert parquet.metadata.num_rows == 10
+    assert parquet.metadata.num_row_groups == 3
+
+    table = parquet.read()
+    assert table.schema.field("extracted_data.summary.grand_total").type == "double"
+    assert table.column("created_at")[0].as_py() == datetime(2024, 1, 15, 10, 30)
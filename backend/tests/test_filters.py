@@ -0,0 +1,49 @@
+"""
+extracted_data filter DSL tests
+"""
+import pytest
+
+from app.utils.filters import parse_filters
+
+
+def test_filters_compile_to_typed_conditions():
+    """Test conditions are typed per field and combined per path"""
+    query = parse_filters(
+        "invoice",
+        [
+            "invoice_details.date:gte:2024-03-01",
+            "invoice_details.date:lt:2024-04-01",
+            "summary.grand_total:gt:50000",
+            "seller_info.gstin:in:29ABC|27XYZ",
+        ],
+    )
+    assert query == {
+        "extracted_data.invoice_details.date": {"$gte": "2024-03-01", "$lt": "2024-04-01"},
+        "extracted_data.summary.grand_total": {"$gt": 50000.0},
+        "extracted_data.seller_info.gstin": {"$in": ["29ABC", "27XYZ"]},
+    }
+
+
+def test_string_values_may_contain_colons():
+    """Test only the first two colons separate path, operator and value"""
+    assert parse_filters("government_id", ["id_number:eq:A:123"]) == {
+        "extracted_data.id_number": {"$eq": "A:123"}
+    }
+
+
+@pytest.mark.parametrize(
+    "document_type, expression",
+    [
+        (None, "full_name:eq:Jane"),
+        ("government_id", "full_name"),
+        ("government_id", "address:eq:Main St"),
+        ("government_id", "full_name:like:Jane"),
+        ("government_id", "expiry_date:lte:31/03/2024"),
+        ("invoice", "summary.grand_total:gt:lots"),
+        ("invoice", "full_name:eq:Jane"),
+    ],
+)
+def test_invalid_filters_rejected(document_type, expression):
+    """Test untyped, malformed, unknown and mistyped filters raise ValueError"""
+    with pytest.raises(ValueError):
+        parse_filters(document_type, [expression])
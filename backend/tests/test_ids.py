@@ -0,0 +1,45 @@
+"""
+Document ID tests: UUIDv7 generation and stored ID conversion
+"""
+import uuid
+
+from bson.binary import Binary
+
+from app.utils.ids import (
+    from_stored_id,
+    id_condition,
+    new_document_id,
+    to_stored_id,
+    uuid7,
+)
+
+
+def test_uuid7_is_time_ordered():
+    """Test generated IDs are version 7 and strictly increasing"""
+    ids = [uuid7() for _ in range(5000)]
+    assert all(value.version == 7 for value in ids)
+    assert all(value.variant == uuid.RFC_4122 for value in ids)
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+
+
+def test_stored_id_round_trip():
+    """Test canonical UUIDs are stored as binary and other IDs as strings"""
+    document_id = new_document_id()
+    stored = to_stored_id(document_id)
+    assert isinstance(stored, Binary)
+    assert from_stored_id(stored) == document_id
+
+    assert to_stored_id("legacy-id") == "legacy-id"
+    assert to_stored_id(document_id.upper()) == document_id.upper()
+    assert from_stored_id("legacy-id") == "legacy-id"
+
+
+def test_id_condition_matches_legacy_strings():
+    """Test lookups match both stored forms while legacy string IDs exist"""
+    document_id = new_document_id()
+    assert id_condition(document_id, legacy_strings=False) == to_stored_id(document_id)
+    assert id_condition(document_id, legacy_strings=True) == {
+        "$in": [to_stored_id(document_id), document_id]
+    }
+    assert id_condition("legacy-id", legacy_strings=True) == "legacy-id"
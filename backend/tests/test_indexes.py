@@ -0,0 +1,47 @@
+"""
+Index migration tests: applying pending versions in order
+"""
+import asyncio
+
+from app.migrations import indexes
+from app.migrations.indexes import MIGRATION_ID, index_version, migrate_indexes
+
+
+class FakeMigrations:
+    """Migrations collection holding the applied index version"""
+
+    def __init__(self):
+        self.state = None
+
+    async def find_one(self, query):
+        return self.state
+
+    async def update_one(self, query, update, upsert=False):
+        self.state = {"_id": MIGRATION_ID, **(self.state or {}), **update["$set"]}
+
+
+def test_only_pending_migrations_run(monkeypatch):
+    """Test a run applies the migrations after the recorded version, up to a target"""
+    applied = []
+
+    def migration(number):
+        async def run(db):
+            applied.append(number)
+
+        return run
+
+    monkeypatch.setattr(
+        indexes,
+        "INDEX_MIGRATIONS",
+        [(number, f"migration {number}", migration(number)) for number in (1, 2, 3)],
+    )
+    db = {"migrations": FakeMigrations()}
+
+    async def run():
+        assert await index_version(db) == 0
+        assert await migrate_indexes(db, target=2) == 2
+        assert await migrate_indexes(db, target=3) == 3
+        assert await migrate_indexes(db, target=3) == 3
+
+    asyncio.run(run())
+    assert applied == [1, 2, 3]
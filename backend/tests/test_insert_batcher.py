@@ -0,0 +1,72 @@
+"""
+Insert batcher tests: grouping, per-document failures and draining on close
+"""
+import asyncio
+
+import pytest
+from pymongo.errors import WriteError
+
+from app.models.document import ExtractedDocument
+from app.services.insert_batcher import InsertBatcher
+
+
+def _document(file_name: str) -> ExtractedDocument:
+    """Document to insert"""
+    return ExtractedDocument(
+        document_type="government_id",
+        file_name=file_name,
+        extracted_data={"full_name": "Jane Doe"},
+    )
+
+
+def test_concurrent_inserts_share_a_batch():
+    """Test inserts within the window are written together and failures reach their caller"""
+    batches = []
+
+    async def insert_many(documents):
+        batches.append([document.file_name for document in documents])
+        return [
+            {"success": document.file_name != "bad.pdf", "error": "Duplicate ID"}
+            for document in documents
+        ]
+
+    async def run():
+        batcher = InsertBatcher(batch_window_seconds=0.05, batch_max_size=10, buffer_max_size=100)
+        batcher.start(insert_many)
+        documents = [_document(name) for name in ("a.pdf", "bad.pdf", "c.pdf")]
+        results = await asyncio.gather(
+            *(batcher.submit(document) for document in documents),
+            return_exceptions=True,
+        )
+        await batcher.close()
+
+        assert results[0] == documents[0].id and results[2] == documents[2].id
+        assert isinstance(results[1], WriteError)
+        assert batcher.snapshot()["mean_batch_size"] == 3
+
+    asyncio.run(run())
+    assert batches == [["a.pdf", "bad.pdf", "c.pdf"]]
+
+
+def test_batches_are_capped_and_drained_on_close():
+    """Test full batches are written at once and close writes every buffered insert"""
+    batches = []
+
+    async def insert_many(documents):
+        batches.append(len(documents))
+        return [{"success": True, "error": None} for _ in documents]
+
+    async def run():
+        batcher = InsertBatcher(batch_window_seconds=0.05, batch_max_size=2, buffer_max_size=10)
+        batcher.start(insert_many)
+        pending = [asyncio.create_task(batcher.submit(_document(f"{n}.pdf"))) for n in range(5)]
+        await asyncio.sleep(0.01)
+        assert batches == [2, 2]
+
+        await batcher.close()
+        assert len(await asyncio.gather(*pending)) == 5
+        with pytest.raises(RuntimeError):
+            await batcher.submit(_document("late.pdf"))
+
+    asyncio.run(run())
+    assert batches == [2, 2, 1]
@@ -0,0 +1,99 @@
+"""
+Driver monitoring tests: pool counters, command latency percentiles and slow queries
+"""
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.monitoring import (
+    CommandHistogram,
+    CommandMetrics,
+    PoolMetrics,
+    command_shape,
+    redact,
+)
+
+
+def test_pool_metrics_track_checkouts_and_waits():
+    """Test pool events update connection gauges, failures and checkout wait times"""
+    metrics = PoolMetrics()
+    metrics.pool_created(SimpleNamespace(address=("localhost", 27017)))
+    for _ in range(2):
+        metrics.connection_created(SimpleNamespace())
+    metrics.connection_checked_out(SimpleNamespace(duration=0.01))
+    metrics.connection_checked_out(SimpleNamespace(duration=0.03))
+    metrics.connection_checked_in(SimpleNamespace())
+    metrics.connection_check_out_failed(SimpleNamespace(reason="timeout", duration=0.5))
+    metrics.connection_closed(SimpleNamespace())
+
+    snapshot = metrics.snapshot()
+    assert snapshot["pools"] == 1
+    assert snapshot["connections_open"] == 1
+    assert snapshot["connections_checked_out"] == 1
+    assert snapshot["checkouts_total"] == 2
+    assert snapshot["checkout_failures_total"] == {"timeout": 1}
+    assert snapshot["checkout_wait_seconds_avg"] == pytest.approx(0.18)
+    assert snapshot["checkout_wait_seconds_max"] == 0.5
+
+
+def test_percentile_is_bucket_bound_capped_at_maximum():
+    """Test percentiles report the bucket holding the rank, never above the slowest command"""
+    histogram = CommandHistogram()
+    assert histogram.percentile(0.5) == 0.0
+
+    for seconds in [0.002] * 90 + [0.03] * 9 + [0.07]:
+        histogram.record(seconds)
+    assert histogram.percentile(0.5) == 0.0025
+    assert histogram.percentile(0.95) == 0.05
+    assert histogram.percentile(0.99) == 0.05
+    assert histogram.percentile(1.0) == 0.07
+
+    histogram.record(30.0)
+    assert histogram.percentile(1.0) == 30.0
+    assert histogram.snapshot()["buckets"][-1] == {"le": "+Inf", "count": 101}
+
+
+def test_redact_keeps_field_names_and_operators():
+    """Test filter values are replaced while keys, operators and pipelines are kept"""
+    assert redact({"extracted_data.full_name": "Jane", "version": {"$in": [1, 2]}}) == {
+        "extracted_data.full_name": "?",
+        "version": {"$in": "?"},
+    }
+    assert redact([{"$match": {"$or": [{"a": 1}, {"b": 2}]}}]) == [
+        {"$match": {"$or": [{"a": "?"}, {"b": "?"}]}}
+    ]
+
+    assert command_shape("delete", {"delete": "docs", "deletes": [{"q": {"id": "abc"}}]}) == {
+        "id": "?"
+    }
+    assert command_shape("insert", {"insert": "docs", "documents": [{"id": "abc"}]}) is None
+
+
+def test_slow_commands_are_logged_with_their_shape():
+    """Test only commands over the threshold enter the slow query log, redacted"""
+    metrics = CommandMetrics(slow_query_seconds=0.1, slow_query_log_size=10, bytes_sample_rate=0)
+
+    for request_id, micros in enumerate((5_000, 250_000)):
+        metrics.started(
+            SimpleNamespace(
+                command_name="find",
+                command={"find": "docs", "filter": {"id": "abc"}},
+                connection_id=("localhost", 27017),
+                request_id=request_id,
+            )
+        )
+        metrics.succeeded(
+            SimpleNamespace(
+                command_name="find",
+                connection_id=("localhost", 27017),
+                request_id=request_id,
+                duration_micros=micros,
+                reply={"cursor": {"firstBatch": [{"id": "abc"}]}},
+            )
+        )
+
+    snapshot = metrics.snapshot()
+    assert snapshot["commands"]["find"]["docs"]["count"] == 2
+    assert snapshot["commands"]["find"]["docs"]["documents_total"] == 2
+    assert snapshot["slow_queries_total"] == 1
+    assert snapshot["slow_queries"][0]["shape"] == {"id": "?"}
@@ -0,0 +1,204 @@
+"""
+Original file store tests: content deduplication, reference counts and sweeping
+"""
+import asyncio
+import hashlib
+from datetime import timedelta
+from types import SimpleNamespace
+
+from pymongo.errors import DuplicateKeyError
+
+from app.services.database import DatabaseService
+from app.services.originals import OriginalFileStore
+from app.utils.dates import utc_now
+
+
+def _get(document, path):
+    """Read a dotted path"""
+    for part in path.split("."):
+        document = document.get(part) if isinstance(document, dict) else None
+    return document
+
+
+def _set(document, path, value):
+    """Write a dotted path"""
+    *parents, last = path.split(".")
+    for part in parents:
+        document = document.setdefault(part, {})
+    document[last] = value
+
+
+def _matches(document, query):
+    """Evaluate the equality, $in, $lt and $lte conditions the store uses"""
+    for path, condition in query.items():
+        value = _get(document, path)
+        if not isinstance(condition, dict):
+            if value != condition:
+                return False
+            continue
+        if "$in" in condition and value not in condition["$in"]:
+            return False
+        for operator, holds in (("$lt", lambda a, b: a < b), ("$lte", lambda a, b: a <= b)):
+            if operator in condition and (value is None or not holds(value, condition[operator])):
+                return False
+    return True
+
+
+class FakeCollection:
+    """In-memory collection with the operations of the original file store"""
+
+    def __init__(self):
+        self.documents = []
+
+    async def create_index(self, *args, **kwargs):
+        pass
+
+    async def find_one(self, query):
+        return next((document for document in self.documents if _matches(document, query)), None)
+
+    def find(self, query, projection=None):
+        return self._iterate([document for document in self.documents if _matches(document, query)])
+
+    async def _iterate(self, documents):
+        for document in documents:
+            yield document
+
+    async def update_one(self, query, update):
+        document = await self.find_one(query)
+        if document is not None:
+            self._apply(document, update)
+        return SimpleNamespace(matched_count=int(document is not None))
+
+    async def bulk_write(self, requests, ordered=True):
+        for request in requests:
+            await self.update_one(request._filter, request._doc)
+
+    async def find_one_and_delete(self, query, projection=None):
+        document = await self.find_one(query)
+        if document is not None:
+            self.documents.remove(document)
+        return document
+
+    async def delete_many(self, query):
+        self.documents = [document for document in self.documents if not _matches(document, query)]
+
+    def _apply(self, document, update):
+        for path, value in update.get("$set", {}).items():
+            _set(document, path, value)
+        for path, value in update.get("$inc", {}).items():
+            _set(document, path, (_get(document, path) or 0) + value)
+
+
+class FakeUpload:
+    """GridFS upload stream writing one files document and one chunk"""
+
+    def __init__(self, bucket, file_name, metadata):
+        self.bucket = bucket
+        self._id = object()
+        self.file_name = file_name
+        self.metadata = metadata
+        self.data = b""
+
+    async def write(self, data):
+        self.data += data
+        self.bucket.chunks.documents.append({"files_id": self._id, "data": data})
+
+    async def close(self):
+        if self.bucket.concurrent_upload is not None:
+            # Another request stores the same content first
+            self.bucket.files.documents.append(self.bucket.concurrent_upload)
+            self.bucket.concurrent_upload = None
+        if await self.bucket.files.find_one({"metadata.sha256": self.metadata["sha256"]}):
+            raise DuplicateKeyError("E11000 duplicate key error")
+        self.bucket.files.documents.append(
+            {
+                "_id": self._id,
+                "filename": self.file_name,
+                "length": len(self.data),
+                "metadata": self.metadata,
+            }
+        )
+
+    async def abort(self):
+        pass
+
+
+class FakeBucket:
+    """GridFS bucket over fake files and chunks collections"""
+
+    def __init__(self, files, chunks):
+        self.files = files
+        self.chunks = chunks
+        self.concurrent_upload = None
+
+    def open_upload_stream(self, file_name, metadata):
+        return FakeUpload(self, file_name, metadata)
+
+
+def _store(monkeypatch):
+    """Original file store on fake collections, with the database holding them"""
+    files, chunks = FakeCollection(), FakeCollection()
+    database = SimpleNamespace(
+        db={"originals.files": files, "originals.chunks": chunks},
+        originals_bucket_name="originals",
+    )
+    bucket = FakeBucket(files, chunks)
+    monkeypatch.setattr(OriginalFileStore, "_bucket", property(lambda self: bucket))
+    return OriginalFileStore(database), database, bucket
+
+
+def test_identical_content_is_stored_once(monkeypatch):
+    """Test uploading the same bytes again, or concurrently, stores no second copy"""
+    store, database, bucket = _store(monkeypatch)
+    files, chunks = database.db["originals.files"], database.db["originals.chunks"]
+
+    async def run():
+        sha256 = await store.put(b"%PDF-1.4 invoice", "invoice.pdf")
+        assert sha256 == hashlib.sha256(b"%PDF-1.4 invoice").hexdigest()
+        assert await store.put(b"%PDF-1.4 invoice", "copy.pdf") == sha256
+
+        info = await store.get_info(sha256)
+        assert (info["file_name"], info["content_type"], info["refcount"]) == (
+            "invoice.pdf",
+            "application/pdf",
+            0,
+        )
+        assert await store.missing([sha256, "0" * 64]) == {"0" * 64}
+
+        bucket.concurrent_upload = {
+            "_id": "other",
+            "filename": "id.png",
+            "length": 6,
+            "metadata": {"sha256": hashlib.sha256(b"id.png").hexdigest(), "refcount": 0},
+        }
+        await store.put(b"id.png", "id.png")
+
+    asyncio.run(run())
+    assert len(files.documents) == 2
+    assert [chunk["data"] for chunk in chunks.documents] == [b"%PDF-1.4 invoice"]
+    assert store.snapshot() == {"stored_total": 1, "deduplicated_total": 2, "swept_total": 0}
+
+
+def test_sweep_removes_only_unreferenced_files(monkeypatch):
+    """Test links keep a file, and unlinked files go once their grace period ends"""
+    store, database, _ = _store(monkeypatch)
+    files = database.db["originals.files"]
+
+    async def run():
+        linked = await store.put(b"linked", "linked.pdf")
+        unlinked = await store.put(b"unlinked", "unlinked.pdf")
+        await DatabaseService._reference_originals(database, {linked: 2, unlinked: 1})
+        await DatabaseService._reference_originals(database, {linked: -1, unlinked: -1})
+        assert (await store.get_info(linked))["refcount"] == 1
+        assert (await store.get_info(unlinked))["refcount"] == 0
+
+        # Within the grace period nothing is swept
+        assert await store.sweep(unreferenced_seconds=60) == 0
+
+        for file in files.documents:
+            file["metadata"]["touched_at"] = utc_now() - timedelta(minutes=5)
+        assert await store.sweep(unreferenced_seconds=60) == 1
+        assert await store.missing([linked, unlinked]) == {unlinked}
+
+    asyncio.run(run())
+    assert [chunk["data"] for chunk in database.db["originals.chunks"].documents] == [b"linked"]
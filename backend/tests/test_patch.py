@@ -0,0 +1,110 @@
+"""
+Patch compilation tests: JSON Merge Patch and JSON Patch to MongoDB updates
+"""
+import pytest
+
+from app.utils.patch import apply_update, compile_json_patch, compile_merge_patch
+
+
+def test_merge_patch_sets_and_unsets_paths():
+    """Test nested objects merge path by path and null removes a field"""
+    compiled = compile_merge_patch(
+        {
+            "file_name": "renamed.pdf",
+            "extracted_data": {"seller_info": {"name": "Acme"}, "notes": None},
+        }
+    )
+    assert compiled["update"] == {
+        "$set": {"file_name": "renamed.pdf", "extracted_data.seller_info.name": "Acme"},
+        "$unset": {"extracted_data.notes": ""},
+    }
+    assert compiled["changed"] == ["file_name", "extracted_data.seller_info.name"]
+    assert compiled["removed"] == ["extracted_data.notes"]
+
+
+@pytest.mark.parametrize(
+    "patch",
+    [
+        {"version": 3},
+        {"file_name": None},
+        {"document_type": "passport"},
+        {"extracted_data": {"$where": 1}},
+        {"extracted_data": {"a.b": 1}},
+        {},
+    ],
+)
+def test_merge_patch_rejects_invalid_changes(patch):
+    """Test protected fields, operators, dotted keys and empty patches are rejected"""
+    with pytest.raises(ValueError):
+        compile_merge_patch(patch)
+
+
+def test_json_patch_compiles_operations():
+    """Test add, replace, remove and test map to update operators and conditions"""
+    compiled = compile_json_patch(
+        [
+            {"op": "test", "path": "/document_type", "value": "invoice"},
+            {"op": "replace", "path": "/extracted_data/summary/grand_total", "value": 120},
+            {"op": "add", "path": "/extracted_data/line_items/-", "value": {"sku": "A1"}},
+            {"op": "add", "path": "/extracted_data/tags/0", "value": "urgent"},
+            {"op": "remove", "path": "/extracted_data/a~1b"},
+        ]
+    )
+    assert compiled["conditions"] == {"document_type": "invoice"}
+    assert compiled["update"] == {
+        "$set": {"extracted_data.summary.grand_total": 120},
+        "$unset": {"extracted_data.a/b": ""},
+        "$push": {
+            "extracted_data.line_items": {"$each": [{"sku": "A1"}]},
+            "extracted_data.tags": {"$each": ["urgent"], "$position": 0},
+        },
+    }
+
+
+@pytest.mark.parametrize(
+    "operations",
+    [
+        {"op": "add", "path": "/file_name", "value": "x"},
+        [{"op": "move", "from": "/file_name", "path": "/extracted_data/name"}],
+        [{"op": "remove", "path": "/extracted_data/line_items/0"}],
+        [{"op": "replace", "path": "/extracted_data/line_items/-", "value": 1}],
+        [{"op": "replace", "path": "/created_at", "value": "2024-01-01"}],
+        [{"op": "replace", "path": "extracted_data/name", "value": "x"}],
+        [
+            {"op": "replace", "path": "/extracted_data/seller_info", "value": {}},
+            {"op": "replace", "path": "/extracted_data/seller_info/name", "value": "x"},
+        ],
+    ],
+)
+def test_json_patch_rejects_unsupported_operations(operations):
+    """Test malformed, unsupported and overlapping operations are rejected"""
+    with pytest.raises(ValueError):
+        compile_json_patch(operations)
+
+
+def test_apply_update_derives_patched_document():
+    """Test a compiled patch applied in Python matches what MongoDB writes"""
+    previous = {
+        "file_name": "a.pdf",
+        "extracted_data": {"notes": "x", "line_items": [{"sku": "A1"}], "tags": ["b"]},
+    }
+    compiled = compile_json_patch(
+        [
+            {"op": "replace", "path": "/extracted_data/seller_info/name", "value": "Acme"},
+            {"op": "remove", "path": "/extracted_data/notes"},
+            {"op": "add", "path": "/extracted_data/line_items/-", "value": {"sku": "B2"}},
+            {"op": "add", "path": "/extracted_data/tags/0", "value": "a"},
+        ]
+    )
+    assert apply_update(previous, compiled["update"]) == {
+        "file_name": "a.pdf",
+        "extracted_data": {
+            "seller_info": {"name": "Acme"},
+            "line_items": [{"sku": "A1"}, {"sku": "B2"}],
+            "tags": ["a", "b"],
+        },
+    }
+    assert "seller_info" not in previous["extracted_data"]
+
+    with pytest.raises(ValueError):
+        apply_update({"file_name": "a.pdf"}, {"$set": {"file_name.first": "a"}})
@@ -0,0 +1,56 @@
+"""
+Sparse fieldset tests: projections and their in-memory application
+"""
+import pytest
+
+from app.utils.projection import apply_projection, build_projection
+
+
+def test_build_projection_always_includes_id():
+    """Test requested paths are projected with the id, dropping paths under a requested parent"""
+    assert build_projection(None) == {"_id": 0}
+    assert build_projection("file_name, extracted_data.seller_info.name,") == {
+        "_id": 0,
+        "extracted_data.seller_info.name": 1,
+        "file_name": 1,
+        "id": 1,
+    }
+    assert build_projection("extracted_data.summary.grand_total,extracted_data") == {
+        "_id": 0,
+        "extracted_data": 1,
+        "id": 1,
+    }
+
+
+@pytest.mark.parametrize(
+    "fields",
+    ["unknown", "file_name.first", "extracted_data..name", "extracted_data.$where"],
+)
+def test_build_projection_rejects_invalid_fields(fields):
+    """Test unknown fields and malformed paths raise ValueError"""
+    with pytest.raises(ValueError):
+        build_projection(fields)
+
+
+def test_apply_projection_mirrors_mongodb():
+    """Test paths descend into embedded documents and array items, skipping missing ones"""
+    document = {
+        "_id": 1,
+        "id": "abc",
+        "file_name": "invoice.pdf",
+        "extracted_data": {
+            "seller_info": {"name": "Acme", "gstin": "29ABC"},
+            "line_items": [{"description": "Ring", "amount": 100}, {"amount": 50}, "note"],
+        },
+    }
+    projection = build_projection(
+        "extracted_data.seller_info.name,extracted_data.line_items.description,version"
+    )
+    assert apply_projection(document, projection) == {
+        "id": "abc",
+        "extracted_data": {
+            "seller_info": {"name": "Acme"},
+            "line_items": [{"description": "Ring"}, {}],
+        },
+    }
+    assert "_id" not in apply_projection(document, None)
@@ -0,0 +1,34 @@
+"""
+Read routing tests: per-operation read preferences and primary pinning
+"""
+import pytest
+from pymongo.read_preferences import Primary, SecondaryPreferred
+
+from app.config import settings
+from app.services.read_routing import force_primary_reads, read_preference_for
+
+
+def test_configured_operations_route_to_secondaries(monkeypatch):
+    """Test configured reads use their mode with the staleness bound, others the primary"""
+    monkeypatch.setattr(settings, "read_routing", {"list": "secondaryPreferred"})
+    monkeypatch.setattr(settings, "read_max_staleness_seconds", 120)
+
+    assert read_preference_for("list") == SecondaryPreferred(max_staleness=120)
+    assert read_preference_for("stats") == Primary()
+
+
+def test_pinned_reads_use_the_primary(monkeypatch):
+    """Test reads following a client's own writes are pinned to the primary"""
+    monkeypatch.setattr(settings, "read_routing", {"list": "secondaryPreferred"})
+    token = force_primary_reads.set(True)
+    try:
+        assert read_preference_for("list") == Primary()
+    finally:
+        force_primary_reads.reset(token)
+
+
+def test_unknown_mode_rejected(monkeypatch):
+    """Test a misconfigured read preference raises ValueError"""
+    monkeypatch.setattr(settings, "read_routing", {"list": "fastest"})
+    with pytest.raises(ValueError):
+        read_preference_for("list")
@@ -0,0 +1,127 @@
+"""
+Invoice rollup tests: write deltas, update detection and report grouping
+"""
+from datetime import date, datetime
+from decimal import Decimal
+
+from app.utils.patch import apply_update, compile_merge_patch
+from app.utils.rollups import (
+    group_buckets,
+    period_range,
+    rollup_deltas,
+    rollup_totals,
+    touches_rollups,
+)
+
+
+def _invoice(gstin, invoice_date, grand_total, created_at=datetime(2024, 3, 9, 12, 0)):
+    """Invoice document holding the paths rollups read"""
+    return {
+        "document_type": "invoice",
+        "created_at": created_at,
+        "extracted_data": {
+            "seller_info": {"gstin": gstin},
+            "invoice_details": {"date": invoice_date},
+            "summary": {"grand_total": grand_total, "sgst_amount": "9.5", "cgst_amount": None},
+        },
+    }
+
+
+def _bucket(period, seller_gstin, invoices, grand_total):
+    """Stored rollup bucket"""
+    return {
+        "period": period,
+        "seller_gstin": seller_gstin,
+        "invoices": invoices,
+        "grand_total": grand_total,
+        "sgst_amount": 0,
+        "cgst_amount": 0,
+    }
+
+
+def test_insert_deltas_bucket_by_day_and_month():
+    """Test an insert adds to its seller's day and month buckets"""
+    deltas = rollup_deltas(added=[_invoice(" 29ABC ", "2024-01-15", 100)])
+    assert deltas == {
+        ("day", "2024-01-15", "29ABC"): {
+            "invoices": 1,
+            "grand_total": Decimal(100),
+            "sgst_amount": Decimal("9.5"),
+            "cgst_amount": Decimal(0),
+        },
+        ("month", "2024-01", "29ABC"): {
+            "invoices": 1,
+            "grand_total": Decimal(100),
+            "sgst_amount": Decimal("9.5"),
+            "cgst_amount": Decimal(0),
+        },
+    }
+
+
+def test_update_deltas_move_between_buckets():
+    """Test an update moves the contribution and unchanged buckets are omitted"""
+    deltas = rollup_deltas(
+        removed=[_invoice("29ABC", "2024-01-15", 100)],
+        added=[_invoice("29ABC", "2024-01-20", "not a number")],
+    )
+    assert deltas[("day", "2024-01-15", "29ABC")]["invoices"] == -1
+    assert deltas[("day", "2024-01-20", "29ABC")]["grand_total"] == Decimal(0)
+    assert deltas[("month", "2024-01", "29ABC")]["grand_total"] == Decimal(-100)
+
+    invoice = _invoice("29ABC", "2024-01-15", 100)
+    assert rollup_deltas(removed=[invoice], added=[invoice]) == {}
+    assert rollup_deltas(added=[{"document_type": "government_id"}]) == {}
+
+
+def test_patch_deltas_come_from_the_patch_alone():
+    """Test deltas of a patch derived from its pre-image only move this patch's change"""
+    previous = _invoice("29ABC", "2024-01-15", 100)
+    patch = compile_merge_patch({"extracted_data": {"summary": {"grand_total": 80}}})
+    deltas = rollup_deltas(removed=[previous], added=[apply_update(previous, patch["update"])])
+    assert deltas == {
+        (granularity, period, "29ABC"): {
+            "invoices": 0,
+            "grand_total": Decimal(-20),
+            "sgst_amount": Decimal(0),
+            "cgst_amount": Decimal(0),
+        }
+        for granularity, period in (("day", "2024-01-15"), ("month", "2024-01"))
+    }
+
+
+def test_invalid_invoice_date_falls_back_to_creation_date():
+    """Test invoices without a YYYY-MM-DD date are bucketed by created_at"""
+    deltas = rollup_deltas(added=[_invoice("", "15/01/2024", 5)])
+    assert set(deltas) == {("day", "2024-03-09", ""), ("month", "2024-03", "")}
+
+
+def test_touches_rollups():
+    """Test updates are checked against rollup paths, their parents and children"""
+    assert touches_rollups({"$set": {"extracted_data.summary": {}}})
+    assert touches_rollups({"$unset": {"extracted_data.seller_info.gstin.value": ""}})
+    assert touches_rollups({"$set": {"document_type": "invoice"}})
+    assert not touches_rollups({"$set": {"file_name": "a.pdf", "extracted_data.notes": "x"}})
+
+
+def test_report_grouping_and_totals():
+    """Test buckets are summed per period or seller and empty buckets dropped"""
+    buckets = [
+        _bucket("2024-01", "B", 1, 10),
+        _bucket("2024-01", "", 2, 20),
+        _bucket("2024-02", "B", 1, 5),
+        _bucket("2024-02", "C", 0, 0),
+    ]
+    by_period = group_buckets(buckets, "period")
+    assert [(row["period"], row["invoices"]) for row in by_period] == [("2024-01", 3), ("2024-02", 1)]
+
+    by_seller = group_buckets(buckets, "seller")
+    assert [(row["seller_gstin"], row["grand_total"]) for row in by_seller] == [
+        (None, Decimal(20)),
+        ("B", Decimal(15)),
+    ]
+    assert rollup_totals(by_seller)["grand_total"] == Decimal(35)
+
+    assert period_range("month", date(2024, 1, 15), date(2024, 2, 3)) == {
+        "$gte": "2024-01",
+        "$lte": "2024-02",
+    }
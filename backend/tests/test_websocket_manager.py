@@ -0,0 +1,137 @@
+"""
+WebSocket manager tests: topic filtering and slow client eviction
+"""
+import asyncio
+import json
+
+import pytest
+
+from app.services.websocket_manager import (
+    WebSocketManager,
+    event_topics,
+    parse_subscription,
+)
+
+
+class FakeWebSocket:
+    """WebSocket recording sent messages; a stalled one never completes a send"""
+
+    def __init__(self, stalled: bool = False):
+        self.stalled = stalled
+        self.sent = []
+        self.closed_with = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message: str):
+        if self.stalled:
+            await asyncio.Event().wait()
+        self.sent.append(message)
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        self.closed_with = code
+
+
+def _items(websocket: FakeWebSocket, key: str):
+    """Items of every bulk event a fake client received"""
+    return [json.loads(message)["data"][key] for message in websocket.sent]
+
+
+def test_parse_subscription():
+    """Test subscription requests are parsed into topics"""
+    topics = parse_subscription({"action": "subscribe", "document_type": "invoice", "id": ["a", "b"]})
+    assert topics == [("document_type", "invoice"), ("id", "a"), ("id", "b")]
+
+    with pytest.raises(ValueError):
+        parse_subscription({"action": "subscribe", "tenant": "acme"})
+    with pytest.raises(ValueError):
+        parse_subscription({"action": "subscribe", "document_type": "passport"})
+
+
+def test_broadcast_filters_by_topic():
+    """Test events reach unfiltered clients and matching subscribers only"""
+
+    async def run():
+        manager = WebSocketManager(send_queue_size=10, send_timeout_seconds=1, max_subscriptions=10)
+        everything, invoices, one_id = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+        for websocket in (everything, invoices, one_id):
+            await manager.connect(websocket)
+        manager.subscribe(invoices, [("document_type", "invoice")])
+        manager.subscribe(one_id, [("id", "g1")])
+
+        documents = [
+            {"id": "i1", "document_type": "invoice"},
+            {"id": "g1", "document_type": "government_id"},
+            {"id": "g2", "document_type": "government_id"},
+        ]
+        await manager.broadcast_bulk(
+            event_type="BULK_INSERT",
+            key="documents",
+            items=documents,
+            item_topics=[event_topics(document) for document in documents],
+        )
+        await manager.broadcast(event_type="DELETE", data={"id": "g2", "document_type": "government_id"})
+        await asyncio.sleep(0.01)
+        await manager.close()
+
+        assert len(everything.sent) == 2
+        assert _items(invoices, "documents") == [[documents[0]]]
+        assert _items(one_id, "documents") == [[documents[1]]]
+        assert manager.snapshot()["deliveries_filtered_total"] == 2
+
+    asyncio.run(run())
+
+
+def test_type_change_reaches_previous_type_subscribers():
+    """Test an update that changes the type reaches subscribers of both types"""
+
+    async def run():
+        manager = WebSocketManager(send_queue_size=10, send_timeout_seconds=1, max_subscriptions=10)
+        invoices, ids = FakeWebSocket(), FakeWebSocket()
+        for websocket in (invoices, ids):
+            await manager.connect(websocket)
+        manager.subscribe(invoices, [("document_type", "invoice")])
+        manager.subscribe(ids, [("document_type", "government_id")])
+
+        await manager.broadcast(
+            event_type="UPDATE",
+            data={"id": "a", "document_type": "government_id", "previous_document_type": "invoice"},
+        )
+        await asyncio.sleep(0.01)
+        await manager.close()
+
+        assert len(invoices.sent) == 1 and len(ids.sent) == 1
+
+    asyncio.run(run())
+
+
+def test_bulk_broadcast_evicts_stalled_clients():
+    """Test overflowing stalled clients are evicted without losing the event for others"""
+
+    async def run():
+        manager = WebSocketManager(send_queue_size=1, send_timeout_seconds=5, max_subscriptions=10)
+        stalled = [FakeWebSocket(stalled=True), FakeWebSocket(stalled=True)]
+        healthy = FakeWebSocket()
+        for websocket in stalled + [healthy]:
+            await manager.connect(websocket)
+        manager.subscribe(healthy, [("id", "a")])
+
+        for _ in range(3):
+            await manager.broadcast_bulk(
+                event_type="BULK_DELETE",
+                key="ids",
+                items=["a", "b"],
+                item_topics=[[("id", "a")], [("id", "b")]],
+            )
+            await asyncio.sleep(0.01)
+
+        snapshot = manager.snapshot()
+        await manager.close()
+
+        assert snapshot["connections"] == 1
+        assert snapshot["evictions_total"]["overflow"] == 2
+        assert _items(healthy, "ids") == [["a"], ["a"], ["a"]]
+        assert all(websocket.closed_with == 1008 for websocket in stalled)
+
+    asyncio.run(run())